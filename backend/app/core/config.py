@@ -4,18 +4,75 @@ import os
 
 
 class Settings(BaseSettings):
-    supabase_url: str
-    supabase_key: str
+    supabase_url: Optional[str] = None
+    supabase_key: Optional[str] = None
     admin_api_token: str
     rate_limit_per_minute: int = 60
     ipinfo_token: Optional[str] = None
+    ipinfo_base_url: str = "https://ipinfo.io"
     
     # Security settings
     allowed_origins: Union[str, List[str]] = ""
     abuse_threshold_per_minute: int = 50
+    abuse_block_seconds: int = 600
+    abuse_max_tracked_ips: int = 100000
     enable_gdpr_anonymization: bool = False
     ip_salt: Optional[str] = None
     
+    # Database
+    db_thread_pool_size: int = 32
+    # "supabase", or "memory" for the in-process store (local runs, benchmarks, edge)
+    storage_backend: str = "supabase"
+    
+    # Tracking ingestion (write-behind queue)
+    tracking_queue_enabled: bool = False
+    tracking_queue_max_size: int = 10000
+    tracking_queue_workers: int = 4
+    # Retry-After sent with 503 when the queue is full
+    tracking_queue_retry_after_seconds: int = 5
+    tracking_batch_max_events: int = 100
+    tracking_rpc_enabled: bool = False
+    session_timeout_minutes: int = 30
+    
+    # Hot visitor/session cache (per process)
+    visitor_cache_enabled: bool = False
+    visitor_cache_max_entries: int = 20000
+    
+    # Admin dashboard filter options cache (also sent as Cache-Control max-age)
+    filter_options_cache_seconds: int = 300
+    
+    # Rows per database round trip for bulk exports
+    export_batch_size: int = 1000
+    
+    # Analytics rollups (requires the rollup tables and functions from schema_enhanced.sql)
+    analytics_rollups_enabled: bool = False
+    analytics_flush_seconds: float = 10.0
+    analytics_max_pending_keys: int = 50000
+    
+    # Geo lookup cache
+    geo_cache_max_entries: int = 50000
+    geo_cache_ttl_seconds: int = 86400
+    geo_cache_negative_ttl_seconds: int = 300
+    geo_cache_by_prefix: bool = False
+    geo_database_path: Optional[str] = None
+    geo_http_fallback_enabled: bool = True
+    
+    # Outbound HTTP client pool
+    http_client_max_connections: int = 100
+    http_client_max_keepalive: int = 20
+    http_client_keepalive_seconds: float = 30.0
+    http_client_max_per_host: int = 20
+    http_client_timeout_seconds: float = 5.0
+    http_client_http2: bool = True
+    
+    # Prometheus /metrics endpoint (admin token); metrics_dir sums all workers' metrics
+    metrics_enabled: bool = True
+    metrics_dir: Optional[str] = None
+    metrics_snapshot_seconds: float = 5.0
+    
+    # Shared state (optional, enables cross-worker caches)
+    redis_url: Optional[str] = None
+    
     class Config:
         env_file = ".env"
         case_sensitive = False
@@ -1,12 +1,126 @@
-from supabase import create_client, Client
 from app.core.config import settings
+from app.core.metrics import db_call_duration, db_call_errors
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Protocol
+import asyncio
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-supabase: Client = create_client(settings.supabase_url, settings.supabase_key)
 
+class StorageQuery(Protocol):
+    """
+    Query builder subset used by the app (postgrest-py's request builders):
+    select(columns, count=None), insert, update, delete, eq, neq, gt, gte, lt,
+    lte, in_, is_, not_, order, limit, range, params and execute().
+    """
+    
+    def execute(self) -> Any: ...
 
-def get_db() -> Client:
-    return supabase
 
+class StorageClient(Protocol):
+    """A supabase Client, or any backend exposing the same table/rpc entry points."""
+    
+    def table(self, name: str) -> StorageQuery: ...
+    
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> StorageQuery: ...
+
+
+def create_storage_client() -> StorageClient:
+    """Build the client for STORAGE_BACKEND: "supabase" (default) or "memory"."""
+    if settings.storage_backend == "memory":
+        from app.core.memory_storage import MemoryStorageClient
+        logger.info("Using the in-memory storage backend; data is not persisted")
+        return MemoryStorageClient()
+    
+    if settings.storage_backend != "supabase":
+        raise ValueError(f"Unknown STORAGE_BACKEND: {settings.storage_backend}")
+    if not settings.supabase_url or not settings.supabase_key:
+        raise ValueError("SUPABASE_URL and SUPABASE_KEY are required with STORAGE_BACKEND=supabase")
+    
+    from supabase import create_client
+    return create_client(settings.supabase_url, settings.supabase_key)
+
+
+# Created on first use (or by init_db in the application lifespan), so importing
+# this module costs nothing and no client exists before workers fork.
+_client: Optional[StorageClient] = None
+_client_lock = threading.Lock()
+
+# The storage clients are synchronous; queries run on this bounded pool so a slow
+# call never blocks the event loop.
+_db_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_db() -> StorageClient:
+    global _client
+    
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = create_storage_client()
+    return _client
+
+
+def set_db(client: Optional[StorageClient]):
+    """Replace the storage client (benchmarks, tools); None recreates it on next use."""
+    global _client
+    _client = client
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _db_executor
+    
+    if _db_executor is None:
+        with _client_lock:
+            if _db_executor is None:
+                _db_executor = ThreadPoolExecutor(
+                    max_workers=settings.db_thread_pool_size,
+                    thread_name_prefix="db"
+                )
+    return _db_executor
+
+
+def init_db():
+    """Create the storage client and query pool. Called from the application lifespan."""
+    get_db()
+    _get_executor()
+    logger.info(f"Storage backend ready: {settings.storage_backend}")
+
+
+def query_target(query: Any) -> str:
+    """Metrics label of a query builder: its table name, or rpc:<function>."""
+    path = getattr(query, "path", None) or ""
+    if path.startswith("/rpc/"):
+        return "rpc:" + path[5:]
+    return path.lstrip("/") or "unknown"
+
+
+async def execute(query: Any) -> Any:
+    """Execute a query builder (table or rpc) on the DB thread pool and await its response."""
+    loop = asyncio.get_running_loop()
+    start_time = time.perf_counter()
+    try:
+        return await loop.run_in_executor(_get_executor(), query.execute)
+    except Exception:
+        db_call_errors.inc(query_target(query))
+        raise
+    finally:
+        db_call_duration.observe(time.perf_counter() - start_time, query_target(query))
+
+
+def db_executor_backlog() -> int:
+    """Queries waiting for a free DB thread."""
+    executor = _db_executor
+    return executor._work_queue.qsize() if executor is not None else 0
+
+
+def shutdown_db_executor():
+    """Stop the DB thread pool after in-flight queries complete."""
+    global _db_executor
+    
+    if _db_executor is not None:
+        _db_executor.shutdown(wait=True)
+        _db_executor = None
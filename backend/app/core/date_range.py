@@ -0,0 +1,14 @@
+"""
+date_from / date_to query parameters shared by the admin endpoints and exports.
+
+date_from is inclusive. date_to is turned into an exclusive end, so a
+date-only date_to (YYYY-MM-DD) includes that whole day.
+"""
+from datetime import date, datetime, timedelta
+
+
+def parse_range_end(date_to: str) -> datetime:
+    """Exclusive end of the range; raises ValueError if date_to is not ISO formatted."""
+    if len(date_to) == 10:
+        return datetime.combine(date.fromisoformat(date_to), datetime.min.time()) + timedelta(days=1)
+    return datetime.fromisoformat(date_to)
@@ -0,0 +1,96 @@
+"""
+Application-lifetime HTTP client pool for outbound lookups (geo, company enrichment).
+
+One httpx.AsyncClient is created in the FastAPI lifespan and shared by every
+service, so TCP/TLS connections to ipinfo.io and enrichment providers are kept
+alive and reused instead of being set up on each event.
+"""
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Dict, Optional
+from urllib.parse import urlsplit
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+logger = logging.getLogger(__name__)
+
+_client: Optional["httpx.AsyncClient"] = None
+_host_slots: Dict[str, asyncio.Semaphore] = {}
+
+
+def _build_client() -> "httpx.AsyncClient":
+    # Imported here so that importing the app does not load httpx
+    import httpx
+    
+    http2 = settings.http_client_http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested but the h2 package is not installed; using HTTP/1.1")
+            http2 = False
+    
+    return httpx.AsyncClient(
+        timeout=httpx.Timeout(settings.http_client_timeout_seconds),
+        limits=httpx.Limits(
+            max_connections=settings.http_client_max_connections,
+            max_keepalive_connections=settings.http_client_max_keepalive,
+            keepalive_expiry=settings.http_client_keepalive_seconds
+        ),
+        http2=http2
+    )
+
+
+async def init_http_client():
+    """Create the shared client. Called from the application lifespan."""
+    global _client
+    
+    if _client is None:
+        _client = _build_client()
+        logger.info(
+            f"HTTP client pool started - max connections: {settings.http_client_max_connections}, "
+            f"per host: {settings.http_client_max_per_host}"
+        )
+
+
+async def close_http_client():
+    """Close the shared client and its pooled connections."""
+    global _client
+    
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    _host_slots.clear()
+
+
+def get_http_client() -> "httpx.AsyncClient":
+    """
+    Return the shared client.
+    Created on demand when used outside the application lifespan (scripts).
+    """
+    global _client
+    
+    if _client is None:
+        _client = _build_client()
+    return _client
+
+
+@asynccontextmanager
+async def host_slot(host: str):
+    """Limit concurrent requests to a single host to http_client_max_per_host."""
+    slot = _host_slots.get(host)
+    if slot is None:
+        slot = _host_slots.setdefault(host, asyncio.Semaphore(settings.http_client_max_per_host))
+    
+    async with slot:
+        yield
+
+
+async def http_get(url: str, headers: Optional[Dict[str, str]] = None) -> "httpx.Response":
+    """GET through the shared pool, respecting the per-host concurrency cap."""
+    host = urlsplit(url).netloc
+    async with host_slot(host):
+        return await get_http_client().get(url, headers=headers)
@@ -0,0 +1,46 @@
+"""
+Per-key asyncio locks.
+
+Serializes read-modify-write sequences on one record (e.g. a visitor's counters)
+within a worker, while calls for different keys keep running concurrently.
+"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Hashable, List
+
+
+class KeyedLock:
+    """One asyncio.Lock per key, created on first use and dropped once nobody holds or waits for it."""
+    
+    def __init__(self, name: str):
+        self.name = name
+        # key -> [lock, holders + waiters]
+        self._locks: Dict[Hashable, List[Any]] = {}
+        
+        self.acquisitions = 0
+        self.contended = 0
+    
+    @asynccontextmanager
+    async def hold(self, key: Hashable) -> AsyncIterator[None]:
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        elif entry[0].locked():
+            self.contended += 1
+        entry[1] += 1
+        self.acquisitions += 1
+        
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[key]
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "acquisitions": self.acquisitions,
+            "contended": self.contended,
+            "held_keys": len(self._locks),
+        }
@@ -0,0 +1,566 @@
+"""
+In-memory storage backend with the subset of the supabase client API used by the app.
+
+Selected with STORAGE_BACKEND=memory. Supports:
+- table(name).select(columns, count="exact") / insert / update / delete
+- filters eq, neq, gt, gte, lt, lte, in_, is_ and not_ (negates the next filter),
+  plus PostgREST or/and trees added through query.params (keyset pagination)
+- order, limit, range and execute
+- many-to-one embeds such as "visitors!inner(id)" and filters on embedded
+  columns ("visitors.country") for the sessions/page_events relations
+- rpc() for the database functions that have a Python equivalent here
+
+Rows are kept per table in insertion order. Every column used in an eq or in_
+filter gets a hash index (built on first use, maintained on writes), so the
+lookups on the tracking path cost O(matching rows) instead of a table scan.
+Data lives in the process and is lost on restart.
+"""
+import copy
+import threading
+import uuid
+from datetime import datetime
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Column defaults from database/schema_enhanced.sql
+TABLE_DEFAULTS: Dict[str, Dict[str, Any]] = {
+    "visitors": {
+        "visit_count": 1,
+        "total_time_spent": 0,
+        "avg_session_duration": 0,
+        "pages_per_session": 0,
+        "engagement_score": 0,
+        "intent_score": 0,
+        "heat_level": "Cold",
+        "total_page_views": 0,
+        "page_counts": {},
+        "most_visited_page": None,
+    },
+    "sessions": {
+        "session_end": None,
+        "session_duration": 0,
+        "pages_visited_count": 0,
+    },
+    "page_events": {
+        "scroll_depth": 0,
+        "time_spent": 0,
+    },
+}
+
+# (table, embedded table) -> foreign key column on table
+RELATIONS: Dict[Tuple[str, str], str] = {
+    ("sessions", "visitors"): "visitor_id",
+    ("page_events", "sessions"): "session_id",
+}
+
+ROLLUP_DIMENSIONS = ("country", "heat_level", "utm_source", "utm_medium", "utm_campaign", "page_url")
+ROLLUP_METRICS = ("events", "page_views", "new_visitors", "new_sessions", "time_spent")
+
+class MemoryStorageError(Exception):
+    """Raised for queries or functions the in-memory backend does not support."""
+
+
+def _clone(value: Any) -> Any:
+    if isinstance(value, (dict, list)):
+        return copy.deepcopy(value)
+    return value
+
+
+def _split_top_level(text: str) -> List[str]:
+    """Split on commas outside parentheses and double quotes."""
+    parts, depth, quoted, current = [], 0, False, []
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted and char == "(":
+            depth += 1
+        elif not quoted and char == ")":
+            depth -= 1
+        elif not quoted and char == "," and depth == 0:
+            parts.append("".join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    if current:
+        parts.append("".join(current).strip())
+    return [part for part in parts if part]
+
+
+def _parse_condition(text: str):
+    """Parse a PostgREST logic tree ("or(...)", "and(...)" or "column.op.value")."""
+    for group in ("or", "and"):
+        if text.startswith(f"{group}(") and text.endswith(")"):
+            return (group, [_parse_condition(part) for part in _split_top_level(text[len(group) + 1:-1])])
+    
+    column, rest = text.split(".", 1)
+    negated = rest.startswith("not.")
+    if negated:
+        rest = rest[4:]
+    operator, value = rest.split(".", 1)
+    if value.startswith('"') and value.endswith('"'):
+        value = value[1:-1]
+    if operator == "is":
+        value = None if value == "null" else value == "true"
+    elif operator == "in":
+        value = [item.strip('"') for item in _split_top_level(value.strip("()"))]
+    return (column, operator, value, negated)
+
+
+def _coerce(stored: Any, value: Any) -> Any:
+    """Convert a filter value given as text to the stored value's type, as Postgres would."""
+    if isinstance(value, str) and isinstance(stored, (int, float)) and not isinstance(stored, bool):
+        try:
+            return float(value) if isinstance(stored, float) or "." in value else int(value)
+        except ValueError:
+            return value
+    return value
+
+
+def _compare(stored: Any, operator: str, value: Any) -> bool:
+    if operator == "is":
+        return stored is value if value is None else stored == value
+    if stored is None:
+        return False
+    if operator == "in":
+        return stored in value or any(stored == _coerce(stored, item) for item in value)
+    
+    value = _coerce(stored, value)
+    try:
+        if operator == "eq":
+            return stored == value
+        if operator == "neq":
+            return stored != value
+        if operator == "gt":
+            return stored > value
+        if operator == "gte":
+            return stored >= value
+        if operator == "lt":
+            return stored < value
+        if operator == "lte":
+            return stored <= value
+    except TypeError:
+        return False
+    raise MemoryStorageError(f"Unsupported filter operator: {operator}")
+
+
+class _Table:
+    def __init__(self, name: str):
+        self.name = name
+        self.rows: Dict[str, Dict[str, Any]] = {}
+        self.indexes: Dict[str, Dict[Any, Dict[str, None]]] = {}
+    
+    def index(self, column: str) -> Dict[Any, Dict[str, None]]:
+        index = self.indexes.get(column)
+        if index is None:
+            index = self.indexes[column] = {}
+            for row_id, row in self.rows.items():
+                self._index_add(index, row.get(column), row_id)
+        return index
+    
+    @staticmethod
+    def _index_add(index, value, row_id):
+        try:
+            index.setdefault(value, {})[row_id] = None
+        except TypeError:  # unhashable (JSON) values are never looked up by eq
+            pass
+    
+    @staticmethod
+    def _index_remove(index, value, row_id):
+        try:
+            bucket = index.get(value)
+        except TypeError:
+            return
+        if bucket is not None:
+            bucket.pop(row_id, None)
+            if not bucket:
+                del index[value]
+    
+    def insert(self, row: Dict[str, Any]):
+        self.rows[row["id"]] = row
+        for column, index in self.indexes.items():
+            self._index_add(index, row.get(column), row["id"])
+    
+    def update(self, row: Dict[str, Any], changes: Dict[str, Any]):
+        for column, index in self.indexes.items():
+            if column in changes and changes[column] != row.get(column):
+                self._index_remove(index, row.get(column), row["id"])
+                self._index_add(index, changes[column], row["id"])
+        row.update(changes)
+    
+    def delete(self, row: Dict[str, Any]):
+        for column, index in self.indexes.items():
+            self._index_remove(index, row.get(column), row["id"])
+        del self.rows[row["id"]]
+
+
+class _QueryParams:
+    """Stand-in for the httpx.QueryParams that postgrest-py exposes as query.params."""
+    
+    def __init__(self, items: Tuple[Tuple[str, str], ...] = ()):
+        self._items = items
+    
+    def add(self, key: str, value: str) -> "_QueryParams":
+        return _QueryParams(self._items + ((key, value),))
+    
+    def items(self) -> Tuple[Tuple[str, str], ...]:
+        return self._items
+
+
+class MemoryQuery:
+    def __init__(self, client: "MemoryStorageClient", table: str):
+        self._client = client
+        self._table = table
+        # Same shape as postgrest's request builders, used as the metrics label
+        self.path = f"/{table}"
+        self._select = "*"
+        self._count: Optional[str] = None
+        self._insert: Optional[List[Dict[str, Any]]] = None
+        self._update: Optional[Dict[str, Any]] = None
+        self._delete = False
+        self._filters: List[Any] = []
+        self._negate_next = False
+        self._order: Optional[str] = None
+        self._offset = 0
+        self._limit: Optional[int] = None
+        self.params = _QueryParams()
+    
+    # Builders
+    
+    def select(self, columns: str = "*", count: Optional[str] = None) -> "MemoryQuery":
+        self._select = columns
+        self._count = count
+        return self
+    
+    def insert(self, rows) -> "MemoryQuery":
+        self._insert = rows if isinstance(rows, list) else [rows]
+        return self
+    
+    def update(self, data: Dict[str, Any]) -> "MemoryQuery":
+        self._update = data
+        return self
+    
+    def delete(self) -> "MemoryQuery":
+        self._delete = True
+        return self
+    
+    def _filter(self, column: str, operator: str, value: Any) -> "MemoryQuery":
+        self._filters.append((column, operator, value, self._negate_next))
+        self._negate_next = False
+        return self
+    
+    def eq(self, column: str, value: Any) -> "MemoryQuery":
+        return self._filter(column, "eq", value)
+    
+    def neq(self, column: str, value: Any) -> "MemoryQuery":
+        return self._filter(column, "neq", value)
+    
+    def gt(self, column: str, value: Any) -> "MemoryQuery":
+        return self._filter(column, "gt", value)
+    
+    def gte(self, column: str, value: Any) -> "MemoryQuery":
+        return self._filter(column, "gte", value)
+    
+    def lt(self, column: str, value: Any) -> "MemoryQuery":
+        return self._filter(column, "lt", value)
+    
+    def lte(self, column: str, value: Any) -> "MemoryQuery":
+        return self._filter(column, "lte", value)
+    
+    def in_(self, column: str, values: Iterable[Any]) -> "MemoryQuery":
+        return self._filter(column, "in", list(values))
+    
+    def is_(self, column: str, value: Any) -> "MemoryQuery":
+        if value == "null":
+            value = None
+        return self._filter(column, "is", value)
+    
+    @property
+    def not_(self) -> "MemoryQuery":
+        self._negate_next = True
+        return self
+    
+    def order(self, column: str, desc: bool = False) -> "MemoryQuery":
+        # Same encoding as postgrest-py: the desc flag applies to the last column
+        self._order = f"{column}.desc" if desc else column
+        return self
+    
+    def limit(self, size: int) -> "MemoryQuery":
+        self._limit = size
+        return self
+    
+    def range(self, start: int, end: int) -> "MemoryQuery":
+        self._offset = start
+        self._limit = end - start + 1
+        return self
+    
+    def execute(self) -> SimpleNamespace:
+        with self._client.lock:
+            return self._execute()
+    
+    # Evaluation
+    
+    def _conditions(self) -> List[Any]:
+        conditions = list(self._filters)
+        for key, value in self.params.items():
+            if key in ("or", "and"):
+                conditions.append(_parse_condition(f"{key}{value}"))
+            else:
+                raise MemoryStorageError(f"Unsupported query parameter: {key}")
+        return conditions
+    
+    def _resolve(self, table: str, row: Optional[Dict[str, Any]], path: str) -> Any:
+        """Value of a column, following embedded relations for dotted paths."""
+        while row is not None and "." in path:
+            embedded, path = path.split(".", 1)
+            row = self._client.parent_row(table, embedded, row)
+            table = embedded
+        return None if row is None else row.get(path)
+    
+    def _matches(self, row: Dict[str, Any], condition) -> bool:
+        if condition[0] in ("or", "and"):
+            results = (self._matches(row, child) for child in condition[1])
+            return any(results) if condition[0] == "or" else all(results)
+        column, operator, value, negated = condition
+        return _compare(self._resolve(self._table, row, column), operator, value) != negated
+    
+    def _candidates(self, table: _Table, conditions: List[Any]) -> Iterable[Dict[str, Any]]:
+        """Rows to test: the smallest index bucket among plain eq/in filters, else the table."""
+        best: Optional[List[str]] = None
+        for condition in conditions:
+            if condition[0] in ("or", "and"):
+                continue
+            column, operator, value, negated = condition
+            if negated or "." in column or operator not in ("eq", "in"):
+                continue
+            index = table.index(column)
+            try:
+                if operator == "eq":
+                    ids = list(index.get(value, ()))
+                else:
+                    # A repeated value must not return its rows twice
+                    ids = list(dict.fromkeys(row_id for item in value for row_id in index.get(item, ())))
+            except TypeError:
+                continue
+            if best is None or len(ids) < len(best):
+                best = ids
+        if best is None:
+            return list(table.rows.values())
+        return [table.rows[row_id] for row_id in best]
+    
+    def _sort(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        # Stable sorts from the last key to the first; Postgres puts NULLs last
+        # in ascending order and first in descending order
+        for part in reversed(self._order.split(",")):
+            column, _, direction = part.strip().partition(".")
+            desc = direction.startswith("desc")
+            present = [row for row in rows if row.get(column) is not None]
+            missing = [row for row in rows if row.get(column) is None]
+            present.sort(key=lambda row: row[column], reverse=desc)
+            rows = missing + present if desc else present + missing
+        return rows
+    
+    def _project(self, table: str, row: Dict[str, Any], select: str) -> Optional[Dict[str, Any]]:
+        """Select columns and embeds; None when an !inner embed has no parent."""
+        if select.strip() == "*":
+            return {column: _clone(value) for column, value in row.items()}
+        
+        result = {}
+        for item in _split_top_level(select):
+            if "(" not in item:
+                result[item] = _clone(row.get(item))
+                continue
+            
+            name, columns = item[:-1].split("(", 1)
+            embedded, _, hint = name.partition("!")
+            parent = self._client.parent_row(table, embedded, row)
+            projected = None if parent is None else self._project(embedded, parent, columns)
+            if projected is None and hint == "inner":
+                return None
+            result[embedded] = projected
+        return result
+    
+    def _execute(self) -> SimpleNamespace:
+        table = self._client.get_table(self._table)
+        
+        if self._insert is not None:
+            created = [self._client.insert_row(self._table, row) for row in self._insert]
+            return SimpleNamespace(data=[_clone(row) for row in created], count=None)
+        
+        conditions = self._conditions()
+        rows = [row for row in self._candidates(table, conditions) if all(self._matches(row, c) for c in conditions)]
+        
+        if self._update is not None:
+            for row in rows:
+                table.update(row, {column: _clone(value) for column, value in self._update.items()})
+            return SimpleNamespace(data=[_clone(row) for row in rows], count=None)
+        
+        if self._delete:
+            for row in rows:
+                table.delete(row)
+            return SimpleNamespace(data=[_clone(row) for row in rows], count=None)
+        
+        if "(" in self._select:
+            projected = [(row, self._project(self._table, row, self._select)) for row in rows]
+            rows = [row for row, data in projected if data is not None]
+        
+        count = len(rows) if self._count == "exact" else None
+        if self._order:
+            rows = self._sort(rows)
+        end = None if self._limit is None else self._offset + self._limit
+        rows = rows[self._offset:end]
+        
+        data = [self._project(self._table, row, self._select) for row in rows]
+        return SimpleNamespace(data=data, count=count)
+
+
+class MemoryRpc:
+    def __init__(self, client: "MemoryStorageClient", name: str, params: Dict[str, Any]):
+        self._client = client
+        self._name = name
+        self._params = params
+        self.path = f"/rpc/{name}"
+    
+    def execute(self) -> SimpleNamespace:
+        function = self._client.functions.get(self._name)
+        if function is None:
+            raise MemoryStorageError(f"Database function {self._name} is not available with STORAGE_BACKEND=memory")
+        with self._client.lock:
+            return SimpleNamespace(data=function(**self._params), count=None)
+
+
+class MemoryStorageClient:
+    """Drop-in for the supabase Client (table and rpc), backed by Python dicts."""
+    
+    def __init__(self):
+        self.lock = threading.RLock()
+        self._tables: Dict[str, _Table] = {}
+        self.functions: Dict[str, Callable[..., Any]] = {
+            "get_visitor_filter_options": self._get_visitor_filter_options,
+            "apply_visitor_scores": self._apply_visitor_scores,
+            "increment_analytics_rollups": self._increment_analytics_rollups,
+            "analytics_timeseries": self._analytics_timeseries,
+            "analytics_breakdown": self._analytics_breakdown,
+        }
+    
+    def table(self, name: str) -> MemoryQuery:
+        return MemoryQuery(self, name)
+    
+    def rpc(self, name: str, params: Optional[Dict[str, Any]] = None) -> MemoryRpc:
+        return MemoryRpc(self, name, params or {})
+    
+    def get_table(self, name: str) -> _Table:
+        table = self._tables.get(name)
+        if table is None:
+            table = self._tables[name] = _Table(name)
+        if name == "visitor_heat_level_counts":
+            self._refresh_heat_level_counts(table)
+        return table
+    
+    def row_counts(self) -> Dict[str, int]:
+        with self.lock:
+            return {name: len(table.rows) for name, table in self._tables.items()}
+    
+    def insert_row(self, table: str, row: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.utcnow().isoformat()
+        stored = {column: _clone(value) for column, value in TABLE_DEFAULTS.get(table, {}).items()}
+        stored.update({"id": str(uuid.uuid4()), "created_at": now})
+        if table == "visitors":
+            stored.update({"first_visit_date": now, "last_visit_date": now, "updated_at": now})
+        elif table == "page_events":
+            stored["timestamp"] = now
+        stored.update({column: _clone(value) for column, value in row.items()})
+        self.get_table(table).insert(stored)
+        return stored
+    
+    def parent_row(self, table: str, embedded: str, row: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        foreign_key = RELATIONS.get((table, embedded))
+        if foreign_key is None:
+            raise MemoryStorageError(f"No relation from {table} to {embedded}")
+        return self.get_table(embedded).rows.get(row.get(foreign_key))
+    
+    # Database functions (see database/schema_enhanced.sql)
+    
+    def _refresh_heat_level_counts(self, counts: _Table):
+        """visitor_heat_level_counts is trigger-maintained in Postgres; here it is read off the heat_level index."""
+        index = self.get_table("visitors").index("heat_level")
+        counts.rows = {
+            level or "": {"id": level or "", "heat_level": level or "", "visitors": len(ids)}
+            for level, ids in index.items()
+        }
+        counts.indexes = {}
+    
+    def _get_visitor_filter_options(self) -> Dict[str, List[str]]:
+        visitors = self.get_table("visitors")
+        return {
+            "countries": sorted(value for value in visitors.index("country") if value),
+            "industries": sorted(value for value in visitors.index("industry") if value),
+        }
+    
+    def _apply_visitor_scores(self, p_scores: List[Dict[str, Any]]) -> int:
+        visitors = self.get_table("visitors")
+        updated = 0
+        for score in p_scores:
+            row = visitors.rows.get(score["id"])
+            if row is None:
+                continue
+            changes = {column: score[column] for column in ("intent_score", "engagement_score", "heat_level")}
+            if any(row.get(column) != value for column, value in changes.items()):
+                changes["updated_at"] = datetime.utcnow().isoformat()
+                visitors.update(row, changes)
+                updated += 1
+        return updated
+    
+    def _increment_analytics_rollups(self, p_rows: List[Dict[str, Any]]) -> None:
+        for name, day in (("analytics_hourly", False), ("analytics_daily", True)):
+            table = self.get_table(name)
+            for delta in p_rows:
+                bucket = datetime.fromisoformat(delta["bucket"]).replace(minute=0, second=0, microsecond=0)
+                if day:
+                    bucket = bucket.replace(hour=0)
+                bucket = bucket.isoformat()
+                key = "|".join([bucket] + [delta.get(column) or "" for column in ROLLUP_DIMENSIONS])
+                row = table.rows.get(key)
+                if row is None:
+                    row = {"id": key, "bucket": bucket}
+                    row.update({column: delta.get(column) or "" for column in ROLLUP_DIMENSIONS})
+                    row.update({metric: 0 for metric in ROLLUP_METRICS})
+                    table.insert(row)
+                for metric in ROLLUP_METRICS:
+                    row[metric] += delta.get(metric) or 0
+    
+    def _analytics_rows(self, table: str, p_from: str, p_to: str) -> List[Dict[str, Any]]:
+        return [row for row in self.get_table(table).rows.values() if p_from <= row["bucket"] < p_to]
+    
+    def _analytics_timeseries(
+        self,
+        p_granularity: str,
+        p_from: str,
+        p_to: str,
+        p_country: Optional[str] = None,
+        p_utm_source: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        if p_granularity not in ("hour", "day"):
+            raise MemoryStorageError(f"unsupported granularity {p_granularity}")
+        if p_granularity == "day":
+            p_from = p_from[:10]
+        
+        series: Dict[str, Dict[str, Any]] = {}
+        for row in self._analytics_rows(f"analytics_{'hourly' if p_granularity == 'hour' else 'daily'}", p_from, p_to):
+            if (p_country is not None and row["country"] != p_country) or \
+               (p_utm_source is not None and row["utm_source"] != p_utm_source):
+                continue
+            point = series.setdefault(row["bucket"], {"bucket": row["bucket"], **{metric: 0 for metric in ROLLUP_METRICS}})
+            for metric in ROLLUP_METRICS:
+                point[metric] += row[metric]
+        return [series[bucket] for bucket in sorted(series)]
+    
+    def _analytics_breakdown(self, p_dimension: str, p_from: str, p_to: str, p_limit: int = 20) -> List[Dict[str, Any]]:
+        if p_dimension not in ROLLUP_DIMENSIONS:
+            raise MemoryStorageError(f"unsupported dimension {p_dimension}")
+        
+        groups: Dict[str, Dict[str, Any]] = {}
+        for row in self._analytics_rows("analytics_daily", p_from[:10], p_to):
+            group = groups.setdefault(row[p_dimension], {"value": row[p_dimension], **{metric: 0 for metric in ROLLUP_METRICS}})
+            for metric in ROLLUP_METRICS:
+                group[metric] += row[metric]
+        return sorted(groups.values(), key=lambda group: group["events"], reverse=True)[:p_limit]
@@ -0,0 +1,353 @@
+"""
+Metrics - in-process counters and histograms exposed in the Prometheus text format.
+
+Hot-path updates are a dict lookup and a few integer additions, without locks.
+Every observation happens on the event loop thread: DB calls are timed around the
+awaited executor future, not inside the pool. Cache hit counters, queue depths and
+other values the services already track are read at scrape time through collector
+callbacks, so they cost nothing per request.
+
+Each worker process keeps its own registry. With several workers, set METRICS_DIR
+to a directory shared by them: each worker writes a snapshot there every
+METRICS_SNAPSHOT_SECONDS and GET /metrics sums the snapshots of all workers.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; covers a cached lookup (sub-millisecond) up to a slow upstream timeout
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[str, ...]
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Counter:
+    """Monotonic count per label set."""
+    
+    kind = "counter"
+    
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values: Dict[Labels, float] = {}
+    
+    def inc(self, *labels: str, amount: float = 1):
+        values = self.values
+        values[labels] = values.get(labels, 0) + amount
+    
+    def snapshot(self) -> List[Any]:
+        return [[list(labels), value] for labels, value in self.values.items()]
+    
+    @staticmethod
+    def merge(current: Any, other: Any) -> Any:
+        return current + other
+    
+    def render(self, series: Dict[Labels, Any]) -> Iterator[str]:
+        for labels, value in series.items():
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+    
+    def __init__(self, histogram: "Histogram", labels: Labels):
+        self.histogram = histogram
+        self.labels = labels
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Histogram:
+    """
+    Bucketed observations per label set.
+    A series is [count per bucket..., count above the last bucket, sum]; counts are
+    made cumulative only when rendered.
+    """
+    
+    kind = "histogram"
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.values: Dict[Labels, List[float]] = {}
+    
+    def observe(self, value: float, *labels: str):
+        series = self.values.get(labels)
+        if series is None:
+            series = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+    
+    def time(self, *labels: str) -> _Timer:
+        """Context manager observing the elapsed time of its block."""
+        return _Timer(self, labels)
+    
+    def snapshot(self) -> List[Any]:
+        return [[list(labels), list(series)] for labels, series in self.values.items()]
+    
+    @staticmethod
+    def merge(current: Any, other: Any) -> Any:
+        return [a + b for a, b in zip(current, other)]
+    
+    def render(self, series: Dict[Labels, Any]) -> Iterator[str]:
+        labelnames = self.labelnames + ("le",)
+        for labels, counts in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                yield f"{self.name}_bucket{_format_labels(labelnames, labels + (_format_value(bound),))} {cumulative}"
+            suffix = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{suffix} {_format_value(counts[-1])}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class Collected:
+    """A counter or gauge whose values are read from a callback when scraped."""
+    
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        kind: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Labels, float]]
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self.collect = collect
+    
+    def snapshot(self) -> List[Any]:
+        try:
+            values = self.collect()
+        except Exception as e:
+            logger.error(f"Error collecting metric {self.name}: {e}")
+            return []
+        return [[list(labels), value] for labels, value in values.items()]
+    
+    merge = staticmethod(Counter.merge)
+    render = Counter.render
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+    
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+    
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+    
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+    
+    def collected(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str],
+        collect: Callable[[], Dict[Labels, float]],
+        kind: str = "gauge"
+    ) -> Collected:
+        return self._register(Collected(name, documentation, kind, labelnames, collect))
+    
+    def kind(self, name: str) -> Optional[str]:
+        metric = self._metrics.get(name)
+        return metric.kind if metric is not None else None
+    
+    def snapshot(self) -> Dict[str, List[Any]]:
+        """Current values of every metric, JSON-serializable."""
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+    
+    def render(self, snapshots: Optional[List[Dict[str, List[Any]]]] = None) -> str:
+        """
+        Prometheus text exposition of this process, or of the given snapshots
+        summed (one per worker).
+        """
+        snapshots = snapshots if snapshots is not None else [self.snapshot()]
+        lines = []
+        for name, metric in self._metrics.items():
+            series: Dict[Labels, Any] = {}
+            for snapshot in snapshots:
+                for labels, value in snapshot.get(name, []):
+                    labels = tuple(labels)
+                    current = series.get(labels)
+                    series[labels] = value if current is None else metric.merge(current, value)
+            
+            lines.append(f"# HELP {name} {metric.documentation}")
+            lines.append(f"# TYPE {name} {metric.kind}")
+            lines.extend(metric.render(series))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+request_duration = registry.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template, method and status code",
+    ("route", "method", "status")
+)
+track_stage_duration = registry.histogram(
+    "track_stage_duration_seconds",
+    "Time spent in each stage of tracking a page view",
+    ("stage",)
+)
+db_call_duration = registry.histogram(
+    "db_call_duration_seconds",
+    "Database call latency by table or rpc:<function>, including thread pool wait",
+    ("table",)
+)
+db_call_errors = registry.counter(
+    "db_call_errors_total",
+    "Database calls that raised, by table or rpc:<function>",
+    ("table",)
+)
+abuse_blocked_requests = registry.counter(
+    "abuse_blocked_requests_total",
+    "Requests rejected with 429 by abuse detection"
+)
+suspicious_requests = registry.counter(
+    "suspicious_requests_total",
+    "Requests flagged as suspicious by abuse detection (logged, not blocked)"
+)
+
+
+class SnapshotWriter:
+    """Writes this worker's snapshot to METRICS_DIR periodically, for cross-worker /metrics."""
+    
+    def __init__(self, registry: MetricsRegistry):
+        self.registry = registry
+        self.directory: Optional[str] = None
+        self.interval_seconds = 5.0
+        self._task: Optional[asyncio.Task] = None
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    @property
+    def path(self) -> str:
+        return os.path.join(self.directory, f"metrics-{os.getpid()}.json")
+    
+    def write(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"written_at": time.time(), "metrics": self.registry.snapshot()}, f)
+        os.replace(tmp_path, self.path)
+    
+    def read_all(self) -> List[Dict[str, List[Any]]]:
+        """
+        Snapshots of all workers, including a fresh one of this worker.
+        Gauges are dropped from snapshots older than three intervals (exited
+        workers); their counters and histograms still count towards the totals.
+        """
+        self.write()
+        stale_before = time.time() - 3 * self.interval_seconds
+        snapshots = []
+        for filename in os.listdir(self.directory):
+            if not (filename.startswith("metrics-") and filename.endswith(".json")):
+                continue
+            try:
+                with open(os.path.join(self.directory, filename)) as f:
+                    data = json.load(f)
+            except (OSError, ValueError) as e:
+                logger.warning(f"Skipping unreadable metrics snapshot {filename}: {e}")
+                continue
+            
+            metrics = data.get("metrics", {})
+            if data.get("written_at", 0) < stale_before:
+                metrics = {
+                    name: values for name, values in metrics.items()
+                    if self.registry.kind(name) not in (None, "gauge")
+                }
+            snapshots.append(metrics)
+        return snapshots
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            try:
+                self.write()
+            except OSError as e:
+                logger.error(f"Error writing metrics snapshot: {e}")
+    
+    async def start(self, directory: str, interval_seconds: float):
+        if self.running:
+            return
+        self.directory = directory
+        self.interval_seconds = interval_seconds
+        os.makedirs(directory, exist_ok=True)
+        self.write()
+        self._task = asyncio.create_task(self._run(), name="metrics-snapshot")
+        logger.info(f"Metrics snapshots enabled - writing to {directory} every {interval_seconds}s")
+    
+    async def stop(self):
+        """Stop the snapshot loop and write the final values."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        try:
+            self.write()
+        except OSError as e:
+            logger.error(f"Error writing metrics snapshot: {e}")
+
+
+snapshot_writer = SnapshotWriter(registry)
+
+
+def render_metrics() -> str:
+    """All metrics in the Prometheus text format, summed across workers when METRICS_DIR is set."""
+    if snapshot_writer.running:
+        return registry.render(snapshot_writer.read_all())
+    return registry.render()
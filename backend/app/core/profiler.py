@@ -0,0 +1,211 @@
+"""
+Sampling profiler for live requests.
+
+Code paths wrapped with @profiled(name) can be profiled on demand: while a
+profiling window is open, 1 in SAMPLE_EVERY calls is sampled. A background
+thread wakes every INTERVAL_MS and records one stack per sampled call in flight:
+
+- the event loop thread's stack when the call is running (on-CPU time)
+- the coroutine await chain when it is suspended, ending in a [waiting] frame
+  (time spent on the DB thread pool, HTTP calls, locks)
+
+so sample counts are proportional to wall-clock time. Stacks are aggregated in
+the collapsed format read by flamegraph.pl, speedscope and similar tools.
+
+When no window is open a profiled call costs one attribute check; the sampler
+thread only runs during a window. Each worker process profiles its own calls.
+"""
+import asyncio
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_STACK_DEPTH = 128
+# Distinct stacks kept per window; further new stacks are counted as dropped
+MAX_DISTINCT_STACKS = 20000
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    filename = os.path.join(*code.co_filename.split(os.sep)[-2:])
+    name = getattr(code, "co_qualname", code.co_name)
+    return f"{name} ({filename}:{code.co_firstlineno})"
+
+
+def _await_chain(coro) -> List[Any]:
+    """Frames of a suspended coroutine and everything it awaits, outermost first."""
+    frames = []
+    while coro is not None and len(frames) < MAX_STACK_DEPTH:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) if hasattr(coro, "cr_await") else getattr(coro, "gi_yieldfrom", None)
+    return frames
+
+
+class _SampledCall:
+    __slots__ = ("name", "task", "frame")
+    
+    def __init__(self, name: str, task: Optional[asyncio.Task], frame):
+        self.name = name
+        self.task = task
+        self.frame = frame
+
+
+class SamplingProfiler:
+    def __init__(self):
+        self.active = False
+        self.sample_every = 10
+        self.interval_seconds = 0.01
+        self.started_at: Optional[float] = None
+        self.ends_at: Optional[float] = None
+        self._calls = 0
+        self._in_flight: Dict[int, _SampledCall] = {}
+        self._stacks: Counter = Counter()
+        self._loop_thread_id: Optional[int] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        
+        self.sampled_calls = 0
+        self.samples = 0
+        self.dropped_samples = 0
+    
+    def start(self, duration_seconds: float, sample_every: int = 10, interval_ms: float = 10.0):
+        """
+        Open a profiling window, discarding the previous results.
+        Must be called from the event loop thread.
+        """
+        self.stop()
+        self.sample_every = max(1, sample_every)
+        self.interval_seconds = max(0.001, interval_ms / 1000)
+        self._calls = 0
+        self._stacks = Counter()
+        self.sampled_calls = 0
+        self.samples = 0
+        self.dropped_samples = 0
+        self._loop_thread_id = threading.get_ident()
+        self.started_at = time.time()
+        self.ends_at = self.started_at + duration_seconds
+        
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self.active = True
+        self._thread.start()
+        logger.info(
+            f"Profiling 1 in {self.sample_every} calls every {interval_ms}ms for {duration_seconds}s"
+        )
+    
+    def stop(self):
+        """Close the window early; collected stacks are kept."""
+        thread = self._thread
+        self.active = False
+        self._stop.set()
+        if thread is not None:
+            thread.join()
+        self._thread = None
+        self._in_flight.clear()
+    
+    def _should_sample(self) -> bool:
+        self._calls += 1
+        return self._calls % self.sample_every == 0
+    
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            if time.time() >= self.ends_at:
+                self.active = False
+                logger.info(f"Profiling window closed: {self.samples} samples of {self.sampled_calls} calls")
+                return
+            try:
+                self._sample()
+            except Exception as e:
+                logger.error(f"Error sampling stacks: {e}")
+    
+    def _sample(self):
+        loop_frame = sys._current_frames().get(self._loop_thread_id)
+        for call in list(self._in_flight.values()):
+            stack = self._running_stack(call, loop_frame)
+            if stack is None:
+                stack = self._waiting_stack(call)
+            if not stack:
+                continue
+            
+            # The first frame is the @profiled wrapper, labelled by the call name
+            labels = [call.name] + [_frame_label(frame) if frame is not None else "[waiting]" for frame in stack[1:]]
+            key = ";".join(labels)
+            if key not in self._stacks and len(self._stacks) >= MAX_DISTINCT_STACKS:
+                self.dropped_samples += 1
+                continue
+            self._stacks[key] += 1
+            self.samples += 1
+    
+    @staticmethod
+    def _running_stack(call: _SampledCall, loop_frame) -> Optional[List[Any]]:
+        """The loop thread's stack from the profiled function down, if it is executing now."""
+        frames = []
+        frame = loop_frame
+        while frame is not None and len(frames) < MAX_STACK_DEPTH:
+            frames.append(frame)
+            if frame is call.frame:
+                frames.reverse()
+                return frames
+            frame = frame.f_back
+        return None
+    
+    @staticmethod
+    def _waiting_stack(call: _SampledCall) -> List[Any]:
+        if call.task is None:
+            return []
+        chain = _await_chain(call.task.get_coro())
+        for index, frame in enumerate(chain):
+            if frame is call.frame:
+                return chain[index:] + [None]
+        return []
+    
+    def collapsed(self) -> str:
+        """Aggregated stacks, one "frame;frame;frame count" line each."""
+        return "".join(f"{stack} {count}\n" for stack, count in self._stacks.most_common())
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "active": self.active,
+            "sample_every": self.sample_every,
+            "interval_ms": self.interval_seconds * 1000,
+            "started_at": self.started_at,
+            "ends_at": self.ends_at,
+            "calls_seen": self._calls,
+            "sampled_calls": self.sampled_calls,
+            "in_flight": len(self._in_flight),
+            "samples": self.samples,
+            "distinct_stacks": len(self._stacks),
+            "dropped_samples": self.dropped_samples,
+        }
+
+
+profiler = SamplingProfiler()
+
+
+def profiled(name: str) -> Callable:
+    """Make an async function a sampling target of the profiler, labelled name."""
+    def decorator(func: Callable) -> Callable:
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            if not profiler.active or not profiler._should_sample():
+                return await func(*args, **kwargs)
+            
+            call = _SampledCall(name, asyncio.current_task(), sys._getframe())
+            profiler.sampled_calls += 1
+            profiler._in_flight[id(call)] = call
+            try:
+                return await func(*args, **kwargs)
+            finally:
+                profiler._in_flight.pop(id(call), None)
+        return wrapper
+    return decorator
@@ -0,0 +1,45 @@
+"""
+Shared Redis connection for state that must be visible to every uvicorn worker.
+
+Optional: only used when REDIS_URL is set and the redis package is installed.
+A fakeredis:// URL uses an in-process fakeredis server (local runs and tests).
+"""
+import logging
+from typing import Optional, Any
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_client: Optional[Any] = None
+_import_failed = False
+
+
+def get_redis() -> Optional[Any]:
+    """Return the shared asyncio Redis client, or None if Redis is not configured."""
+    global _client, _import_failed
+    
+    if _client is not None or not settings.redis_url or _import_failed:
+        return _client
+    
+    try:
+        if settings.redis_url.startswith("fakeredis://"):
+            from fakeredis import aioredis as fake_redis
+            _client = fake_redis.FakeRedis(decode_responses=True)
+        else:
+            import redis.asyncio as redis_asyncio
+            _client = redis_asyncio.from_url(settings.redis_url, decode_responses=True)
+    except ImportError:
+        _import_failed = True
+        logger.warning("REDIS_URL is set but the redis package is not installed; using in-process state only")
+        return None
+    
+    return _client
+
+
+async def close_redis():
+    """Close the shared Redis connection pool."""
+    global _client
+    
+    if _client is not None:
+        await _client.aclose()
+        _client = None
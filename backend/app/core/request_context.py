@@ -0,0 +1,92 @@
+"""
+Request-scoped context.
+
+Client IP, hashed IP, user agent classification and referrer are derived once
+per request (in the abuse middleware) and stored on request.state, so the
+middleware, routers, tracking queue and tracking service all read the same
+values instead of re-parsing headers.
+"""
+import logging
+from dataclasses import dataclass, field
+from typing import Optional
+from fastapi import Request
+from app.models.schemas import DeviceInfo
+from app.services.ip_security import get_stored_ip
+from app.services.user_agent_parser import classify_user_agent, UserAgentClassification
+
+logger = logging.getLogger(__name__)
+
+
+def get_client_ip(request: Request) -> str:
+    """Extract client IP from proxy headers, falling back to the peer address."""
+    forwarded_for = request.headers.get("x-forwarded-for")
+    if forwarded_for:
+        return forwarded_for.split(",")[0].strip()
+    
+    real_ip = request.headers.get("x-real-ip")
+    if real_ip:
+        return real_ip
+    
+    return request.client.host if request.client else "unknown"
+
+
+def get_referrer(request: Request) -> Optional[str]:
+    """Extract referrer from request headers."""
+    return request.headers.get("referer") or request.headers.get("referrer")
+
+
+@dataclass
+class RequestContext:
+    """Values derived from one request. Safe to hand to background workers."""
+    client_ip: str
+    user_agent: str
+    user_agent_info: UserAgentClassification
+    referrer: Optional[str] = None
+    screen_resolution: Optional[str] = None
+    _stored_ip: Optional[str] = field(default=None, repr=False)
+    
+    @property
+    def stored_ip(self) -> str:
+        """Hashed (and optionally anonymized) IP, computed on first use."""
+        if self._stored_ip is None:
+            self._stored_ip = get_stored_ip(self.client_ip)
+        return self._stored_ip
+    
+    @property
+    def is_bot(self) -> bool:
+        return self.user_agent_info.is_bot
+    
+    @property
+    def device_info(self) -> DeviceInfo:
+        if not self.user_agent:
+            return DeviceInfo()
+        return DeviceInfo(
+            device_type=self.user_agent_info.device_type,
+            browser=self.user_agent_info.browser,
+            os=self.user_agent_info.os
+        )
+
+
+def build_request_context(request: Request) -> RequestContext:
+    user_agent = request.headers.get("user-agent", "")
+    user_agent_info = classify_user_agent(user_agent)
+    
+    if user_agent_info.suspicious_pattern_only:
+        logger.warning(f"Suspicious user agent detected: {user_agent}")
+    
+    return RequestContext(
+        client_ip=get_client_ip(request),
+        user_agent=user_agent,
+        user_agent_info=user_agent_info,
+        referrer=get_referrer(request),
+        screen_resolution=request.headers.get("x-screen-resolution")
+    )
+
+
+def get_request_context(request: Request) -> RequestContext:
+    """Return the context for this request, building it if no middleware has yet."""
+    context = getattr(request.state, "context", None)
+    if context is None:
+        context = build_request_context(request)
+        request.state.context = context
+    return context
@@ -0,0 +1,259 @@
+"""
+Rate and abuse state backends.
+
+Counters and blocks can live in process (MemoryStateBackend) or in Redis
+(RedisStateBackend), so limits hold across uvicorn workers and pods. Each check
+is a single atomic operation: one Lua script round trip for Redis.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+import sys
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RateCheck:
+    """Outcome of recording one request against a rate limit."""
+    blocked: bool
+    count: float
+    newly_blocked: bool = False
+
+
+class _WindowCounter:
+    """Request counts for the current and previous fixed window of one key."""
+    __slots__ = ("window", "current", "previous", "last_seen")
+    
+    def __init__(self, window: int, now: float):
+        self.window = window
+        self.current = 0
+        self.previous = 0
+        self.last_seen = now
+
+
+class SlidingWindowLimiter:
+    """
+    Sliding-window request counter with O(1) memory per key.
+    
+    Each key keeps the counts of the current and previous fixed window; the
+    request rate over the last window_seconds is estimated by weighting the
+    previous count by its remaining overlap. Idle keys are evicted in LRU order
+    and the number of tracked keys is capped. Blocks expire after block_seconds.
+    """
+    
+    def __init__(self, limit: int, window_seconds: int, block_seconds: int, max_keys: int):
+        self.limit = limit
+        self.window_seconds = window_seconds
+        self.block_seconds = block_seconds
+        self.max_keys = max(1, max_keys)
+        
+        # Both dicts are kept in last-touched order, so the oldest entry is first
+        self._counters: "OrderedDict[str, _WindowCounter]" = OrderedDict()
+        self._blocks: "OrderedDict[str, float]" = OrderedDict()
+        
+        self.total_blocks = 0
+        self.released_blocks = 0
+        self.evictions = 0
+    
+    def _sweep(self, now: float):
+        idle_before = now - 2 * self.window_seconds
+        while self._counters:
+            key, counter = next(iter(self._counters.items()))
+            if counter.last_seen >= idle_before and len(self._counters) <= self.max_keys:
+                break
+            self._counters.popitem(last=False)
+            self.evictions += 1
+        
+        while self._blocks:
+            key, expires_at = next(iter(self._blocks.items()))
+            if expires_at > now and len(self._blocks) <= self.max_keys:
+                break
+            self._blocks.popitem(last=False)
+            self.released_blocks += 1
+    
+    def is_blocked(self, key: str, now: Optional[float] = None) -> bool:
+        now = time.time() if now is None else now
+        expires_at = self._blocks.get(key)
+        if expires_at is None:
+            return False
+        if expires_at > now:
+            return True
+        
+        del self._blocks[key]
+        self.released_blocks += 1
+        return False
+    
+    def block(self, key: str, now: Optional[float] = None):
+        now = time.time() if now is None else now
+        self._blocks.pop(key, None)
+        self._blocks[key] = now + self.block_seconds
+        self.total_blocks += 1
+    
+    def hit(self, key: str, now: Optional[float] = None) -> float:
+        """Record a request for key and return the estimated count over the sliding window."""
+        now = time.time() if now is None else now
+        window = int(now // self.window_seconds)
+        
+        counter = self._counters.get(key)
+        if counter is None:
+            counter = _WindowCounter(window, now)
+            self._counters[key] = counter
+        else:
+            self._counters.move_to_end(key)
+            if window != counter.window:
+                counter.previous = counter.current if window == counter.window + 1 else 0
+                counter.current = 0
+                counter.window = window
+            counter.last_seen = now
+        
+        counter.current += 1
+        self._sweep(now)
+        
+        elapsed_fraction = (now - window * self.window_seconds) / self.window_seconds
+        return counter.current + counter.previous * (1 - elapsed_fraction)
+    
+    def stats(self) -> Dict[str, Any]:
+        memory = sys.getsizeof(self._counters) + sys.getsizeof(self._blocks)
+        memory += sum(sys.getsizeof(key) + sys.getsizeof(counter) for key, counter in self._counters.items())
+        memory += sum(sys.getsizeof(key) + sys.getsizeof(expires_at) for key, expires_at in self._blocks.items())
+        return {
+            "tracked_keys": len(self._counters),
+            "max_keys": self.max_keys,
+            "active_blocks": len(self._blocks),
+            "total_blocks": self.total_blocks,
+            "released_blocks": self.released_blocks,
+            "evictions": self.evictions,
+            "approx_memory_bytes": memory,
+            "limit_per_window": self.limit,
+            "window_seconds": self.window_seconds,
+            "block_seconds": self.block_seconds,
+        }
+
+
+class MemoryStateBackend:
+    """In-process backend. Also the stand-in for Redis in local runs and tests."""
+    
+    name = "memory"
+    
+    def __init__(self, window_seconds: int, block_seconds: int, max_keys: int):
+        self.limiter = SlidingWindowLimiter(
+            limit=0,
+            window_seconds=window_seconds,
+            block_seconds=block_seconds,
+            max_keys=max_keys
+        )
+    
+    async def check(self, key: str, limit: int) -> RateCheck:
+        """Record a request for key; block it if the sliding-window count exceeds limit."""
+        self.limiter.limit = limit
+        now = time.time()
+        
+        if self.limiter.is_blocked(key, now):
+            return RateCheck(blocked=True, count=-1)
+        
+        count = self.limiter.hit(key, now)
+        if count > limit:
+            self.limiter.block(key, now)
+            return RateCheck(blocked=True, count=count, newly_blocked=True)
+        
+        return RateCheck(blocked=False, count=count)
+    
+    def stats(self) -> Dict[str, Any]:
+        stats = self.limiter.stats()
+        stats["backend"] = self.name
+        return stats
+
+
+# KEYS: block key, current window key, previous window key
+# ARGV: limit, window seconds, block seconds, elapsed fraction of current window
+# Returns {status, estimate}: status 0 = allowed, 1 = already blocked, 2 = newly blocked
+SLIDING_WINDOW_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 1 then
+  return {1, '-1'}
+end
+local current = redis.call('INCR', KEYS[2])
+if current == 1 then
+  redis.call('EXPIRE', KEYS[2], tonumber(ARGV[2]) * 2)
+end
+local previous = tonumber(redis.call('GET', KEYS[3]) or '0')
+local estimate = current + previous * (1 - tonumber(ARGV[4]))
+if estimate > tonumber(ARGV[1]) then
+  redis.call('SET', KEYS[1], '1', 'EX', tonumber(ARGV[3]))
+  return {2, tostring(estimate)}
+end
+return {0, tostring(estimate)}
+"""
+
+
+class RedisStateBackend:
+    """
+    Cluster-wide backend on a Redis-compatible store.
+    
+    Uses the same two-bucket sliding window as the memory backend, evaluated
+    atomically in a Lua script. Keys expire on their own, so Redis memory stays
+    bounded. Falls back to the local backend if Redis is unreachable.
+    """
+    
+    name = "redis"
+    
+    def __init__(self, redis: Any, prefix: str, window_seconds: int, block_seconds: int, fallback: MemoryStateBackend):
+        self.redis = redis
+        self.prefix = prefix
+        self.window_seconds = window_seconds
+        self.block_seconds = block_seconds
+        self.fallback = fallback
+        self._script = redis.register_script(SLIDING_WINDOW_SCRIPT)
+        
+        self.checks = 0
+        self.total_blocks = 0
+        self.errors = 0
+    
+    async def check(self, key: str, limit: int) -> RateCheck:
+        now = time.time()
+        window = int(now // self.window_seconds)
+        elapsed_fraction = (now - window * self.window_seconds) / self.window_seconds
+        
+        try:
+            status, estimate = await self._script(
+                keys=[
+                    f"{self.prefix}:block:{key}",
+                    f"{self.prefix}:{window}:{key}",
+                    f"{self.prefix}:{window - 1}:{key}",
+                ],
+                args=[limit, self.window_seconds, self.block_seconds, elapsed_fraction]
+            )
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Redis rate check failed, using local state: {e}")
+            return await self.fallback.check(key, limit)
+        
+        self.checks += 1
+        status = int(status)
+        if status == 2:
+            self.total_blocks += 1
+        return RateCheck(blocked=status != 0, count=float(estimate), newly_blocked=status == 2)
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "checks": self.checks,
+            "total_blocks": self.total_blocks,
+            "errors": self.errors,
+            "window_seconds": self.window_seconds,
+            "block_seconds": self.block_seconds,
+            "local_fallback": self.fallback.stats(),
+        }
+
+
+def create_state_backend(prefix: str, window_seconds: int, block_seconds: int, max_keys: int):
+    """Redis backend when REDIS_URL is configured, otherwise the in-process backend."""
+    from app.core.redis_client import get_redis
+    
+    local = MemoryStateBackend(window_seconds, block_seconds, max_keys)
+    redis = get_redis()
+    if redis is None:
+        return local
+    return RedisStateBackend(redis, prefix, window_seconds, block_seconds, fallback=local)
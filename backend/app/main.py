@@ -1,13 +1,18 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from contextlib import asynccontextmanager
 import logging
-from app.routers import track, admin
-from app.middleware.security import add_security_headers, get_allowed_origins
-from app.middleware.abuse_detection import abuse_detection_middleware
+from app.routers import track, admin, metrics
+from app.middleware.security import get_allowed_origins
+from app.middleware.request_pipeline import RequestPipelineMiddleware
 from app.core.config import settings
+from app.core.http_client import init_http_client, close_http_client
+from app.core.database import init_db, shutdown_db_executor
+from app.core.redis_client import close_redis
+from app.core.metrics import snapshot_writer
+from app.core.profiler import profiler
+from app.services.tracking_queue import tracking_queue
+from app.services.analytics_rollup import rollup_accumulator
 
 # Configure structured logging
 logging.basicConfig(
@@ -17,17 +22,38 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start and stop shared clients and background services with the application."""
+    # Clients are built here, in each worker, rather than at import time
+    init_db()
+    await init_http_client()
+    if settings.tracking_queue_enabled:
+        await tracking_queue.start()
+    if settings.analytics_rollups_enabled:
+        await rollup_accumulator.start()
+    if settings.metrics_enabled and settings.metrics_dir:
+        await snapshot_writer.start(settings.metrics_dir, settings.metrics_snapshot_seconds)
+    
+    yield
+    
+    await tracking_queue.stop()
+    await rollup_accumulator.stop()
+    await snapshot_writer.stop()
+    profiler.stop()
+    await close_http_client()
+    await close_redis()
+    shutdown_db_executor()
+
+
 app = FastAPI(
     title="MMKK AI Visitor Intelligence API",
     description="Enterprise-grade visitor tracking and intelligence system",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
-# Rate limiting
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 # CORS with restricted origins
 allowed_origins = get_allowed_origins()
 logger.info(f"CORS allowed origins: {allowed_origins}")
@@ -38,49 +64,17 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["GET", "POST", "OPTIONS"],
     allow_headers=["Content-Type", "Authorization", "X-Screen-Resolution"],
-    expose_headers=["X-Request-ID"],
+    expose_headers=["X-Request-ID", "X-Next-Cursor"],
 )
 
 
-@app.middleware("http")
-async def security_headers_middleware(request: Request, call_next):
-    """Add security headers to all responses."""
-    response = await call_next(request)
-    return add_security_headers(response)
-
-
-@app.middleware("http")
-async def abuse_detection_middleware_wrapper(request: Request, call_next):
-    """Wrapper for abuse detection middleware."""
-    return await abuse_detection_middleware(request, call_next)
-
-
-@app.middleware("http")
-async def request_logging_middleware(request: Request, call_next):
-    """Log all requests for security monitoring."""
-    import uuid
-    import time
-    request_id = str(uuid.uuid4())[:8]
-    
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    
-    logger.info(
-        f"Request - ID: {request_id}, "
-        f"Method: {request.method}, "
-        f"Path: {request.url.path}, "
-        f"Status: {response.status_code}, "
-        f"Time: {process_time:.3f}s, "
-        f"IP: {request.client.host if request.client else 'unknown'}"
-    )
-    
-    response.headers["X-Request-ID"] = request_id
-    return response
+# Abuse detection, request logging and security headers (outermost layer)
+app.add_middleware(RequestPipelineMiddleware)
 
 
 app.include_router(track.router)
 app.include_router(admin.router)
+app.include_router(metrics.router)
 
 
 @app.get("/")
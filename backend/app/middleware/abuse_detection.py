@@ -1,66 +1,55 @@
 """
 Abuse Detection Middleware - Detects and blocks abusive traffic patterns.
 """
-from fastapi import Request, HTTPException, status
-from collections import defaultdict
-import time
+from fastapi import Request
+from typing import Any, Dict
 import logging
 from app.core.config import settings
-from app.services.user_agent_parser import is_bot, is_suspicious_user_agent
+from app.core.state_backend import create_state_backend
+from app.core.request_context import get_request_context
 
 logger = logging.getLogger(__name__)
 
-# In-memory store for tracking requests per IP
-# In production, consider using Redis for distributed systems
-_ip_request_times: defaultdict[str, list] = defaultdict(list)
-_abuse_blocklist: set[str] = set()
 
+_abuse_backend = None
 
-def get_client_ip(request: Request) -> str:
-    """Extract client IP from request."""
-    forwarded_for = request.headers.get("x-forwarded-for")
-    if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
-    
-    real_ip = request.headers.get("x-real-ip")
-    if real_ip:
-        return real_ip
-    
-    return request.client.host if request.client else "unknown"
+
+def get_abuse_backend():
+    """Shared (Redis) or in-process abuse state, created on first use."""
+    global _abuse_backend
+    
+    if _abuse_backend is None:
+        _abuse_backend = create_state_backend(
+            prefix="abuse",
+            window_seconds=60,
+            block_seconds=settings.abuse_block_seconds,
+            max_keys=settings.abuse_max_tracked_ips
+        )
+    return _abuse_backend
 
 
-def is_abusive_ip(ip_address: str) -> bool:
+async def is_abusive_ip(ip_address: str) -> bool:
     """
     Check if IP address is making too many requests.
-    Threshold: settings.abuse_threshold_per_minute requests per minute.
+    Threshold: settings.abuse_threshold_per_minute requests per sliding minute.
+    Offending IPs are blocked for settings.abuse_block_seconds; with Redis
+    configured the count and blocks are shared by all workers.
     """
-    if ip_address in _abuse_blocklist:
-        return True
-    
-    current_time = time.time()
-    one_minute_ago = current_time - 60
-    
-    # Clean old entries
-    _ip_request_times[ip_address] = [
-        req_time for req_time in _ip_request_times[ip_address]
-        if req_time > one_minute_ago
-    ]
+    result = await get_abuse_backend().check(ip_address, settings.abuse_threshold_per_minute)
     
-    # Add current request
-    _ip_request_times[ip_address].append(current_time)
-    
-    # Check threshold
-    request_count = len(_ip_request_times[ip_address])
-    
-    if request_count > settings.abuse_threshold_per_minute:
-        _abuse_blocklist.add(ip_address)
+    if result.newly_blocked:
         logger.warning(
-            f"Abuse detected: IP {ip_address} made {request_count} requests in 1 minute. "
-            f"Threshold: {settings.abuse_threshold_per_minute}. Blocking."
+            f"Abuse detected: IP {ip_address} made {result.count:.0f} requests in 1 minute. "
+            f"Threshold: {settings.abuse_threshold_per_minute}. "
+            f"Blocking for {settings.abuse_block_seconds}s."
         )
-        return True
     
-    return False
+    return result.blocked
+
+
+def get_abuse_stats() -> Dict[str, Any]:
+    """Tracked keys, approximate memory footprint and block counts of the abuse detector."""
+    return get_abuse_backend().stats()
 
 
 def is_suspicious_request(request: Request) -> bool:
@@ -68,14 +57,15 @@ def is_suspicious_request(request: Request) -> bool:
     Detect suspicious request patterns.
     Returns True if request appears suspicious.
     """
-    user_agent = request.headers.get("user-agent", "")
+    context = get_request_context(request)
+    user_agent = context.user_agent
     
     # Check for bot
-    if is_bot(user_agent):
+    if context.user_agent_info.is_bot:
         return True
     
     # Check for suspicious user agent patterns
-    if is_suspicious_user_agent(user_agent):
+    if context.user_agent_info.is_suspicious:
         return True
     
     # Check for missing or suspicious user agent
@@ -98,66 +88,3 @@ def is_suspicious_request(request: Request) -> bool:
             return True
     
     return False
-
-
-async def abuse_detection_middleware(request: Request, call_next):
-    """
-    Middleware to detect and block abusive traffic.
-    """
-    ip_address = get_client_ip(request)
-    
-    # Skip abuse detection for health checks and admin routes (they have their own auth)
-    if request.url.path in ["/health", "/"] or request.url.path.startswith("/api/admin"):
-        response = await call_next(request)
-        return response
-    
-    # Check for abusive IP
-    if is_abusive_ip(ip_address):
-        logger.error(f"Blocked abusive request from IP: {ip_address}, Path: {request.url.path}")
-        raise HTTPException(
-            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-            detail="Too many requests. Please try again later."
-        )
-    
-    # Check for suspicious patterns
-    if is_suspicious_request(request):
-        logger.warning(
-            f"Suspicious request detected - IP: {ip_address}, "
-            f"Path: {request.url.path}, "
-            f"User-Agent: {request.headers.get('user-agent', 'None')}"
-        )
-        # Log but don't block - allow through but monitor
-    
-    try:
-        response = await call_next(request)
-        
-        # Log failed requests
-        if response.status_code >= 400:
-            logger.warning(
-                f"Failed request - IP: {ip_address}, "
-                f"Path: {request.url.path}, "
-                f"Status: {response.status_code}, "
-                f"Method: {request.method}"
-            )
-        
-        return response
-    
-    except HTTPException as e:
-        # Log HTTP exceptions
-        logger.warning(
-            f"HTTP exception - IP: {ip_address}, "
-            f"Path: {request.url.path}, "
-            f"Status: {e.status_code}, "
-            f"Detail: {e.detail}"
-        )
-        raise
-    except Exception as e:
-        # Log unexpected errors
-        logger.error(
-            f"Unexpected error - IP: {ip_address}, "
-            f"Path: {request.url.path}, "
-            f"Error: {str(e)}",
-            exc_info=True
-        )
-        raise
-
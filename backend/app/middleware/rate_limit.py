@@ -1,13 +1,49 @@
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from fastapi import Request
+"""
+Per-route rate limits.
+
+Requests are counted per client and route in the same state backend as abuse
+detection: an in-process sliding window, or with REDIS_URL set one async Lua
+script round trip, so the limit holds across workers without blocking the event loop.
+"""
+from fastapi import Request, HTTPException, status
 from app.core.config import settings
+from app.core.state_backend import create_state_backend
+
+# A client over the limit is refused for this long, then its sliding-window count is checked again
+RATE_LIMIT_BLOCK_SECONDS = 1
+
+_rate_limit_backend = None
+
 
-limiter = Limiter(key_func=get_remote_address)
+def get_rate_limit_backend():
+    """Shared (Redis) or in-process rate limit state, created on first use."""
+    global _rate_limit_backend
+    
+    if _rate_limit_backend is None:
+        _rate_limit_backend = create_state_backend(
+            prefix="ratelimit",
+            window_seconds=60,
+            block_seconds=RATE_LIMIT_BLOCK_SECONDS,
+            max_keys=settings.abuse_max_tracked_ips
+        )
+    return _rate_limit_backend
 
 
-def get_rate_limit():
-    """Get rate limit from settings."""
-    return f"{settings.rate_limit_per_minute}/minute"
+async def rate_limit(request: Request):
+    """
+    Route dependency enforcing settings.rate_limit_per_minute requests per
+    sliding minute for each client IP. Raises 429 with Retry-After when exceeded.
+    """
+    client_ip = request.client.host if request.client else "127.0.0.1"
+    route = request.scope.get("route")
+    path = route.path if route is not None else request.url.path
+    limit = settings.rate_limit_per_minute
+    
+    result = await get_rate_limit_backend().check(f"{path}:{client_ip}", limit)
+    if result.blocked:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Rate limit exceeded: {limit} per 1 minute",
+            headers={"Retry-After": str(RATE_LIMIT_BLOCK_SECONDS)}
+        )
 
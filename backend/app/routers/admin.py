@@ -1,114 +1,228 @@
 from fastapi import APIRouter, Request, HTTPException, status, Query
-from app.core.database import get_db
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from app.core.database import get_db, execute
 from app.core.config import settings
+from app.core.profiler import profiler, profiled
+from app.core.date_range import parse_range_end
 from app.models.schemas import VisitorResponse
-from typing import List, Optional
+from app.services.geo_service import get_geo_cache_stats
+from app.services.company_enrichment import get_enrichment_coalescing_stats
+from app.services.visitor_cache import get_visitor_cache_stats
+from app.services.user_agent_parser import get_user_agent_cache_stats
+from app.services.filter_options import get_filter_options, get_filter_options_cache_stats
+from app.services.analytics_rollup import rollup_accumulator
+from app.services.tracking_service import get_visitor_lock_stats
+from app.services.intent_calculator import HEAT_LEVEL_THRESHOLDS, TOP_HEAT_LEVEL
+from app.services.export_service import EXPORT_COLUMNS, arrow_available, stream_csv, stream_arrow
+from app.middleware.abuse_detection import get_abuse_stats
+from typing import Any, AsyncIterator, Dict, List, Optional
 from datetime import datetime, timedelta
+import base64
+import json
 import logging
+import os
+import uuid
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
 
+def verify_admin_request(request: Request):
+    """Require a valid Bearer admin token. Raises 401 otherwise."""
+    auth_header = request.headers.get("Authorization")
+    if not auth_header:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Missing Authorization header"
+        )
+    
+    try:
+        scheme, token = auth_header.split(" ")
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid Authorization header format"
+        )
+    
+    if scheme.lower() != "bearer" or token != settings.admin_api_token:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid API token"
+        )
+
+
+VISITOR_COLUMNS = (
+    "id,company_name,country,device_type,industry,visit_count,"
+    "total_time_spent,pages_per_session,engagement_score,"
+    "intent_score,heat_level,last_visit_date"
+)
+VISITOR_SORT_KEYS = ("intent_score", "visit_count", "last_visit_date")
+
+
+def encode_cursor(sort_key: str, row: Dict[str, Any]) -> str:
+    """Opaque cursor pointing just after row in (sort_key desc, id desc) order."""
+    raw = json.dumps({"s": sort_key, "k": row.get(sort_key), "id": row["id"]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _parse_cursor_key(sort_key: str, key: Any) -> Any:
+    """Cursor sort value checked against the column type; it ends up inside a PostgREST filter."""
+    if key is None:
+        return None
+    if sort_key == "last_visit_date":
+        if not isinstance(key, str):
+            raise ValueError("cursor key is not a timestamp")
+        return datetime.fromisoformat(key).isoformat()
+    if not isinstance(key, int) or isinstance(key, bool):
+        raise ValueError("cursor key is not an integer")
+    return key
+
+
+def decode_cursor(cursor: str, sort_key: str) -> Dict[str, Any]:
+    """
+    Decode a cursor issued for sort_key. Raises 400 if it is malformed, for another
+    sort, or its id / sort value do not have the column's type.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        position = json.loads(raw)
+        if position.get("s") != sort_key or not isinstance(position.get("id"), str):
+            raise ValueError("cursor does not match sort_by")
+        return {
+            "s": sort_key,
+            "k": _parse_cursor_key(sort_key, position.get("k")),
+            "id": str(uuid.UUID(position["id"]))
+        }
+    except (ValueError, TypeError, AttributeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+def _build_visitor_query(
+    sort_key: str,
+    limit: int,
+    country: Optional[str],
+    heat_level: Optional[str],
+    industry: Optional[str],
+    date_from: Optional[str],
+    date_to: Optional[str],
+    position: Optional[Dict[str, Any]] = None
+):
+    """
+    Filtered visitors query ordered by (sort_key desc, id desc).
+    position is a decoded cursor; rows up to and including it are skipped.
+    """
+    db = get_db()
+    
+    query = db.table("visitors").select(VISITOR_COLUMNS)
+    
+    if country:
+        query = query.eq("country", country)
+    
+    if heat_level:
+        query = query.eq("heat_level", heat_level)
+    
+    if industry:
+        query = query.eq("industry", industry)
+    
+    if date_from:
+        try:
+            date_from_obj = datetime.fromisoformat(date_from)
+            query = query.gte("last_visit_date", date_from_obj.isoformat())
+        except ValueError:
+            pass
+    
+    if date_to:
+        try:
+            query = query.lt("last_visit_date", parse_range_end(date_to).isoformat())
+        except ValueError:
+            pass
+    
+    if position is not None:
+        # Descending order puts NULL keys first, then values, each tie broken by id
+        last_key, last_id = position.get("k"), position["id"]
+        if last_key is None:
+            after = f"and({sort_key}.is.null,id.lt.{last_id}),{sort_key}.not.is.null"
+        else:
+            after = f'{sort_key}.lt."{last_key}",and({sort_key}.eq."{last_key}",id.lt.{last_id})'
+            # Redundant with the or filter, but usable as an index condition on (sort_key, id)
+            query = query.lte(sort_key, last_key)
+        # postgrest-py has no or_() in the pinned version; add the PostgREST or filter directly
+        query.params = query.params.add("or", f"({after})")
+    
+    # A single order parameter: postgrest-py does not merge repeated order() calls
+    return query.order(f"{sort_key}.desc,id", desc=True).limit(limit)
+
+
+def _to_visitor_response(visitor: Dict[str, Any]) -> VisitorResponse:
+    return VisitorResponse(
+        id=visitor["id"],
+        company_name=visitor.get("company_name"),
+        country=visitor.get("country"),
+        device_type=visitor.get("device_type"),
+        industry=visitor.get("industry"),
+        visit_count=visitor.get("visit_count", 0),
+        total_time_spent=visitor.get("total_time_spent", 0),
+        pages_per_session=float(visitor.get("pages_per_session", 0)),
+        engagement_score=visitor.get("engagement_score", 0),
+        intent_score=visitor.get("intent_score", 0),
+        heat_level=visitor.get("heat_level", "Cold"),
+        last_visit_date=visitor.get("last_visit_date") or visitor.get("last_seen")
+    )
+
+
 @router.get("/visitors", response_model=List[VisitorResponse])
+@profiled("get_visitors")
 async def get_visitors(
     request: Request,
+    response: Response,
     sort_by: Optional[str] = Query("intent_score", description="Sort by: intent_score, visit_count, or last_visit_date"),
     limit: Optional[int] = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description="X-Next-Cursor value from the previous page"),
+    format: Optional[str] = Query("json", pattern="^(json|ndjson)$", description="json, or ndjson to stream every matching row"),
     country: Optional[str] = Query(None, description="Filter by country"),
     heat_level: Optional[str] = Query(None, description="Filter by heat level"),
     industry: Optional[str] = Query(None, description="Filter by industry"),
     date_from: Optional[str] = Query(None, description="Filter from date (YYYY-MM-DD)"),
-    date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD)")
+    date_to: Optional[str] = Query(None, description="Filter to date (YYYY-MM-DD), inclusive")
 ):
     """
     Get visitor list for admin dashboard with filters.
     
     Requires Bearer token authentication.
-    Returns visitors with filtering and sorting options.
+    Returns visitors with filtering and sorting options. Pages are keyset based:
+    when more rows may follow, the X-Next-Cursor response header holds the cursor
+    for the next page. With format=ndjson every row from the cursor onwards is
+    streamed, one JSON object per line, fetched limit rows at a time.
     """
     try:
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Missing Authorization header"
-            )
-        
-        try:
-            scheme, token = auth_header.split(" ")
-            if scheme.lower() != "bearer" or token != settings.admin_api_token:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid API token"
-                )
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid Authorization header format"
-            )
-        
-        db = get_db()
-        
-        query = db.table("visitors").select(
-            "id,company_name,country,device_type,industry,visit_count,"
-            "total_time_spent,pages_per_session,engagement_score,"
-            "intent_score,heat_level,last_visit_date"
-        )
+        verify_admin_request(request)
         
-        if country:
-            query = query.eq("country", country)
-        
-        if heat_level:
-            query = query.eq("heat_level", heat_level)
-        
-        if industry:
-            query = query.eq("industry", industry)
-        
-        if date_from:
-            try:
-                date_from_obj = datetime.fromisoformat(date_from)
-                query = query.gte("last_visit_date", date_from_obj.isoformat())
-            except ValueError:
-                pass
-        
-        if date_to:
-            try:
-                date_to_obj = datetime.fromisoformat(date_to)
-                query = query.lte("last_visit_date", date_to_obj.isoformat())
-            except ValueError:
-                pass
-        
-        if sort_by == "visit_count":
-            query = query.order("visit_count", desc=True)
-        elif sort_by == "last_visit_date":
-            query = query.order("last_visit_date", desc=True)
-        else:
-            query = query.order("intent_score", desc=True)
+        sort_key = sort_by if sort_by in VISITOR_SORT_KEYS else "intent_score"
+        position = decode_cursor(cursor, sort_key) if cursor else None
+        filters = {
+            "country": country,
+            "heat_level": heat_level,
+            "industry": industry,
+            "date_from": date_from,
+            "date_to": date_to
+        }
         
-        query = query.limit(limit)
+        if format == "ndjson":
+            return StreamingResponse(
+                _stream_visitors(sort_key, limit, filters, position),
+                media_type="application/x-ndjson"
+            )
         
-        result = query.execute()
+        result = await execute(_build_visitor_query(sort_key, limit, position=position, **filters))
         
-        visitors = []
-        for visitor in result.data:
-            visitors.append(VisitorResponse(
-                id=visitor["id"],
-                company_name=visitor.get("company_name"),
-                country=visitor.get("country"),
-                device_type=visitor.get("device_type"),
-                industry=visitor.get("industry"),
-                visit_count=visitor.get("visit_count", 0),
-                total_time_spent=visitor.get("total_time_spent", 0),
-                pages_per_session=float(visitor.get("pages_per_session", 0)),
-                engagement_score=visitor.get("engagement_score", 0),
-                intent_score=visitor.get("intent_score", 0),
-                heat_level=visitor.get("heat_level", "Cold"),
-                last_visit_date=visitor.get("last_visit_date") or visitor.get("last_seen")
-            ))
+        if len(result.data) == limit:
+            response.headers["X-Next-Cursor"] = encode_cursor(sort_key, result.data[-1])
         
-        return visitors
+        return [_to_visitor_response(visitor) for visitor in result.data]
     
     except HTTPException:
         raise
@@ -120,51 +234,298 @@ async def get_visitors(
         )
 
 
-@router.get("/filters")
-async def get_filter_options(request: Request):
-    """Get available filter options for the dashboard."""
-    try:
-        auth_header = request.headers.get("Authorization")
-        if not auth_header:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Missing Authorization header"
-            )
-        
+async def _stream_visitors(
+    sort_key: str,
+    page_size: int,
+    filters: Dict[str, Optional[str]],
+    position: Optional[Dict[str, Any]]
+) -> AsyncIterator[bytes]:
+    """Yield NDJSON lines page by page; only one page is held in memory."""
+    while True:
         try:
-            scheme, token = auth_header.split(" ")
-            if scheme.lower() != "bearer" or token != settings.admin_api_token:
-                raise HTTPException(
-                    status_code=status.HTTP_401_UNAUTHORIZED,
-                    detail="Invalid API token"
-                )
-        except ValueError:
-            raise HTTPException(
-                status_code=status.HTTP_401_UNAUTHORIZED,
-                detail="Invalid Authorization header format"
-            )
+            result = await execute(_build_visitor_query(sort_key, page_size, position=position, **filters))
+        except Exception as e:
+            # Re-raise so the chunked response is aborted instead of ending like a complete body
+            logger.error(f"Error streaming visitors: {e}")
+            raise
         
-        db = get_db()
-        
-        countries_result = db.table("visitors").select("country").not_.is_("country", "null").execute()
-        countries = sorted(list(set(v.get("country") for v in countries_result.data if v.get("country"))))
+        for visitor in result.data:
+            yield _to_visitor_response(visitor).model_dump_json().encode("utf-8") + b"\n"
         
-        industries_result = db.table("visitors").select("industry").not_.is_("industry", "null").execute()
-        industries = sorted(list(set(v.get("industry") for v in industries_result.data if v.get("industry"))))
+        if len(result.data) < page_size:
+            return
         
-        heat_levels = ["Cold", "Warm", "Hot", "Enterprise Ready"]
+        last = result.data[-1]
+        position = {"k": last.get(sort_key), "id": last["id"]}
+
+
+@router.get("/export/{table}")
+async def export_table(
+    request: Request,
+    table: str,
+    format: Optional[str] = Query("csv", pattern="^(csv|arrow)$", description="csv, or arrow (Arrow IPC stream)"),
+    after_id: Optional[str] = Query(None, description="Resume after this id (last id of an interrupted export)"),
+    country: Optional[str] = Query(None, description="Filter by country"),
+    heat_level: Optional[str] = Query(None, description="Filter by heat level"),
+    industry: Optional[str] = Query(None, description="Filter by industry"),
+    date_from: Optional[str] = Query(None, description="Filter from visitor last visit date (YYYY-MM-DD)"),
+    date_to: Optional[str] = Query(None, description="Filter to visitor last visit date (YYYY-MM-DD), inclusive")
+):
+    """
+    Stream visitors, sessions or page_events as CSV or Arrow.
+    
+    Rows are ordered by id and fetched in batches, so memory stays bounded. Sessions
+    and page events are limited to visitors matching the filters.
+    """
+    verify_admin_request(request)
+    
+    if table not in EXPORT_COLUMNS:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Unknown table. Choose one of: {', '.join(EXPORT_COLUMNS)}"
+        )
+    
+    filters = {
+        "country": country,
+        "heat_level": heat_level,
+        "industry": industry,
+        "date_from": date_from,
+        "date_to": date_to
+    }
+    
+    if format == "arrow":
+        if not arrow_available():
+            raise HTTPException(
+                status_code=status.HTTP_501_NOT_IMPLEMENTED,
+                detail="Arrow export requires the pyarrow package"
+            )
+        return StreamingResponse(
+            stream_arrow(table, filters, after_id),
+            media_type="application/vnd.apache.arrow.stream",
+            headers={"Content-Disposition": f'attachment; filename="{table}.arrows"'}
+        )
+    
+    return StreamingResponse(
+        stream_csv(table, filters, after_id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="{table}.csv"'}
+    )
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match header lists etag (or *)."""
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return "*" in candidates or any(
+        (candidate[2:] if candidate.startswith("W/") else candidate) == etag
+        for candidate in candidates
+    )
+
+
+@router.get("/filters")
+async def get_dashboard_filter_options(request: Request):
+    """
+    Get available filter options for the dashboard.
+    Cached server-side and revalidated with ETag / If-None-Match (304).
+    """
+    try:
+        verify_admin_request(request)
         
-        return {
-            "countries": countries,
-            "industries": industries,
-            "heat_levels": heat_levels
+        options, etag = await get_filter_options()
+        headers = {
+            "ETag": etag,
+            "Cache-Control": f"private, max-age={settings.filter_options_cache_seconds}"
         }
+        
+        if etag_matches(request, etag):
+            return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        
+        return JSONResponse(content=options, headers=headers)
     
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Error in get_filter_options: {e}")
+        logger.error(f"Error in get_dashboard_filter_options: {e}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Internal server error"
         )
+
+
+STATS_DIMENSIONS = ("country", "heat_level", "utm_source", "utm_medium", "utm_campaign", "page_url")
+
+
+def parse_stats_range(date_from: Optional[str], date_to: Optional[str], default_days: int):
+    """
+    (from, to) timestamps for the stats endpoints, to exclusive. to defaults to now
+    and from to default_days earlier; date_to=YYYY-MM-DD includes that day.
+    """
+    try:
+        end = parse_range_end(date_to) if date_to else datetime.utcnow()
+        start = datetime.fromisoformat(date_from) if date_from else end - timedelta(days=default_days)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="date_from and date_to must be ISO dates (YYYY-MM-DD)"
+        )
+    return start, end
+
+
+@router.get("/stats/traffic")
+async def get_traffic_stats(
+    request: Request,
+    granularity: Optional[str] = Query("day", pattern="^(hour|day)$"),
+    date_from: Optional[str] = Query(None, description="From date (YYYY-MM-DD), default 30 days (day) or 2 days (hour) ago"),
+    date_to: Optional[str] = Query(None, description="To date (YYYY-MM-DD), inclusive, default now"),
+    country: Optional[str] = Query(None, description="Filter by country"),
+    utm_source: Optional[str] = Query(None, description="Filter by UTM source")
+):
+    """Events, page views, new visitors/sessions and time spent per hour or day, from the rollups."""
+    verify_admin_request(request)
+    
+    start, end = parse_stats_range(date_from, date_to, 30 if granularity == "day" else 2)
+    
+    try:
+        db = get_db()
+        result = await execute(db.rpc("analytics_timeseries", {
+            "p_granularity": granularity,
+            "p_from": start.isoformat(),
+            "p_to": end.isoformat(),
+            "p_country": country,
+            "p_utm_source": utm_source
+        }))
+        return {"granularity": granularity, "from": start, "to": end, "series": result.data or []}
+    except Exception as e:
+        logger.error(f"Error in get_traffic_stats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+
+@router.get("/stats/breakdown")
+async def get_breakdown_stats(
+    request: Request,
+    dimension: str = Query("page_url", description=f"One of: {', '.join(STATS_DIMENSIONS)}"),
+    limit: Optional[int] = Query(20, ge=1, le=500),
+    date_from: Optional[str] = Query(None, description="From date (YYYY-MM-DD), default 30 days ago"),
+    date_to: Optional[str] = Query(None, description="To date (YYYY-MM-DD), inclusive, default now")
+):
+    """Top values of one dimension (top pages, countries, UTM sources...) by events, from the daily rollup."""
+    verify_admin_request(request)
+    
+    if dimension not in STATS_DIMENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"dimension must be one of: {', '.join(STATS_DIMENSIONS)}"
+        )
+    
+    start, end = parse_stats_range(date_from, date_to, 30)
+    
+    try:
+        db = get_db()
+        result = await execute(db.rpc("analytics_breakdown", {
+            "p_dimension": dimension,
+            "p_from": start.isoformat(),
+            "p_to": end.isoformat(),
+            "p_limit": limit
+        }))
+        return {"dimension": dimension, "from": start, "to": end, "rows": result.data or []}
+    except Exception as e:
+        logger.error(f"Error in get_breakdown_stats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+
+@router.get("/stats/heat-levels")
+async def get_heat_level_stats(request: Request):
+    """Current number of visitors per heat level (trigger-maintained counts)."""
+    verify_admin_request(request)
+    
+    try:
+        db = get_db()
+        result = await execute(db.table("visitor_heat_level_counts").select("heat_level,visitors"))
+        counts = {row["heat_level"]: row["visitors"] for row in result.data if row["heat_level"]}
+        levels = [level for _, level in HEAT_LEVEL_THRESHOLDS] + [TOP_HEAT_LEVEL]
+        return {"heat_levels": [{"heat_level": level, "visitors": counts.get(level, 0)} for level in levels]}
+    except Exception as e:
+        logger.error(f"Error in get_heat_level_stats: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
+
+
+@router.get("/cache-stats")
+async def get_cache_stats(request: Request):
+    """Get hit/miss/eviction and request coalescing counters for in-process lookup caches."""
+    verify_admin_request(request)
+    
+    return {
+        "geo": get_geo_cache_stats(),
+        "enrichment": get_enrichment_coalescing_stats(),
+        "visitors": get_visitor_cache_stats(),
+        "user_agents": get_user_agent_cache_stats(),
+        "filter_options": get_filter_options_cache_stats(),
+        "analytics_rollups": rollup_accumulator.stats(),
+        "visitor_locks": get_visitor_lock_stats()
+    }
+
+
+@router.get("/abuse-stats")
+async def get_abuse_detection_stats(request: Request):
+    """Get tracked IPs, memory footprint and block counts of the abuse detector."""
+    verify_admin_request(request)
+    
+    return get_abuse_stats()
+
+
+@router.post("/profiler/start")
+async def start_profiler(
+    request: Request,
+    duration_seconds: float = Query(60, gt=0, le=3600, description="Length of the profiling window"),
+    sample_every: int = Query(10, ge=1, description="Profile 1 in N track_page_view / get_visitors calls"),
+    interval_ms: float = Query(10, ge=1, le=1000, description="Stack sampling interval")
+):
+    """
+    Start sampling track_page_view and get_visitors on the worker serving this
+    request, discarding its previous profile.
+    """
+    verify_admin_request(request)
+    
+    profiler.start(duration_seconds, sample_every=sample_every, interval_ms=interval_ms)
+    return {"pid": os.getpid(), **profiler.stats()}
+
+
+@router.post("/profiler/stop")
+async def stop_profiler(request: Request):
+    """Close the profiling window early; the collected stacks stay available."""
+    verify_admin_request(request)
+    
+    profiler.stop()
+    return {"pid": os.getpid(), **profiler.stats()}
+
+
+@router.get("/profiler")
+async def get_profiler_status(request: Request):
+    """Window, sampled call and sample counts of this worker's profiler."""
+    verify_admin_request(request)
+    
+    return {"pid": os.getpid(), **profiler.stats()}
+
+
+@router.get("/profiler/collapsed")
+async def get_profile(request: Request):
+    """This worker's stack samples in the collapsed format (flamegraph.pl, speedscope)."""
+    verify_admin_request(request)
+    
+    return Response(
+        content=profiler.collapsed(),
+        media_type="text/plain",
+        headers={"Content-Disposition": f'attachment; filename="profile-{os.getpid()}.collapsed"'}
+    )
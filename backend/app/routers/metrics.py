@@ -0,0 +1,74 @@
+from fastapi import APIRouter, Request, HTTPException, status
+from fastapi.responses import Response
+from app.core.config import settings
+from app.core.database import db_executor_backlog
+from app.core.metrics import registry, render_metrics
+from app.routers.admin import verify_admin_request
+from app.services.geo_service import get_geo_cache_stats
+from app.services.visitor_cache import get_visitor_cache_stats
+from app.services.user_agent_parser import get_user_agent_cache_stats
+from app.services.filter_options import get_filter_options_cache_stats
+from app.services.tracking_queue import tracking_queue
+from app.services.analytics_rollup import rollup_accumulator
+
+router = APIRouter(tags=["metrics"])
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _cache_stats():
+    visitor_caches = get_visitor_cache_stats()
+    return {
+        "geo": get_geo_cache_stats(),
+        "visitors": visitor_caches["visitors"],
+        "sessions": visitor_caches["sessions"],
+        "user_agents": get_user_agent_cache_stats(),
+        "filter_options": get_filter_options_cache_stats(),
+    }
+
+
+# Read from the services' own counters at scrape time
+registry.collected(
+    "cache_hits_total",
+    "In-process cache hits (geo hit rate: rate of geo hits / rate of geo hits + misses)",
+    ("cache",),
+    lambda: {(name,): stats["hits"] for name, stats in _cache_stats().items()},
+    kind="counter"
+)
+registry.collected(
+    "cache_misses_total",
+    "In-process cache misses",
+    ("cache",),
+    lambda: {(name,): stats["misses"] for name, stats in _cache_stats().items()},
+    kind="counter"
+)
+registry.collected(
+    "queue_depth",
+    "Pending items: tracking jobs, queries waiting for a DB thread, unflushed rollup keys",
+    ("queue",),
+    lambda: {
+        ("tracking",): tracking_queue.depth(),
+        ("db_executor",): db_executor_backlog(),
+        ("analytics_rollups",): rollup_accumulator.stats()["pending_keys"],
+    }
+)
+registry.collected(
+    "tracking_queue_jobs_total",
+    "Tracking queue jobs by outcome",
+    ("outcome",),
+    lambda: {
+        (outcome,): value for outcome, value in tracking_queue.stats().items()
+        if outcome in ("enqueued", "processed", "failed", "rejected")
+    },
+    kind="counter"
+)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus scrape endpoint (Bearer admin token)."""
+    if not settings.metrics_enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    verify_admin_request(request)
+    
+    return Response(content=render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
@@ -1,9 +1,12 @@
-from fastapi import APIRouter, Request, HTTPException, status
+from fastapi import APIRouter, Depends, Request, HTTPException, status
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.request_context import get_request_context
 from app.models.schemas import TrackRequest
-from app.services.tracking_service import track_page_view
-from app.middleware.rate_limit import limiter, get_rate_limit
-from slowapi.errors import RateLimitExceeded
-from slowapi import _rate_limit_exceeded_handler
+from app.services.tracking_service import track_page_view, track_page_view_batch
+from app.services.tracking_queue import tracking_queue, TrackJob
+from app.middleware.rate_limit import rate_limit
+from typing import List
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,8 +14,20 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/track", tags=["tracking"])
 
 
-@router.post("")
-@limiter.limit(get_rate_limit())
+def _queue_rejected_response() -> JSONResponse:
+    """
+    Shed load when the tracking queue is full or not running.
+    The queue backs up when the database is slow, so processing inline would only add to it.
+    """
+    logger.warning("Tracking queue unavailable or full, rejecting event")
+    return JSONResponse(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        content={"status": "rejected", "message": "Tracking queue is full, retry later"},
+        headers={"Retry-After": str(settings.tracking_queue_retry_after_seconds)}
+    )
+
+
+@router.post("", dependencies=[Depends(rate_limit)])
 async def track(request: Request, track_data: TrackRequest):
     """
     Track page view and visitor activity.
@@ -24,15 +39,29 @@ async def track(request: Request, track_data: TrackRequest):
     - scroll_depth: Scroll depth percentage (0-100)
     - click_target: Target element of click event
     - utm_source, utm_medium, utm_campaign: UTM parameters
+    
+    When the tracking queue is enabled the event is accepted with 202 and
+    processed in the background, or refused with 503 and Retry-After when
+    the queue is full.
     """
     try:
-        request_headers = dict(request.headers)
-        screen_resolution = request_headers.get("x-screen-resolution")
+        context = get_request_context(request)
+        
+        if settings.tracking_queue_enabled:
+            job = TrackJob(
+                events=[track_data],
+                context=context
+            )
+            if tracking_queue.enqueue(job):
+                return JSONResponse(
+                    status_code=status.HTTP_202_ACCEPTED,
+                    content={"status": "accepted"}
+                )
+            return _queue_rejected_response()
         
         result = await track_page_view(
             track_data=track_data,
-            request_headers=request_headers,
-            screen_resolution=screen_resolution
+            context=context
         )
         
         if result.get("status") == "error":
@@ -41,8 +70,6 @@ async def track(request: Request, track_data: TrackRequest):
         
         return {"status": "success", "data": result}
     
-    except RateLimitExceeded:
-        raise
     except Exception as e:
         logger.error(f"Unexpected error in track endpoint: {e}")
         raise HTTPException(
@@ -50,3 +77,57 @@ async def track(request: Request, track_data: TrackRequest):
             detail="Internal server error"
         )
 
+
+
+@router.post("/batch", dependencies=[Depends(rate_limit)])
+async def track_batch(request: Request, events: List[TrackRequest]):
+    """
+    Track a burst of events (page_view, scroll, click) from one page session.
+    
+    Accepts a JSON array of tracking events with the same fields as POST /api/track.
+    The visitor and session are resolved once and all events are written together.
+    """
+    if not events:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="At least one event is required"
+        )
+    
+    if len(events) > settings.tracking_batch_max_events:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Batch exceeds {settings.tracking_batch_max_events} events"
+        )
+    
+    try:
+        context = get_request_context(request)
+        
+        if settings.tracking_queue_enabled:
+            job = TrackJob(
+                events=events,
+                context=context
+            )
+            if tracking_queue.enqueue(job):
+                return JSONResponse(
+                    status_code=status.HTTP_202_ACCEPTED,
+                    content={"status": "accepted", "events": len(events)}
+                )
+            return _queue_rejected_response()
+        
+        result = await track_page_view_batch(
+            events=events,
+            context=context
+        )
+        
+        if result.get("status") == "error":
+            logger.warning(f"Batch tracking error: {result.get('message')}")
+            return {"status": "error", "message": result.get("message")}
+        
+        return {"status": "success", "data": result}
+    
+    except Exception as e:
+        logger.error(f"Unexpected error in track batch endpoint: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail="Internal server error"
+        )
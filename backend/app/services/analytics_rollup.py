@@ -0,0 +1,171 @@
+"""
+Analytics rollups - incremental feed for the analytics_hourly / analytics_daily tables.
+
+The tracking path records each tracked event into an in-process accumulator keyed
+by (hour, country, heat_level, utm_source, utm_medium, utm_campaign, page_url).
+A background task flushes the summed deltas every ANALYTICS_FLUSH_SECONDS through
+the increment_analytics_rollups database function (one round trip per flush), so
+tracking never waits on the rollups and dashboards read only pre-aggregated rows.
+rebuild_analytics_rollups (see scripts/rebuild_analytics_rollups.py) recomputes a
+time range from raw events, e.g. after a crash lost unflushed deltas.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.database import get_db, execute
+from app.models.schemas import TrackRequest
+
+logger = logging.getLogger(__name__)
+
+DIMENSIONS = ("bucket", "country", "heat_level", "utm_source", "utm_medium", "utm_campaign", "page_url")
+METRICS = ("events", "page_views", "new_visitors", "new_sessions", "time_spent")
+
+RollupKey = Tuple[str, str, str, str, str, str, str]
+
+
+class RollupAccumulator:
+    """Sums rollup deltas in memory and flushes them to the database periodically."""
+    
+    def __init__(self, flush_seconds: float, max_pending_keys: int):
+        self.flush_seconds = flush_seconds
+        self.max_pending_keys = max(1, max_pending_keys)
+        self._pending: Dict[RollupKey, List[int]] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+        
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.failed_flushes = 0
+        self.dropped_keys = 0
+    
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+    
+    def record(
+        self,
+        events: List[TrackRequest],
+        country: Optional[str],
+        heat_level: Optional[str],
+        is_new_visitor: bool,
+        is_new_session: bool,
+        fallback_utm: Optional[Dict[str, Any]] = None,
+        now: Optional[datetime] = None
+    ):
+        """
+        Add the events of one tracking call.
+        The first event carries the new visitor / new session counts; UTM parameters
+        come from the event, falling back to the visitor's stored values.
+        """
+        now = now or datetime.utcnow()
+        bucket = now.replace(minute=0, second=0, microsecond=0).isoformat()
+        fallback_utm = fallback_utm or {}
+        
+        for index, event in enumerate(events):
+            key = (
+                bucket,
+                country or "",
+                heat_level or "",
+                event.utm_source or fallback_utm.get("utm_source") or "",
+                event.utm_medium or fallback_utm.get("utm_medium") or "",
+                event.utm_campaign or fallback_utm.get("utm_campaign") or "",
+                event.page_url or ""
+            )
+            
+            metrics = self._pending.get(key)
+            if metrics is None:
+                if len(self._pending) >= self.max_pending_keys:
+                    self.dropped_keys += 1
+                    continue
+                metrics = self._pending[key] = [0, 0, 0, 0, 0]
+            
+            metrics[0] += 1
+            metrics[1] += 1 if event.event_type == "page_view" else 0
+            metrics[2] += 1 if is_new_visitor and index == 0 else 0
+            metrics[3] += 1 if is_new_session and index == 0 else 0
+            metrics[4] += event.time_spent or 0
+    
+    async def flush(self) -> int:
+        """Write pending deltas. On failure they are merged back for the next flush."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            
+            pending, self._pending = self._pending, {}
+            rows = [
+                {**dict(zip(DIMENSIONS, key)), **dict(zip(METRICS, metrics))}
+                for key, metrics in pending.items()
+            ]
+            
+            try:
+                await execute(get_db().rpc("increment_analytics_rollups", {"p_rows": rows}))
+            except Exception as e:
+                self.failed_flushes += 1
+                logger.error(f"Error flushing analytics rollups ({len(rows)} rows): {e}")
+                for key, metrics in pending.items():
+                    current = self._pending.get(key)
+                    if current is None:
+                        if len(self._pending) >= self.max_pending_keys:
+                            self.dropped_keys += 1
+                            continue
+                        self._pending[key] = metrics
+                    else:
+                        for i, value in enumerate(metrics):
+                            current[i] += value
+                return 0
+            
+            self.flushes += 1
+            self.flushed_rows += len(rows)
+            return len(rows)
+    
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+    
+    async def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run(), name="analytics-rollup-flush")
+        logger.info(f"Analytics rollups enabled - flushing every {self.flush_seconds}s")
+    
+    async def stop(self):
+        """Stop the flush loop and write whatever is pending."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        await self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.analytics_rollups_enabled,
+            "pending_keys": len(self._pending),
+            "max_pending_keys": self.max_pending_keys,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "failed_flushes": self.failed_flushes,
+            "dropped_keys": self.dropped_keys,
+        }
+
+
+rollup_accumulator = RollupAccumulator(
+    flush_seconds=settings.analytics_flush_seconds,
+    max_pending_keys=settings.analytics_max_pending_keys
+)
+
+
+def record_tracked_events(
+    events: List[TrackRequest],
+    country: Optional[str],
+    heat_level: Optional[str],
+    is_new_visitor: bool,
+    is_new_session: bool,
+    fallback_utm: Optional[Dict[str, Any]] = None
+):
+    """Feed one tracking call into the rollups (no-op unless ANALYTICS_ROLLUPS_ENABLED)."""
+    if not settings.analytics_rollups_enabled:
+        return
+    rollup_accumulator.record(events, country, heat_level, is_new_visitor, is_new_session, fallback_utm)
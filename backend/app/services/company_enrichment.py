@@ -8,9 +8,13 @@ Placeholder for future integration with:
 
 import logging
 from typing import Optional, Dict, Any
+from app.core.singleflight import SingleFlight
 
 logger = logging.getLogger(__name__)
 
+_enrichment_flight = SingleFlight("company_enrichment")
+_company_ip_flight = SingleFlight("company_from_ip")
+
 
 async def enrich_company_data(domain: str, ip_address: str) -> Optional[Dict[str, Any]]:
     """
@@ -28,7 +32,16 @@ async def enrich_company_data(domain: str, ip_address: str) -> Optional[Dict[str
         
     Returns:
         Dict with enriched company data or None
+    
+    Concurrent calls for the same domain and IP share one provider lookup.
     """
+    return await _enrichment_flight.do(
+        (domain, ip_address),
+        lambda: _enrich_company_data(domain, ip_address)
+    )
+
+
+async def _enrich_company_data(domain: str, ip_address: str) -> Optional[Dict[str, Any]]:
     logger.info(f"Company enrichment placeholder called for domain: {domain}, IP: {ip_address}")
     
     return None
@@ -39,8 +52,20 @@ async def get_company_from_ip(ip_address: str) -> Optional[Dict[str, Any]]:
     Attempt to identify company from IP address.
     
     Placeholder for future implementation.
+    Concurrent calls for the same IP share one provider lookup.
     """
+    return await _company_ip_flight.do(ip_address, lambda: _get_company_from_ip(ip_address))
+
+
+async def _get_company_from_ip(ip_address: str) -> Optional[Dict[str, Any]]:
     logger.info(f"Company lookup from IP placeholder called for IP: {ip_address}")
     
     return None
 
+
+def get_enrichment_coalescing_stats() -> Dict[str, Any]:
+    """How many enrichment calls were coalesced into in-flight lookups."""
+    return {
+        "company_enrichment": _enrichment_flight.stats(),
+        "company_from_ip": _company_ip_flight.stats()
+    }
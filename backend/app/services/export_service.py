@@ -0,0 +1,243 @@
+"""
+Bulk export of visitors, sessions and page events.
+
+Rows are read in keyset-paginated batches ordered by id, so memory is bounded by
+one batch and an interrupted export resumes from the last exported id. Filters
+select a set of visitors (same filters as /api/admin/visitors); sessions and
+page events are restricted to those visitors through PostgREST !inner embeds.
+
+Formats: CSV (always) and Arrow/Parquet (requires the optional pyarrow package).
+"""
+import csv
+import io
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+from app.core.config import settings
+from app.core.database import get_db, execute
+from app.core.date_range import parse_range_end
+
+logger = logging.getLogger(__name__)
+
+# Exported columns and their types (str, int, float, timestamp) per table
+EXPORT_COLUMNS: Dict[str, Dict[str, str]] = {
+    "visitors": {
+        "id": "str",
+        "company_name": "str",
+        "industry": "str",
+        "company_size": "str",
+        "revenue_estimate": "str",
+        "country": "str",
+        "region": "str",
+        "city": "str",
+        "timezone": "str",
+        "device_type": "str",
+        "browser": "str",
+        "os": "str",
+        "referrer": "str",
+        "utm_source": "str",
+        "utm_medium": "str",
+        "utm_campaign": "str",
+        "first_visit_date": "timestamp",
+        "last_visit_date": "timestamp",
+        "visit_count": "int",
+        "total_time_spent": "int",
+        "avg_session_duration": "int",
+        "pages_per_session": "float",
+        "total_page_views": "int",
+        "most_visited_page": "str",
+        "engagement_score": "int",
+        "intent_score": "int",
+        "heat_level": "str",
+    },
+    "sessions": {
+        "id": "str",
+        "visitor_id": "str",
+        "session_start": "timestamp",
+        "session_end": "timestamp",
+        "session_duration": "int",
+        "pages_visited_count": "int",
+        "created_at": "timestamp",
+    },
+    "page_events": {
+        "id": "str",
+        "session_id": "str",
+        "page_url": "str",
+        "event_type": "str",
+        "scroll_depth": "int",
+        "click_target": "str",
+        "time_spent": "int",
+        "timestamp": "timestamp",
+        "created_at": "timestamp",
+    },
+}
+
+# How each table reaches the visitors table for filtering: (embed, filter column prefix)
+VISITOR_JOINS = {
+    "visitors": ("", ""),
+    "sessions": ("visitors!inner(id)", "visitors."),
+    "page_events": ("sessions!inner(visitors!inner(id))", "sessions.visitors."),
+}
+
+EXPORT_FILTERS = ("country", "heat_level", "industry", "date_from", "date_to")
+
+
+def _build_export_query(table: str, filters: Dict[str, Optional[str]], after_id: Optional[str], batch_size: int):
+    db = get_db()
+    embed, prefix = VISITOR_JOINS[table]
+    active = {name: value for name, value in filters.items() if value}
+    
+    columns = ",".join(EXPORT_COLUMNS[table])
+    if active and embed:
+        columns = f"{columns},{embed}"
+    
+    query = db.table(table).select(columns)
+    
+    for name in ("country", "heat_level", "industry"):
+        if active.get(name):
+            query = query.eq(f"{prefix}{name}", active[name])
+    
+    if active.get("date_from"):
+        try:
+            query = query.gte(f"{prefix}last_visit_date", datetime.fromisoformat(active["date_from"]).isoformat())
+        except ValueError:
+            pass
+    
+    if active.get("date_to"):
+        try:
+            query = query.lt(f"{prefix}last_visit_date", parse_range_end(active["date_to"]).isoformat())
+        except ValueError:
+            pass
+    
+    if after_id:
+        query = query.gt("id", after_id)
+    
+    return query.order("id").limit(batch_size)
+
+
+async def iter_export_batches(
+    table: str,
+    filters: Dict[str, Optional[str]],
+    after_id: Optional[str] = None,
+    batch_size: Optional[int] = None
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield batches of rows ordered by id, starting after after_id."""
+    if table not in EXPORT_COLUMNS:
+        raise ValueError(f"Unknown export table: {table}")
+    
+    batch_size = batch_size or settings.export_batch_size
+    
+    while True:
+        result = await execute(_build_export_query(table, filters, after_id, batch_size))
+        if not result.data:
+            return
+        
+        yield result.data
+        
+        if len(result.data) < batch_size:
+            return
+        after_id = result.data[-1]["id"]
+
+
+def rows_to_csv(table: str, rows: List[Dict[str, Any]], header: bool = False) -> str:
+    """Render rows as CSV text with the table's export columns."""
+    columns = list(EXPORT_COLUMNS[table])
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(columns)
+    for row in rows:
+        writer.writerow(["" if row.get(column) is None else row.get(column) for column in columns])
+    return buffer.getvalue()
+
+
+def arrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def _parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def arrow_schema(table: str):
+    import pyarrow as pa
+    
+    types = {"str": pa.string(), "int": pa.int64(), "float": pa.float64(), "timestamp": pa.timestamp("us")}
+    return pa.schema([(column, types[kind]) for column, kind in EXPORT_COLUMNS[table].items()])
+
+
+def rows_to_record_batch(table: str, rows: List[Dict[str, Any]]):
+    """Convert rows to a typed pyarrow RecordBatch."""
+    import pyarrow as pa
+    
+    schema = arrow_schema(table)
+    arrays = []
+    for column, kind in EXPORT_COLUMNS[table].items():
+        values = [row.get(column) for row in rows]
+        if kind == "timestamp":
+            values = [_parse_timestamp(value) for value in values]
+        elif kind == "float":
+            values = [None if value is None else float(value) for value in values]
+        arrays.append(pa.array(values, type=schema.field(column).type))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+
+async def stream_csv(
+    table: str,
+    filters: Dict[str, Optional[str]],
+    after_id: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """CSV export as a byte stream, one chunk per batch. The header is sent first."""
+    yield rows_to_csv(table, [], header=True).encode("utf-8")
+    async for rows in iter_export_batches(table, filters, after_id):
+        yield rows_to_csv(table, rows).encode("utf-8")
+
+
+class _ChunkSink(io.RawIOBase):
+    """Writable file object that hands out what has been written since the last take()."""
+    
+    def __init__(self):
+        super().__init__()
+        self._chunks: List[bytes] = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, data) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        return len(chunk)
+    
+    def take(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+async def stream_arrow(
+    table: str,
+    filters: Dict[str, Optional[str]],
+    after_id: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """Arrow IPC stream export, one record batch per database batch."""
+    import pyarrow as pa
+    
+    sink = _ChunkSink()
+    writer = pa.ipc.new_stream(sink, arrow_schema(table))
+    yield sink.take()
+    
+    async for rows in iter_export_batches(table, filters, after_id):
+        writer.write_batch(rows_to_record_batch(table, rows))
+        yield sink.take()
+    
+    writer.close()
+    yield sink.take()
@@ -0,0 +1,80 @@
+"""
+Admin dashboard filter options (distinct countries, industries, heat levels).
+
+Distinct values come from the get_visitor_filter_options database function
+(a loose index scan, see database/schema_enhanced.sql) instead of transferring
+the country and industry columns of every visitor. The result and its ETag are
+cached for FILTER_OPTIONS_CACHE_SECONDS, and concurrent misses share one load.
+Countries and industries seen for the first time appear once the entry expires;
+there is no explicit invalidation, which would not reach the other workers anyway.
+"""
+import hashlib
+import json
+import logging
+from typing import Any, Dict, List, Tuple
+from app.core.cache import TTLCache
+from app.core.config import settings
+from app.core.database import get_db, execute
+from app.core.singleflight import SingleFlight
+from app.services.intent_calculator import HEAT_LEVEL_THRESHOLDS, TOP_HEAT_LEVEL
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "filter_options"
+
+_cache = TTLCache(max_entries=1, ttl_seconds=settings.filter_options_cache_seconds)
+_flight = SingleFlight("filter_options")
+
+
+async def _scan_distinct(column: str) -> List[str]:
+    """Fallback for databases without the RPC: read the column of every visitor."""
+    db = get_db()
+    result = await execute(db.table("visitors").select(column).not_.is_(column, "null"))
+    return [row.get(column) for row in result.data]
+
+
+async def _load_distinct_values() -> Tuple[List[str], List[str]]:
+    db = get_db()
+    try:
+        result = await execute(db.rpc("get_visitor_filter_options", {}))
+        data = result.data or {}
+        countries = data.get("countries") or []
+        industries = data.get("industries") or []
+    except Exception as e:
+        logger.warning(f"get_visitor_filter_options RPC unavailable, scanning visitors: {e}")
+        countries = await _scan_distinct("country")
+        industries = await _scan_distinct("industry")
+    
+    return (
+        sorted(set(value for value in countries if value)),
+        sorted(set(value for value in industries if value))
+    )
+
+
+async def _load_filter_options() -> Tuple[Dict[str, Any], str]:
+    countries, industries = await _load_distinct_values()
+    options = {
+        "countries": countries,
+        "industries": industries,
+        "heat_levels": [level for _, level in HEAT_LEVEL_THRESHOLDS] + [TOP_HEAT_LEVEL]
+    }
+    
+    body = json.dumps(options, sort_keys=True, separators=(",", ":"))
+    etag = '"' + hashlib.sha256(body.encode("utf-8")).hexdigest()[:32] + '"'
+    
+    _cache.set(CACHE_KEY, (options, etag))
+    return options, etag
+
+
+async def get_filter_options() -> Tuple[Dict[str, Any], str]:
+    """Return (filter options, ETag), served from the cache when fresh."""
+    cached = _cache.get(CACHE_KEY)
+    if cached is not None:
+        return cached
+    return await _flight.do(CACHE_KEY, _load_filter_options)
+
+
+def get_filter_options_cache_stats() -> Dict[str, Any]:
+    stats = _cache.stats()
+    stats["coalescing"] = _flight.stats()
+    return stats
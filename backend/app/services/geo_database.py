@@ -0,0 +1,219 @@
+"""
+Offline geo resolution from a local, memory-mapped IP range index.
+
+The index is compiled from a CSV range file (see scripts/build_geo_index.py)
+into a compact binary file:
+
+    header      8s magic, uint32 record count, uint32 location count
+    records     sorted (start ip, end ip, location index); ips are 16-byte
+                big-endian IPv6 addresses, IPv4 is stored IPv4-mapped
+    offsets     (location count + 1) uint32 offsets into the location blob
+    blob        utf-8 "country<US>region<US>city<US>timezone" per location
+
+The file is mapped read-only, so every uvicorn worker shares the same pages
+from the OS page cache, and lookups are a binary search over the records.
+"""
+import csv
+import ipaddress
+import logging
+import mmap
+import struct
+from typing import Dict, List, Optional, Tuple
+from app.models.schemas import GeoData
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"MMKKGEO1"
+HEADER = struct.Struct(">8sII")
+RECORD = struct.Struct(">16s16sI")
+OFFSET = struct.Struct(">I")
+FIELD_SEPARATOR = "\x1f"
+
+LOCATION_FIELDS = ("country", "region", "city", "timezone")
+# Accepted CSV column names for each location field
+COLUMN_ALIASES = {
+    "country": ("country", "country_code", "country_iso_code"),
+    "region": ("region", "region_name", "subdivision_1_name"),
+    "city": ("city", "city_name"),
+    "timezone": ("timezone", "time_zone"),
+}
+
+
+def ip_key(ip_address: str) -> Optional[bytes]:
+    """16-byte sortable key for an IP address, or None if it is not valid."""
+    try:
+        ip = ipaddress.ip_address(int(ip_address) if ip_address.isdigit() else ip_address)
+    except ValueError:
+        return None
+    
+    if ip.version == 4:
+        ip = ipaddress.IPv6Address(b"\x00" * 10 + b"\xff\xff" + ip.packed)
+    return ip.packed
+
+
+class GeoDatabase:
+    """Read-only view of a compiled geo index file."""
+    
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        try:
+            self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except Exception:
+            self._file.close()
+            raise
+        
+        magic, self.record_count, self.location_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a geo index file")
+        
+        self._records_offset = HEADER.size
+        self._offsets_offset = self._records_offset + self.record_count * RECORD.size
+        self._blob_offset = self._offsets_offset + (self.location_count + 1) * OFFSET.size
+        self._locations: Dict[int, GeoData] = {}
+    
+    def _location(self, index: int) -> GeoData:
+        geo_data = self._locations.get(index)
+        if geo_data is None:
+            start = OFFSET.unpack_from(self._mm, self._offsets_offset + index * OFFSET.size)[0]
+            end = OFFSET.unpack_from(self._mm, self._offsets_offset + (index + 1) * OFFSET.size)[0]
+            raw = self._mm[self._blob_offset + start:self._blob_offset + end].decode("utf-8")
+            values = [value or None for value in raw.split(FIELD_SEPARATOR)]
+            geo_data = GeoData(**dict(zip(LOCATION_FIELDS, values)))
+            self._locations[index] = geo_data
+        return geo_data
+    
+    def lookup(self, ip_address: str) -> Optional[GeoData]:
+        """Return geo data for the range containing ip_address, or None on a miss."""
+        key = ip_key(ip_address)
+        if key is None or self.record_count == 0:
+            return None
+        
+        mm = self._mm
+        base = self._records_offset
+        size = RECORD.size
+        
+        # Rightmost record whose start is <= key
+        lo, hi = 0, self.record_count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            offset = base + mid * size
+            if mm[offset:offset + 16] <= key:
+                lo = mid + 1
+            else:
+                hi = mid
+        
+        if lo == 0:
+            return None
+        
+        _, end, location_index = RECORD.unpack_from(mm, base + (lo - 1) * size)
+        if key > end:
+            return None
+        
+        return self._location(location_index)
+    
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+def _parse_range(row: Dict[str, str]) -> Optional[Tuple[bytes, bytes]]:
+    if row.get("network"):
+        try:
+            network = ipaddress.ip_network(row["network"].strip(), strict=False)
+        except ValueError:
+            return None
+        start, end = ip_key(str(network.network_address)), ip_key(str(network.broadcast_address))
+    else:
+        start, end = ip_key((row.get("start_ip") or "").strip()), ip_key((row.get("end_ip") or "").strip())
+    
+    if start is None or end is None or start > end:
+        return None
+    return start, end
+
+
+def build_geo_index(csv_path: str, output_path: str) -> int:
+    """
+    Compile a CSV range file into a geo index file.
+    
+    The CSV needs either start_ip/end_ip columns (dotted, IPv6 or integer form)
+    or a network column (CIDR), plus any of country, region, city, timezone.
+    Returns the number of ranges written.
+    """
+    records: List[Tuple[bytes, bytes, int]] = []
+    locations: Dict[Tuple[str, ...], int] = {}
+    skipped = 0
+    
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        columns = {name.lower(): name for name in (reader.fieldnames or [])}
+        field_columns = {
+            field: next((columns[alias] for alias in aliases if alias in columns), None)
+            for field, aliases in COLUMN_ALIASES.items()
+        }
+        
+        for row in reader:
+            row = {key.lower(): value for key, value in row.items() if key}
+            ip_range = _parse_range(row)
+            if ip_range is None:
+                skipped += 1
+                continue
+            
+            location = tuple(
+                (row.get(column.lower()) or "").strip().replace(FIELD_SEPARATOR, " ") if column else ""
+                for column in (field_columns[field] for field in LOCATION_FIELDS)
+            )
+            location_index = locations.setdefault(location, len(locations))
+            records.append((ip_range[0], ip_range[1], location_index))
+    
+    records.sort()
+    
+    blobs = [FIELD_SEPARATOR.join(location).encode("utf-8") for location in locations]
+    
+    with open(output_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, len(records), len(blobs)))
+        for record in records:
+            out.write(RECORD.pack(*record))
+        
+        offset = 0
+        out.write(OFFSET.pack(offset))
+        for blob in blobs:
+            offset += len(blob)
+            out.write(OFFSET.pack(offset))
+        for blob in blobs:
+            out.write(blob)
+    
+    if skipped:
+        logger.warning(f"Skipped {skipped} invalid rows while building {output_path}")
+    return len(records)
+
+
+_geo_database: Optional[GeoDatabase] = None
+_load_failed = False
+
+
+def get_geo_database() -> Optional[GeoDatabase]:
+    """Open the configured geo index on first use. Returns None if not configured."""
+    global _geo_database, _load_failed
+    
+    if _geo_database is not None or not settings.geo_database_path or _load_failed:
+        return _geo_database
+    
+    try:
+        _geo_database = GeoDatabase(settings.geo_database_path)
+        logger.info(f"Loaded geo index {settings.geo_database_path} ({_geo_database.record_count} ranges)")
+    except Exception as e:
+        _load_failed = True
+        logger.error(f"Failed to load geo index {settings.geo_database_path}: {e}")
+    
+    return _geo_database
+
+
+def lookup_local_geo(ip_address: str) -> Optional[GeoData]:
+    """Resolve an IP from the local geo index. Returns None if unavailable or not found."""
+    database = get_geo_database()
+    if database is None:
+        return None
+    return database.lookup(ip_address)
@@ -1,37 +1,158 @@
-import httpx
+import ipaddress
+import json
 import logging
-from typing import Optional
+from typing import Optional, Tuple, Dict, Any
 from app.models.schemas import GeoData
 from app.core.config import settings
+from app.core.cache import TTLCache
+from app.core.singleflight import SingleFlight
+from app.core.redis_client import get_redis
+from app.core.http_client import http_get
+from app.services.geo_database import lookup_local_geo
 
 logger = logging.getLogger(__name__)
 
+SHARED_CACHE_PREFIX = "geo:"
 
-async def get_geo_data(ip_address: str) -> GeoData:
+_geo_cache = TTLCache(
+    max_entries=settings.geo_cache_max_entries,
+    ttl_seconds=settings.geo_cache_ttl_seconds
+)
+_geo_flight = SingleFlight("geo")
+_shared_hits = 0
+_shared_errors = 0
+
+
+def geo_cache_key(ip_address: str) -> str:
+    """
+    Cache key for an IP address.
+    With geo_cache_by_prefix enabled, IPv4 addresses share a /24 and IPv6 a /48.
+    """
+    if not settings.geo_cache_by_prefix:
+        return ip_address
+    
+    try:
+        ip = ipaddress.ip_address(ip_address)
+    except ValueError:
+        return ip_address
+    
+    prefix = 24 if ip.version == 4 else 48
+    return str(ipaddress.ip_network(f"{ip}/{prefix}", strict=False))
+
+
+async def _get_shared(key: str) -> Optional[GeoData]:
+    """Read a geo entry from the shared Redis cache, if configured."""
+    global _shared_hits, _shared_errors
+    
+    redis = get_redis()
+    if redis is None:
+        return None
+    
+    try:
+        raw = await redis.get(SHARED_CACHE_PREFIX + key)
+    except Exception as e:
+        _shared_errors += 1
+        logger.debug(f"Shared geo cache read failed for {key}: {e}")
+        return None
+    
+    if raw is None:
+        return None
+    
+    _shared_hits += 1
+    return GeoData(**json.loads(raw))
+
+
+async def _set_shared(key: str, geo_data: GeoData, ttl_seconds: int):
+    """Write a geo entry to the shared Redis cache, if configured."""
+    global _shared_errors
+    
+    redis = get_redis()
+    if redis is None:
+        return
+    
+    try:
+        await redis.set(SHARED_CACHE_PREFIX + key, geo_data.model_dump_json(), ex=ttl_seconds)
+    except Exception as e:
+        _shared_errors += 1
+        logger.debug(f"Shared geo cache write failed for {key}: {e}")
+
+
+async def fetch_geo_data(ip_address: str) -> Tuple[GeoData, bool]:
     """
     Fetch geo data from ipinfo.io API.
-    Falls back to minimal data if API fails.
+    Returns (geo_data, ok); ok is False when the lookup failed.
     """
     try:
-        url = f"https://ipinfo.io/{ip_address}/json"
+        url = f"{settings.ipinfo_base_url.rstrip('/')}/{ip_address}/json"
         headers = {}
         
         if settings.ipinfo_token:
             headers["Authorization"] = f"Bearer {settings.ipinfo_token}"
         
-        async with httpx.AsyncClient(timeout=5.0) as client:
-            response = await client.get(url, headers=headers)
-            
-            if response.status_code == 200:
-                data = response.json()
-                return GeoData(
-                    country=data.get("country"),
-                    region=data.get("region"),
-                    city=data.get("city"),
-                    timezone=data.get("timezone")
-                )
+        response = await http_get(url, headers=headers)
+        
+        if response.status_code == 200:
+            data = response.json()
+            return GeoData(
+                country=data.get("country"),
+                region=data.get("region"),
+                city=data.get("city"),
+                timezone=data.get("timezone")
+            ), True
     except Exception as e:
         logger.warning(f"Failed to fetch geo data for IP {ip_address}: {e}")
     
-    return GeoData()
+    return GeoData(), False
+
+
+async def get_geo_data(ip_address: str) -> GeoData:
+    """
+    Get geo data for an IP address.
+    Resolved from the local geo index first; on a miss served from the local
+    TTL/LRU cache, then the shared cache, then ipinfo.io.
+    Failed lookups are cached briefly as empty results.
+    """
+    local = lookup_local_geo(ip_address)
+    if local is not None:
+        return local
+    
+    if not settings.geo_http_fallback_enabled:
+        return GeoData()
+    
+    key = geo_cache_key(ip_address)
+    
+    cached = _geo_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    # Concurrent lookups for the same key share one remote resolution
+    return await _geo_flight.do(key, lambda: _resolve_remote(ip_address, key))
+
+
+async def _resolve_remote(ip_address: str, key: str) -> GeoData:
+    """Resolve a cache miss from the shared cache or ipinfo.io and cache the result."""
+    shared = await _get_shared(key)
+    if shared is not None:
+        ttl = None if shared.country else settings.geo_cache_negative_ttl_seconds
+        _geo_cache.set(key, shared, ttl_seconds=ttl)
+        return shared
+    
+    geo_data, ok = await fetch_geo_data(ip_address)
+    ttl = settings.geo_cache_ttl_seconds if ok else settings.geo_cache_negative_ttl_seconds
+    
+    _geo_cache.set(key, geo_data, ttl_seconds=ttl)
+    await _set_shared(key, geo_data, ttl)
+    
+    return geo_data
+
 
+def get_geo_cache_stats() -> Dict[str, Any]:
+    """Hit/miss/eviction counters for the geo cache."""
+    stats = _geo_cache.stats()
+    stats["negative_ttl_seconds"] = settings.geo_cache_negative_ttl_seconds
+    stats["by_prefix"] = settings.geo_cache_by_prefix
+    stats["shared_enabled"] = get_redis() is not None
+    stats["shared_hits"] = _shared_hits
+    stats["shared_errors"] = _shared_errors
+    stats["coalescing"] = _geo_flight.stats()
+    return stats
@@ -4,6 +4,18 @@ from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# Engagement bonuses that depend on visitor history rather than the event itself
+RETURNING_VISITOR_BONUS = 15
+MULTI_SESSION_BONUS = 25
+
+# Inclusive upper intent score bound for each heat level, in ascending order
+HEAT_LEVEL_THRESHOLDS = [
+    (30, "Cold"),
+    (70, "Warm"),
+    (150, "Hot"),
+]
+TOP_HEAT_LEVEL = "Enterprise Ready"
+
 
 def calculate_intent(page_url: str) -> int:
     """
@@ -29,6 +41,50 @@ def calculate_intent(page_url: str) -> int:
         return 5
 
 
+# Substrings of a click target that mark a call to action
+CTA_KEYWORDS = ("button", "cta", "submit", "contact", "signup", "trial", "demo")
+
+
+def scroll_engagement(scroll_depth: int) -> int:
+    """+20 if scroll_depth > 75%, +10 if > 50%."""
+    if scroll_depth > 75:
+        return 20
+    elif scroll_depth > 50:
+        return 10
+    return 0
+
+
+def click_engagement(click_target: Optional[str]) -> int:
+    """+30 for a click on a call to action."""
+    if click_target:
+        click_lower = click_target.lower()
+        if any(cta in click_lower for cta in CTA_KEYWORDS):
+            return 30
+    return 0
+
+
+def page_engagement(page_url: str) -> int:
+    """+40 contact page, +20 products page, +5 homepage."""
+    page_lower = page_url.lower()
+    if "contact" in page_lower:
+        return 40
+    elif "product" in page_lower:
+        return 20
+    elif page_lower.endswith("/") or "home" in page_lower:
+        return 5
+    return 0
+
+
+def history_engagement(is_returning: bool, sessions_in_7_days: int) -> int:
+    """+15 returning visitor, +25 multiple sessions in 7 days."""
+    score = 0
+    if is_returning:
+        score += RETURNING_VISITOR_BONUS
+    if sessions_in_7_days > 1:
+        score += MULTI_SESSION_BONUS
+    return score
+
+
 def calculate_engagement(
     scroll_depth: int,
     click_target: Optional[str],
@@ -48,34 +104,16 @@ def calculate_engagement(
     - +5 homepage
     - +15 returning visitor
     - +25 multiple sessions in 7 days
-    """
-    score = 0
-    
-    if scroll_depth > 75:
-        score += 20
-    elif scroll_depth > 50:
-        score += 10
-    
-    if click_target:
-        click_lower = click_target.lower()
-        if any(cta in click_lower for cta in ["button", "cta", "submit", "contact", "signup", "trial", "demo"]):
-            score += 30
     
-    page_lower = page_url.lower()
-    if "contact" in page_lower:
-        score += 40
-    elif "product" in page_lower:
-        score += 20
-    elif page_lower.endswith("/") or "home" in page_lower:
-        score += 5
-    
-    if is_returning:
-        score += 15
-    
-    if sessions_in_7_days > 1:
-        score += 25
-    
-    return score
+    The sum of the component helpers above, which the batch re-scoring job
+    (app/services/rescoring.py) applies column-wise.
+    """
+    return (
+        scroll_engagement(scroll_depth)
+        + click_engagement(click_target)
+        + page_engagement(page_url)
+        + history_engagement(is_returning, sessions_in_7_days)
+    )
 
 
 def calculate_heat_level(intent_score: int) -> str:
@@ -88,11 +126,8 @@ def calculate_heat_level(intent_score: int) -> str:
     - 71-150 = Hot
     - 150+ = Enterprise Ready
     """
-    if intent_score <= 30:
-        return "Cold"
-    elif intent_score <= 70:
-        return "Warm"
-    elif intent_score <= 150:
-        return "Hot"
-    else:
-        return "Enterprise Ready"
+    for threshold, level in HEAT_LEVEL_THRESHOLDS:
+        if intent_score <= threshold:
+            return level
+    
+    return TOP_HEAT_LEVEL
@@ -0,0 +1,262 @@
+"""
+Batch re-scoring of visitor intent, engagement and heat level.
+
+Scores are accumulated per event at tracking time, so changing the rules in
+intent_calculator leaves existing visitors with stale scores. This module replays
+every visitor's page events against the current rules. Visitors are processed in
+id-ordered chunks; each chunk's sessions and events are loaded into NumPy columns
+and scored with array operations:
+
+- page URLs, click targets and scroll depths are classified once per distinct
+  value (and remembered across chunks), then broadcast back to the events
+- the returning-visitor bonus applies to every event except a visitor's first
+- sessions started in the 7 days up to each event are counted with searchsorted
+  over the chunk's sorted session starts
+
+Changed scores are written with one apply_visitor_scores call per chunk (see
+database/schema_enhanced.sql). Memory is bounded by one chunk of visitors.
+
+Requires the optional numpy package.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+from app.core.database import get_db, execute
+from app.services.intent_calculator import (
+    HEAT_LEVEL_THRESHOLDS, TOP_HEAT_LEVEL,
+    calculate_intent, click_engagement, history_engagement, page_engagement, scroll_engagement
+)
+
+logger = logging.getLogger(__name__)
+
+# PostgREST returns at most this many rows per request on Supabase
+PAGE_SIZE = 1000
+# Ids per IN (...) filter, keeps request URLs short
+IN_FILTER_SIZE = 100
+# Distinct values remembered per classifier before starting over
+CLASSIFIER_CACHE_SIZE = 100000
+
+SEVEN_DAYS_US = 7 * 24 * 3600 * 10 ** 6
+SCORE_COLUMNS = ("intent_score", "engagement_score", "heat_level")
+
+
+def numpy_available() -> bool:
+    try:
+        import numpy  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class ValueClassifier:
+    """Maps a column of values to scores, calling the scoring function once per distinct value."""
+    
+    def __init__(self, score: Callable[[Any], int], max_entries: int = CLASSIFIER_CACHE_SIZE):
+        self._score = score
+        self._max_entries = max_entries
+        self._known: Dict[Any, int] = {}
+        self.classified = 0
+    
+    def scores(self, values):
+        import numpy as np
+        
+        distinct, inverse = np.unique(values, return_inverse=True)
+        if len(self._known) + len(distinct) > self._max_entries:
+            self._known.clear()
+        
+        table = np.empty(len(distinct), dtype=np.int64)
+        for i, value in enumerate(distinct.tolist()):
+            known = self._known.get(value)
+            if known is None:
+                known = self._known[value] = self._score(value)
+                self.classified += 1
+            table[i] = known
+        return table[inverse.reshape(-1)]
+
+
+class ScoringRules:
+    """Per-value classifiers shared by all chunks of one re-scoring run."""
+    
+    def __init__(self):
+        import numpy as np
+        
+        self.intent = ValueClassifier(calculate_intent)
+        self.page = ValueClassifier(page_engagement)
+        self.click = ValueClassifier(lambda target: click_engagement(target or None))
+        self.scroll = ValueClassifier(scroll_engagement)
+        # history[is_returning, has_multiple_sessions]
+        self.history = np.array([
+            [history_engagement(is_returning, sessions) for sessions in (1, 2)]
+            for is_returning in (False, True)
+        ], dtype=np.int64)
+        self.heat_thresholds = np.array([threshold for threshold, _ in HEAT_LEVEL_THRESHOLDS], dtype=np.int64)
+        self.heat_levels = [level for _, level in HEAT_LEVEL_THRESHOLDS] + [TOP_HEAT_LEVEL]
+
+
+def _naive_utc(value: Optional[str]) -> Optional[str]:
+    """ISO timestamp without its UTC offset (Supabase returns +00:00), shifted to UTC if needed."""
+    if not value:
+        return None
+    if value.endswith("+00:00"):
+        return value[:-6]
+    if value.endswith("Z"):
+        return value[:-1]
+    if len(value) > 19 and value[-6] in "+-" and value[-3] == ":":
+        return datetime.fromisoformat(value).astimezone(timezone.utc).replace(tzinfo=None).isoformat()
+    return value
+
+
+def _to_microseconds(values: List[Optional[str]]):
+    """ISO timestamps to int64 microseconds (UTC); missing values take the earliest present one."""
+    import numpy as np
+    
+    # NumPy's parsing of timezone offsets is deprecated and warns
+    times = np.array([_naive_utc(value) for value in values], dtype="datetime64[us]")
+    micros = times.astype(np.int64)
+    missing = np.isnat(times)
+    if missing.any():
+        micros[missing] = micros[~missing].min() if not missing.all() else 0
+    return micros
+
+
+def score_chunk(
+    rules: ScoringRules,
+    visitor_ids: List[str],
+    sessions: List[Dict[str, Any]],
+    events: List[Dict[str, Any]]
+) -> List[Dict[str, Any]]:
+    """
+    Score one chunk of visitors from their sessions and page events.
+    Returns {id, intent_score, engagement_score, heat_level} per visitor, in
+    visitor_ids order; visitors without events score 0.
+    """
+    import numpy as np
+    
+    visitor_count = len(visitor_ids)
+    visitor_index = {visitor_id: i for i, visitor_id in enumerate(visitor_ids)}
+    session_visitor = {session["id"]: visitor_index[session["visitor_id"]] for session in sessions}
+    events = [event for event in events if event.get("session_id") in session_visitor]
+    
+    intent = np.zeros(visitor_count, dtype=np.int64)
+    engagement = np.zeros(visitor_count, dtype=np.int64)
+    
+    if events:
+        event_count = len(events)
+        event_visitor = np.fromiter((session_visitor[e["session_id"]] for e in events), np.int64, event_count)
+        event_time = _to_microseconds([e.get("timestamp") or e.get("created_at") for e in events])
+        urls = np.array([e.get("page_url") or "" for e in events], dtype=str)
+        clicks = np.array([e.get("click_target") or "" for e in events], dtype=str)
+        scrolls = np.fromiter((e.get("scroll_depth") or 0 for e in events), np.int64, event_count)
+        
+        session_visitor_column = np.fromiter((visitor_index[s["visitor_id"]] for s in sessions), np.int64, len(sessions))
+        session_start = _to_microseconds([s.get("session_start") for s in sessions])
+        
+        # Every event except each visitor's earliest is a returning visit
+        order = np.lexsort((event_time, event_visitor))
+        sorted_visitor = event_visitor[order]
+        first = np.ones(event_count, dtype=bool)
+        first[1:] = sorted_visitor[1:] != sorted_visitor[:-1]
+        returning = np.empty(event_count, dtype=bool)
+        returning[order] = ~first
+        
+        # Sessions in [event - 7 days, event]: offset each visitor's timeline into
+        # its own disjoint range so one sorted array serves the whole chunk
+        base = min(event_time.min(), session_start.min() if len(session_start) else event_time.min())
+        span = max(event_time.max(), session_start.max() if len(session_start) else 0) - base + SEVEN_DAYS_US + 1
+        session_keys = np.sort(session_visitor_column * span + (session_start - base))
+        event_keys = event_visitor * span + (event_time - base)
+        sessions_in_7_days = (
+            np.searchsorted(session_keys, event_keys, side="right")
+            - np.searchsorted(session_keys, event_keys - SEVEN_DAYS_US, side="left")
+        )
+        
+        event_intent = rules.intent.scores(urls)
+        event_engagement = (
+            rules.scroll.scores(scrolls)
+            + rules.click.scores(clicks)
+            + rules.page.scores(urls)
+            + rules.history[returning.astype(np.int64), (sessions_in_7_days > 1).astype(np.int64)]
+        )
+        
+        intent = np.bincount(event_visitor, weights=event_intent, minlength=visitor_count).astype(np.int64)
+        engagement = np.bincount(event_visitor, weights=event_engagement, minlength=visitor_count).astype(np.int64)
+    
+    heat = np.searchsorted(rules.heat_thresholds, intent, side="left")
+    
+    return [
+        {
+            "id": visitor_id,
+            "intent_score": int(intent[i]),
+            "engagement_score": int(engagement[i]),
+            "heat_level": rules.heat_levels[heat[i]]
+        }
+        for i, visitor_id in enumerate(visitor_ids)
+    ]
+
+
+async def _fetch_in(table: str, columns: str, column: str, values: List[str]) -> List[Dict[str, Any]]:
+    """All rows whose column is in values, keyset-paginated by id."""
+    db = get_db()
+    
+    async def fetch_group(group: List[str]) -> List[Dict[str, Any]]:
+        rows: List[Dict[str, Any]] = []
+        last_id = None
+        while True:
+            query = db.table(table).select(columns).in_(column, group)
+            if last_id:
+                query = query.gt("id", last_id)
+            result = await execute(query.order("id").limit(PAGE_SIZE))
+            rows.extend(result.data or [])
+            if len(result.data or []) < PAGE_SIZE:
+                return rows
+            last_id = result.data[-1]["id"]
+    
+    groups = [values[i:i + IN_FILTER_SIZE] for i in range(0, len(values), IN_FILTER_SIZE)]
+    results = await asyncio.gather(*(fetch_group(group) for group in groups))
+    return [row for rows in results for row in rows]
+
+
+async def iter_visitor_chunks(chunk_size: int, after_id: Optional[str] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+    """Yield visitors (id and current scores) in id order, chunk_size at a time."""
+    db = get_db()
+    
+    while True:
+        query = db.table("visitors").select("id," + ",".join(SCORE_COLUMNS))
+        if after_id:
+            query = query.gt("id", after_id)
+        result = await execute(query.order("id").limit(chunk_size))
+        if not result.data:
+            return
+        
+        yield result.data
+        
+        if len(result.data) < chunk_size:
+            return
+        after_id = result.data[-1]["id"]
+
+
+async def rescore_chunk(rules: ScoringRules, visitors: List[Dict[str, Any]], dry_run: bool = False) -> Tuple[int, int]:
+    """
+    Recompute and write the scores of one chunk of visitors.
+    Returns (visitors scored, visitors whose scores changed).
+    """
+    visitor_ids = [visitor["id"] for visitor in visitors]
+    sessions = await _fetch_in("sessions", "id,visitor_id,session_start", "visitor_id", visitor_ids)
+    events = await _fetch_in(
+        "page_events",
+        "id,session_id,page_url,scroll_depth,click_target,timestamp,created_at",
+        "session_id",
+        [session["id"] for session in sessions]
+    )
+    
+    scores = score_chunk(rules, visitor_ids, sessions, events)
+    changed = [
+        score for score, visitor in zip(scores, visitors)
+        if any(score[column] != visitor.get(column) for column in SCORE_COLUMNS)
+    ]
+    
+    if changed and not dry_run:
+        await execute(get_db().rpc("apply_visitor_scores", {"p_scores": changed}))
+    
+    return len(scores), len(changed)
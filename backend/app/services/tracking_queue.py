@@ -0,0 +1,136 @@
+"""
+Tracking Queue - Write-behind ingestion for tracking events.
+
+The track endpoint validates the request, hands it to this bounded in-process
+queue and returns 202 immediately. Background workers drain the queue and run
+the regular tracking flow, so browser beacons no longer wait on Supabase.
+"""
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.request_context import RequestContext
+from app.models.schemas import TrackRequest
+from app.services.tracking_service import track_page_view, track_page_view_batch
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class TrackJob:
+    """One or more validated tracking events from a single request."""
+    events: List[TrackRequest]
+    context: RequestContext
+
+
+class TrackingQueue:
+    """Bounded queue of tracking jobs drained by a pool of asyncio workers."""
+    
+    def __init__(self, max_size: int, worker_count: int):
+        self.max_size = max_size
+        self.worker_count = max(1, worker_count)
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        
+        # Counters for monitoring
+        self.enqueued = 0
+        self.processed = 0
+        self.failed = 0
+        self.rejected = 0
+    
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+    
+    def depth(self) -> int:
+        """Number of jobs waiting to be processed."""
+        return self._queue.qsize() if self._queue else 0
+    
+    async def start(self):
+        """Create the queue and spawn workers. Must run inside the event loop."""
+        if self.running:
+            return
+        
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._workers = [
+            asyncio.create_task(self._worker(i), name=f"tracking-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+        logger.info(f"Tracking queue started - workers: {self.worker_count}, max size: {self.max_size}")
+    
+    def enqueue(self, job: TrackJob) -> bool:
+        """
+        Add a job without waiting.
+        Returns False (counted as rejected) if the queue is not running or is full.
+        """
+        if not self.running:
+            self.rejected += 1
+            return False
+        
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            return False
+        
+        self.enqueued += 1
+        return True
+    
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            try:
+                if len(job.events) == 1:
+                    result = await track_page_view(
+                        track_data=job.events[0],
+                        context=job.context
+                    )
+                else:
+                    result = await track_page_view_batch(
+                        events=job.events,
+                        context=job.context
+                    )
+                if result.get("status") == "error":
+                    self.failed += 1
+                    logger.warning(f"Queued tracking error (worker {worker_id}): {result.get('message')}")
+                else:
+                    self.processed += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Unexpected error in tracking worker {worker_id}: {e}")
+            finally:
+                self._queue.task_done()
+    
+    async def stop(self, timeout: float = 10.0):
+        """Drain pending jobs (up to timeout) and stop the workers."""
+        if not self.running:
+            return
+        
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Tracking queue shutdown timed out, dropping {self.depth()} pending events")
+        
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Tracking queue stopped")
+    
+    def stats(self) -> Dict[str, int]:
+        return {
+            "depth": self.depth(),
+            "max_size": self.max_size,
+            "workers": len(self._workers),
+            "enqueued": self.enqueued,
+            "processed": self.processed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+        }
+
+
+tracking_queue = TrackingQueue(
+    max_size=settings.tracking_queue_max_size,
+    worker_count=settings.tracking_queue_workers
+)
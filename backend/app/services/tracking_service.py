@@ -1,62 +1,64 @@
+import asyncio
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any, Tuple
+from typing import Optional, Dict, Any, Tuple, List
 import logging
-from app.core.database import get_db
-from app.services.intent_calculator import calculate_intent, calculate_engagement, calculate_heat_level
+from app.core.database import get_db, execute
+from app.core.config import settings
+from app.core.metrics import track_stage_duration
+from app.core.profiler import profiled
+from app.core.keyed_lock import KeyedLock
+from app.services.intent_calculator import (
+    calculate_intent, calculate_engagement, calculate_heat_level,
+    HEAT_LEVEL_THRESHOLDS, TOP_HEAT_LEVEL, RETURNING_VISITOR_BONUS, MULTI_SESSION_BONUS
+)
 from app.services.geo_service import get_geo_data
-from app.services.user_agent_parser import parse_user_agent, is_bot
-from app.services.ip_security import get_stored_ip, hash_ip
+from app.core.request_context import RequestContext
+from app.services.analytics_rollup import record_tracked_events
+from app.services.visitor_cache import (
+    get_cached_visitor, cache_visitor, invalidate_visitor,
+    get_cached_session, cache_session, invalidate_session
+)
 from app.models.schemas import GeoData, DeviceInfo, TrackRequest
 
 logger = logging.getLogger(__name__)
 
-
-def get_client_ip(request_headers: Dict[str, str]) -> str:
-    """Extract client IP from request headers."""
-    forwarded_for = request_headers.get("x-forwarded-for")
-    if forwarded_for:
-        return forwarded_for.split(",")[0].strip()
-    
-    real_ip = request_headers.get("x-real-ip")
-    if real_ip:
-        return real_ip
-    
-    return request_headers.get("remote-addr", "unknown")
-
-
-def get_referrer(request_headers: Dict[str, str]) -> Optional[str]:
-    """Extract referrer from request headers."""
-    return request_headers.get("referer") or request_headers.get("referrer")
+# Serializes the read-modify-write of one visitor's rows per worker (keyed by stored IP).
+# Across workers, TRACKING_RPC_ENABLED applies each call atomically in the database.
+_visitor_locks = KeyedLock("visitors")
 
 
 async def find_or_create_visitor(
-    ip_address: str,
+    stored_ip: str,
     geo_data: GeoData,
     device_info: DeviceInfo,
     referrer: Optional[str],
     utm_source: Optional[str],
     utm_medium: Optional[str],
     utm_campaign: Optional[str],
-    screen_resolution: Optional[str]
+    screen_resolution: Optional[str],
+    visit_increment: int = 1
 ) -> Tuple[Dict[str, Any], bool]:
-    """Find existing visitor by IP or create new one. Returns (visitor, is_new)."""
+    """
+    Find existing visitor by hashed IP or create new one. Returns (visitor, is_new).
+    visit_increment is the number of tracked events this call accounts for.
+    Reads the hot visitor cache before the database.
+    """
     db = get_db()
     
-    # Hash IP address for storage (privacy protection)
-    stored_ip = get_stored_ip(ip_address)
-    
     try:
-        result = db.table("visitors").select("*").eq("ip_address", stored_ip).limit(1).execute()
+        visitor = get_cached_visitor(stored_ip)
+        if visitor is None:
+            result = await execute(db.table("visitors").select("*").eq("ip_address", stored_ip).limit(1))
+            visitor = result.data[0] if result.data else None
         
         now = datetime.utcnow().isoformat()
         
-        if result.data and len(result.data) > 0:
-            visitor = result.data[0]
+        if visitor is not None:
             is_new = False
             
             update_data = {
                 "last_visit_date": now,
-                "visit_count": visitor.get("visit_count", 1) + 1,
+                "visit_count": visitor.get("visit_count", 1) + visit_increment,
                 "country": geo_data.country or visitor.get("country"),
                 "region": geo_data.region or visitor.get("region"),
                 "city": geo_data.city or visitor.get("city"),
@@ -75,7 +77,8 @@ async def find_or_create_visitor(
             if not visitor.get("primary_referral_source") and referrer:
                 update_data["primary_referral_source"] = referrer
             
-            updated = db.table("visitors").update(update_data).eq("id", visitor["id"]).execute()
+            updated = await execute(db.table("visitors").update(update_data).eq("id", visitor["id"]))
+            cache_visitor(updated.data[0])
             return updated.data[0], is_new
         else:
             is_new = True
@@ -95,7 +98,7 @@ async def find_or_create_visitor(
                 "utm_campaign": utm_campaign,
                 "first_visit_date": now,
                 "last_visit_date": now,
-                "visit_count": 1,
+                "visit_count": visit_increment,
                 "total_time_spent": 0,
                 "avg_session_duration": 0,
                 "pages_per_session": 0,
@@ -107,24 +110,35 @@ async def find_or_create_visitor(
                 "updated_at": now
             }
             
-            result = db.table("visitors").insert(new_visitor).execute()
+            result = await execute(db.table("visitors").insert(new_visitor))
+            cache_visitor(result.data[0])
             return result.data[0], is_new
     except Exception as e:
+        # The cached row may no longer match the database
+        invalidate_visitor(stored_ip)
         logger.error(f"Error in find_or_create_visitor: {e}")
         raise
 
 
-def get_or_create_session(visitor_id: str) -> Tuple[Dict[str, Any], bool]:
-    """Get active session or create new one. Returns (session, is_new_session)."""
+async def get_or_create_session(visitor_id: str) -> Tuple[Dict[str, Any], bool]:
+    """
+    Get active session or create new one. Returns (session, is_new_session).
+    Reads the hot session cache before the database.
+    """
     db = get_db()
     
     try:
+        cached = get_cached_session(visitor_id)
+        if cached is not None:
+            return cached, False
+        
         now = datetime.utcnow()
-        cutoff_time = (now - timedelta(minutes=30)).isoformat()
+        cutoff_time = (now - timedelta(minutes=settings.session_timeout_minutes)).isoformat()
         
-        result = db.table("sessions").select("*").eq("visitor_id", visitor_id).is_("session_end", None).gte("session_start", cutoff_time).limit(1).execute()
+        result = await execute(db.table("sessions").select("*").eq("visitor_id", visitor_id).is_("session_end", None).gte("session_start", cutoff_time).limit(1))
         
         if result.data and len(result.data) > 0:
+            cache_session(result.data[0])
             return result.data[0], False
         
         new_session = {
@@ -134,14 +148,16 @@ def get_or_create_session(visitor_id: str) -> Tuple[Dict[str, Any], bool]:
             "session_duration": 0
         }
         
-        result = db.table("sessions").insert(new_session).execute()
+        result = await execute(db.table("sessions").insert(new_session))
+        cache_session(result.data[0])
         return result.data[0], True
     except Exception as e:
+        invalidate_session(visitor_id)
         logger.error(f"Error in get_or_create_session: {e}")
         raise
 
 
-def create_page_event(
+async def create_page_event(
     session_id: str,
     page_url: str,
     event_type: str,
@@ -164,55 +180,102 @@ def create_page_event(
             "created_at": datetime.utcnow().isoformat()
         }
         
-        result = db.table("page_events").insert(event).execute()
+        result = await execute(db.table("page_events").insert(event))
         return result.data[0]
     except Exception as e:
         logger.error(f"Error in create_page_event: {e}")
         raise
 
 
-def update_session_stats(session_id: str, time_spent: int):
-    """Update session statistics."""
+async def create_page_events(session_id: str, events: List[TrackRequest]) -> List[Dict[str, Any]]:
+    """Create page event records for a batch of events with a single bulk insert."""
+    db = get_db()
+    
+    try:
+        now = datetime.utcnow().isoformat()
+        rows = [
+            {
+                "session_id": session_id,
+                "page_url": event.page_url,
+                "event_type": event.event_type,
+                "scroll_depth": event.scroll_depth or 0,
+                "click_target": event.click_target,
+                "time_spent": event.time_spent,
+                "timestamp": now,
+                "created_at": now
+            }
+            for event in events
+        ]
+        
+        result = await execute(db.table("page_events").insert(rows))
+        return result.data
+    except Exception as e:
+        logger.error(f"Error in create_page_events: {e}")
+        raise
+
+
+async def update_session_stats(session_id: str, time_spent: int, session: Optional[Dict[str, Any]] = None):
+    """
+    Update session statistics.
+    Pass the session row from get_or_create_session to avoid reading it again.
+    """
     db = get_db()
     
     try:
-        session_result = db.table("sessions").select("*").eq("id", session_id).execute()
-        if not session_result.data:
-            return
+        if session is None:
+            session_result = await execute(db.table("sessions").select("*").eq("id", session_id))
+            if not session_result.data:
+                return
+            
+            session = session_result.data[0]
         
-        session = session_result.data[0]
         current_duration = session.get("session_duration", 0)
         new_duration = current_duration + time_spent
         
-        events_result = db.table("page_events").select("id", count="exact").eq("session_id", session_id).execute()
+        events_result = await execute(db.table("page_events").select("id", count="exact").eq("session_id", session_id))
         pages_count = events_result.count if hasattr(events_result, 'count') else 0
         
-        db.table("sessions").update({
+        updated = await execute(db.table("sessions").update({
             "session_duration": new_duration,
             "pages_visited_count": pages_count
-        }).eq("id", session_id).execute()
+        }).eq("id", session_id))
+        if updated.data:
+            cache_session(updated.data[0])
     except Exception as e:
+        if session is not None:
+            invalidate_session(session.get("visitor_id", ""))
         logger.error(f"Error in update_session_stats: {e}")
 
 
-def update_visitor_metrics(
+async def update_visitor_metrics(
     visitor_id: str,
     intent_delta: int,
     engagement_delta: int,
     time_spent: int,
     is_returning: bool,
-    sessions_in_7_days: int
+    sessions_in_7_days: int,
+    page_url_counts: Optional[Dict[str, int]] = None,
+    visitor: Optional[Dict[str, Any]] = None
 ):
-    """Update visitor metrics including scores and statistics."""
+    """
+    Update visitor metrics by applying deltas to the stored aggregates.
+    
+    page_url_counts maps each tracked page URL to its number of new events and is
+    folded into the visitor's running page_counts/total_page_views. Pass the visitor
+    row returned by find_or_create_visitor to avoid reading it again. The cost is
+    independent of the visitor's history; use recompute_visitor_aggregates to
+    rebuild the aggregates from raw sessions and events.
+    """
     db = get_db()
     
     try:
-        visitor_result = db.table("visitors").select("*").eq("id", visitor_id).execute()
-        
-        if not visitor_result.data:
-            return
-        
-        visitor = visitor_result.data[0]
+        if visitor is None:
+            visitor_result = await execute(db.table("visitors").select("*").eq("id", visitor_id))
+            
+            if not visitor_result.data:
+                return
+            
+            visitor = visitor_result.data[0]
         
         current_intent = visitor.get("intent_score", 0)
         new_intent = current_intent + intent_delta
@@ -225,29 +288,24 @@ def update_visitor_metrics(
         
         visit_count = visitor.get("visit_count", 1)
         
-        sessions_result = db.table("sessions").select("session_duration").eq("visitor_id", visitor_id).execute()
-        total_duration = sum(s.get("session_duration", 0) for s in sessions_result.data) if sessions_result.data else 0
-        avg_duration = total_duration // visit_count if visit_count > 0 else 0
+        # Session durations accumulate the same time_spent values, so their sum
+        # is the visitor's total time.
+        avg_duration = new_total_time // visit_count if visit_count > 0 else 0
         
-        sessions_for_visitor = db.table("sessions").select("id").eq("visitor_id", visitor_id).execute()
-        session_ids = [s["id"] for s in sessions_for_visitor.data] if sessions_for_visitor.data else []
+        page_counts = dict(visitor.get("page_counts") or {})
+        total_pages = visitor.get("total_page_views", 0)
+        most_visited = visitor.get("most_visited_page")
+        most_visited_count = page_counts.get(most_visited, 0) if most_visited else 0
         
-        page_counts = {}
-        if session_ids:
-            for session_id in session_ids:
-                try:
-                    pages_result = db.table("page_events").select("page_url").eq("session_id", session_id).execute()
-                    if pages_result.data:
-                        for event in pages_result.data:
-                            page_url = event.get("page_url", "")
-                            if page_url:
-                                page_counts[page_url] = page_counts.get(page_url, 0) + 1
-                except Exception as e:
-                    logger.warning(f"Error fetching page events for session {session_id}: {e}")
+        for page_url, count in (page_url_counts or {}).items():
+            if not page_url:
+                continue
+            page_counts[page_url] = page_counts.get(page_url, 0) + count
+            total_pages += count
+            if page_counts[page_url] > most_visited_count:
+                most_visited = page_url
+                most_visited_count = page_counts[page_url]
         
-        most_visited = max(page_counts.items(), key=lambda x: x[1])[0] if page_counts else None
-        
-        total_pages = sum(page_counts.values())
         pages_per_session = total_pages / visit_count if visit_count > 0 else 0
         
         new_heat_level = calculate_heat_level(new_intent)
@@ -259,103 +317,326 @@ def update_visitor_metrics(
             "total_time_spent": new_total_time,
             "avg_session_duration": avg_duration,
             "pages_per_session": round(pages_per_session, 2),
+            "total_page_views": total_pages,
+            "page_counts": page_counts,
             "most_visited_page": most_visited,
             "updated_at": datetime.utcnow().isoformat()
         }
         
-        db.table("visitors").update(update_data).eq("id", visitor_id).execute()
+        updated = await execute(db.table("visitors").update(update_data).eq("id", visitor_id))
+        if updated.data:
+            cache_visitor(updated.data[0])
     except Exception as e:
+        if visitor is not None:
+            invalidate_visitor(visitor.get("ip_address", ""))
         logger.error(f"Error in update_visitor_metrics: {e}")
 
 
-def get_sessions_in_7_days(visitor_id: str) -> int:
+async def recompute_visitor_aggregates(visitor_id: str, chunk_size: int = 100) -> Optional[Dict[str, Any]]:
+    """
+    Rebuild a visitor's page and session aggregates from raw sessions and events.
+    
+    Repair job counterpart of the incremental update in update_visitor_metrics.
+    Returns the written aggregates, or None if the visitor does not exist.
+    """
+    db = get_db()
+    
+    try:
+        visitor_result = await execute(db.table("visitors").select("id,visit_count").eq("id", visitor_id))
+        if not visitor_result.data:
+            return None
+        
+        visit_count = visitor_result.data[0].get("visit_count", 1)
+        
+        sessions_result = await execute(db.table("sessions").select("id,session_duration").eq("visitor_id", visitor_id))
+        sessions = sessions_result.data or []
+        total_duration = sum(s.get("session_duration", 0) for s in sessions)
+        session_ids = [s["id"] for s in sessions]
+        
+        page_counts: Dict[str, int] = {}
+        for i in range(0, len(session_ids), chunk_size):
+            pages_result = await execute(db.table("page_events").select("page_url").in_("session_id", session_ids[i:i + chunk_size]))
+            for event in pages_result.data or []:
+                page_url = event.get("page_url", "")
+                if page_url:
+                    page_counts[page_url] = page_counts.get(page_url, 0) + 1
+        
+        total_pages = sum(page_counts.values())
+        most_visited = max(page_counts.items(), key=lambda x: x[1])[0] if page_counts else None
+        
+        aggregates = {
+            "avg_session_duration": total_duration // visit_count if visit_count > 0 else 0,
+            "pages_per_session": round(total_pages / visit_count, 2) if visit_count > 0 else 0,
+            "total_page_views": total_pages,
+            "page_counts": page_counts,
+            "most_visited_page": most_visited,
+            "updated_at": datetime.utcnow().isoformat()
+        }
+        
+        updated = await execute(db.table("visitors").update(aggregates).eq("id", visitor_id))
+        if updated.data:
+            cache_visitor(updated.data[0])
+        return aggregates
+    except Exception as e:
+        logger.error(f"Error in recompute_visitor_aggregates: {e}")
+        raise
+
+
+async def get_sessions_in_7_days(visitor_id: str) -> int:
     """Get count of sessions in the last 7 days."""
     db = get_db()
     
     try:
         cutoff = (datetime.utcnow() - timedelta(days=7)).isoformat()
-        result = db.table("sessions").select("id", count="exact").eq("visitor_id", visitor_id).gte("session_start", cutoff).execute()
+        result = await execute(db.table("sessions").select("id", count="exact").eq("visitor_id", visitor_id).gte("session_start", cutoff))
         return result.count if hasattr(result, 'count') else 0
     except Exception as e:
         logger.error(f"Error in get_sessions_in_7_days: {e}")
         return 0
 
 
-async def track_page_view(
-    track_data: TrackRequest,
-    request_headers: Dict[str, str],
-    screen_resolution: Optional[str] = None
+def build_rpc_event(event: TrackRequest) -> Dict[str, Any]:
+    """
+    Build a page event for the track_visit RPC.
+    
+    Carries the context-free score components; the returning-visitor and
+    multi-session engagement bonuses are added inside the database function.
+    """
+    return {
+        "page_url": event.page_url,
+        "event_type": event.event_type,
+        "time_spent": event.time_spent,
+        "scroll_depth": event.scroll_depth or 0,
+        "click_target": event.click_target,
+        "intent_delta": calculate_intent(event.page_url),
+        "engagement_base": calculate_engagement(
+            scroll_depth=event.scroll_depth or 0,
+            click_target=event.click_target,
+            page_url=event.page_url,
+            is_returning=False,
+            sessions_in_7_days=0
+        )
+    }
+
+
+async def track_visit_rpc(
+    stored_ip: str,
+    events: List[TrackRequest],
+    geo_data: GeoData,
+    device_info: DeviceInfo,
+    referrer: Optional[str],
+    screen_resolution: Optional[str]
 ) -> Dict[str, Any]:
-    """Main tracking function that orchestrates the entire flow."""
+    """
+    Run the whole tracking transaction in one round trip via the track_visit
+    database function (see database/schema_enhanced.sql).
+    """
+    db = get_db()
+    
+    params = {
+        "p_ip_address": stored_ip,
+        "p_visitor": {
+            "country": geo_data.country,
+            "region": geo_data.region,
+            "city": geo_data.city,
+            "timezone": geo_data.timezone,
+            "device_type": device_info.device_type,
+            "browser": device_info.browser,
+            "os": device_info.os,
+            "screen_resolution": screen_resolution,
+            "referrer": referrer,
+            "utm_source": next((e.utm_source for e in events if e.utm_source), None),
+            "utm_medium": next((e.utm_medium for e in events if e.utm_medium), None),
+            "utm_campaign": next((e.utm_campaign for e in events if e.utm_campaign), None)
+        },
+        "p_events": [build_rpc_event(event) for event in events],
+        "p_returning_bonus": RETURNING_VISITOR_BONUS,
+        "p_multi_session_bonus": MULTI_SESSION_BONUS,
+        "p_heat_levels": [[threshold, level] for threshold, level in HEAT_LEVEL_THRESHOLDS],
+        "p_top_heat_level": TOP_HEAT_LEVEL,
+        "p_session_timeout_minutes": settings.session_timeout_minutes
+    }
+    
     try:
-        user_agent = request_headers.get("user-agent", "")
-        
-        if is_bot(user_agent):
-            logger.info(f"Bot detected: {user_agent}")
-            return {"status": "ignored", "message": "Bot detected"}
-        
-        ip_address = get_client_ip(request_headers)
-        
-        if ip_address == "unknown":
-            logger.warning("Could not determine IP address")
-            return {"status": "error", "message": "IP address not found"}
-        
-        device_info = parse_user_agent(user_agent)
-        referrer = get_referrer(request_headers)
-        geo_data = await get_geo_data(ip_address)
-        
+        result = await execute(db.rpc("track_visit", params))
+        return result.data
+    except Exception as e:
+        logger.error(f"Error in track_visit_rpc: {e}")
+        raise
+
+
+def get_visitor_lock_stats() -> Dict[str, Any]:
+    """Acquisitions and contention of the per-visitor tracking locks."""
+    return _visitor_locks.stats()
+
+
+async def _record_visit(
+    events: List[TrackRequest],
+    context: RequestContext,
+    geo_data: GeoData
+) -> Dict[str, Any]:
+    """Visitor upsert, session, page events and metrics update for one tracking call."""
+    device_info = context.device_info
+    referrer = context.referrer
+    screen_resolution = context.screen_resolution
+    
+    with track_stage_duration.time("visitor_upsert"):
         visitor, is_new_visitor = await find_or_create_visitor(
-            ip_address=ip_address,
+            stored_ip=context.stored_ip,
             geo_data=geo_data,
             device_info=device_info,
             referrer=referrer,
-            utm_source=track_data.utm_source,
-            utm_medium=track_data.utm_medium,
-            utm_campaign=track_data.utm_campaign,
-            screen_resolution=screen_resolution
-        )
-        
-        session, is_new_session = get_or_create_session(visitor["id"])
-        
-        create_page_event(
-            session_id=session["id"],
-            page_url=track_data.page_url,
-            event_type=track_data.event_type,
-            time_spent=track_data.time_spent,
-            scroll_depth=track_data.scroll_depth or 0,
-            click_target=track_data.click_target
+            utm_source=next((e.utm_source for e in events if e.utm_source), None),
+            utm_medium=next((e.utm_medium for e in events if e.utm_medium), None),
+            utm_campaign=next((e.utm_campaign for e in events if e.utm_campaign), None),
+            screen_resolution=screen_resolution,
+            visit_increment=len(events)
         )
-        
-        update_session_stats(session["id"], track_data.time_spent)
-        
-        is_returning = not is_new_visitor
-        sessions_in_7_days = get_sessions_in_7_days(visitor["id"])
-        
-        intent_delta = calculate_intent(track_data.page_url)
-        engagement_delta = calculate_engagement(
-            scroll_depth=track_data.scroll_depth or 0,
-            click_target=track_data.click_target,
-            page_url=track_data.page_url,
+    
+    with track_stage_duration.time("session"):
+        session, is_new_session = await get_or_create_session(visitor["id"])
+    
+    total_time_spent = sum(event.time_spent for event in events)
+    
+    async def record_events():
+        with track_stage_duration.time("event_insert"):
+            await create_page_events(session["id"], events)
+        with track_stage_duration.time("session_update"):
+            await update_session_stats(session["id"], total_time_spent, session=session)
+    
+    async def count_recent_sessions():
+        with track_stage_duration.time("recent_sessions"):
+            return await get_sessions_in_7_days(visitor["id"])
+    
+    # Event writes and the 7-day session count are independent round trips
+    _, sessions_in_7_days = await asyncio.gather(record_events(), count_recent_sessions())
+    
+    intent_delta = 0
+    engagement_delta = 0
+    page_url_counts: Dict[str, int] = {}
+    for index, event in enumerate(events):
+        page_url_counts[event.page_url] = page_url_counts.get(event.page_url, 0) + 1
+        # Only the event that created the visitor counts as a first visit
+        is_returning = not is_new_visitor or index > 0
+        intent_delta += calculate_intent(event.page_url)
+        engagement_delta += calculate_engagement(
+            scroll_depth=event.scroll_depth or 0,
+            click_target=event.click_target,
+            page_url=event.page_url,
             is_returning=is_returning,
             sessions_in_7_days=sessions_in_7_days
         )
-        
-        update_visitor_metrics(
+    
+    with track_stage_duration.time("metrics_update"):
+        await update_visitor_metrics(
             visitor_id=visitor["id"],
             intent_delta=intent_delta,
             engagement_delta=engagement_delta,
-            time_spent=track_data.time_spent,
-            is_returning=is_returning,
-            sessions_in_7_days=sessions_in_7_days
+            time_spent=total_time_spent,
+            is_returning=not is_new_visitor,
+            sessions_in_7_days=sessions_in_7_days,
+            page_url_counts=page_url_counts,
+            visitor=visitor
+        )
+    
+    record_tracked_events(
+        events,
+        country=geo_data.country or visitor.get("country"),
+        heat_level=calculate_heat_level(visitor.get("intent_score", 0) + intent_delta),
+        is_new_visitor=is_new_visitor,
+        is_new_session=is_new_session,
+        fallback_utm=visitor
+    )
+    
+    return {
+        "status": "success",
+        "visitor_id": visitor["id"],
+        "session_id": session["id"],
+        "events": len(events),
+        "intent_delta": intent_delta,
+        "engagement_delta": engagement_delta
+    }
+
+
+async def _track_events(
+    events: List[TrackRequest],
+    context: RequestContext
+) -> Dict[str, Any]:
+    """
+    Track one or more events from a single request.
+    
+    The visitor and session are resolved once, page events are written with one
+    insert and the summed deltas are applied with one metrics update.
+    """
+    if context.is_bot:
+        logger.info(f"Bot detected: {context.user_agent}")
+        return {"status": "ignored", "message": "Bot detected"}
+    
+    if context.client_ip == "unknown":
+        logger.warning("Could not determine IP address")
+        return {"status": "error", "message": "IP address not found"}
+    
+    device_info = context.device_info
+    referrer = context.referrer
+    screen_resolution = context.screen_resolution
+    with track_stage_duration.time("geo"):
+        geo_data = await get_geo_data(context.client_ip)
+    
+    if settings.tracking_rpc_enabled:
+        with track_stage_duration.time("track_visit_rpc"):
+            result = await track_visit_rpc(
+                stored_ip=context.stored_ip,
+                events=events,
+                geo_data=geo_data,
+                device_info=device_info,
+                referrer=referrer,
+                screen_resolution=screen_resolution
+            )
+        record_tracked_events(
+            events,
+            country=geo_data.country,
+            heat_level=result.get("heat_level"),
+            is_new_visitor=result.get("is_new_visitor", False),
+            is_new_session=result.get("is_new_session", False)
         )
-        
         return {
             "status": "success",
-            "visitor_id": visitor["id"],
-            "session_id": session["id"],
-            "intent_delta": intent_delta,
-            "engagement_delta": engagement_delta
+            "visitor_id": result["visitor_id"],
+            "session_id": result["session_id"],
+            "events": len(events),
+            "intent_delta": result["intent_delta"],
+            "engagement_delta": result["engagement_delta"]
         }
+    
+    # Reading a visitor's counters and writing them back spans several awaits;
+    # concurrent events for the same IP in this worker must not interleave there
+    async with _visitor_locks.hold(context.stored_ip):
+        return await _record_visit(events, context, geo_data)
+
+
+@profiled("track_page_view")
+async def track_page_view(
+    track_data: TrackRequest,
+    context: RequestContext
+) -> Dict[str, Any]:
+    """Main tracking function that orchestrates the entire flow."""
+    try:
+        return await _track_events([track_data], context)
     except Exception as e:
         logger.error(f"Error in track_page_view: {e}")
         return {"status": "error", "message": str(e)}
+
+
+async def track_page_view_batch(
+    events: List[TrackRequest],
+    context: RequestContext
+) -> Dict[str, Any]:
+    """Track a burst of events from one page session with a single visitor/session resolution."""
+    try:
+        if not events:
+            return {"status": "ignored", "message": "No events"}
+        
+        return await _track_events(events, context)
+    except Exception as e:
+        logger.error(f"Error in track_page_view_batch: {e}")
+        return {"status": "error", "message": str(e)}
@@ -1,6 +1,7 @@
 import re
 import logging
-from typing import Dict, Optional
+from functools import lru_cache
+from typing import Dict, FrozenSet, NamedTuple, Optional
 from app.models.schemas import DeviceInfo
 
 logger = logging.getLogger(__name__)
@@ -33,116 +34,194 @@ SUSPICIOUS_PATTERNS = [
     "exploit", "injection", "xss", "sqli"
 ]
 
+# Common bot indicators
+BOT_INDICATORS = ["bot/", "crawler/", "spider/"]
 
-def parse_user_agent(user_agent: str) -> DeviceInfo:
+# Security scanners and exploit payloads (is_suspicious_user_agent)
+SCANNER_PATTERNS = [
+    "sqlmap", "nikto", "nmap", "masscan",
+    "zap", "burp", "acunetix", "nessus"
+]
+EXPLOIT_PATTERNS = [
+    "exploit", "injection", "xss", "sqli",
+    "payload", "shell", "cmd"
+]
+
+# Tokens used for device, browser and OS detection
+DEVICE_TOKENS = [
+    "mobile", "android", "tablet", "ipad", "iphone",
+    "chrome", "edg", "edge", "headless", "firefox", "safari", "opera", "opr", "brave",
+    "windows", "mac", "darwin", "linux", "ios"
+]
+
+# Distinct UAs are few in real traffic, so classifications are memoized.
+# Oversized UAs (always bots) are not cached to keep the cache small.
+UA_CACHE_SIZE = 4096
+MAX_CACHED_UA_LENGTH = 500
+
+
+def _compile_matcher(tokens):
     """
-    Parse user agent string to extract device type, browser, and OS.
-    Basic parser - can be enhanced with user-agents library if needed.
+    Compile every token into one regex that reports all tokens present in a
+    single scan. The lookahead makes matches zero-width, so a match is found at
+    every position; alternatives are tried longest first, and the shorter
+    tokens starting at the same position (always prefixes of the longest one)
+    are added back from a precomputed prefix table.
     """
+    unique = sorted(set(tokens), key=lambda token: (-len(token), token))
+    pattern = re.compile("(?=(" + "|".join(re.escape(token) for token in unique) + "))")
+    prefixes = {
+        token: frozenset(other for other in unique if token.startswith(other))
+        for token in unique
+    }
+    return pattern, prefixes
+
+
+_MATCHER, _PREFIXES = _compile_matcher(
+    BOT_PATTERNS + SUSPICIOUS_PATTERNS + BOT_INDICATORS + SCANNER_PATTERNS + EXPLOIT_PATTERNS + DEVICE_TOKENS
+)
+_BOT_TOKENS = frozenset(BOT_PATTERNS + BOT_INDICATORS)
+_SUSPICIOUS_TOKENS = frozenset(SUSPICIOUS_PATTERNS)
+_SCANNER_EXPLOIT_TOKENS = frozenset(SCANNER_PATTERNS + EXPLOIT_PATTERNS)
+
+
+def _find_tokens(ua_lower: str) -> FrozenSet[str]:
+    """Set of known tokens contained in ua_lower."""
+    found = set()
+    for match in _MATCHER.finditer(ua_lower):
+        found |= _PREFIXES[match.group(1)]
+    return frozenset(found)
+
+
+class UserAgentClassification(NamedTuple):
+    """Everything derived from a user agent string, computed in one scan."""
+    is_bot: bool
+    is_suspicious: bool
+    # A suspicious (scanner/exploit) pattern matched but no bot pattern did
+    suspicious_pattern_only: bool
+    device_type: Optional[str]
+    browser: Optional[str]
+    os: Optional[str]
+
+
+def _classify(user_agent: str) -> UserAgentClassification:
     if not user_agent:
-        return DeviceInfo()
-    
-    ua_lower = user_agent.lower()
+        # Missing UA is suspicious
+        return UserAgentClassification(True, True, False, None, None, None)
+    
+    tokens = _find_tokens(user_agent.lower())
+    
+    matched_bot = not tokens.isdisjoint(_BOT_TOKENS)
+    matched_suspicious = not tokens.isdisjoint(_SUSPICIOUS_TOKENS)
+    bot = (
+        matched_bot
+        or matched_suspicious
+        # Very short or very long user agents are often bots
+        or len(user_agent) < 10
+        or len(user_agent) > 500
+    )
     
     # Detect device type
     device_type = "Desktop"
-    if "mobile" in ua_lower or "android" in ua_lower:
+    if "mobile" in tokens or "android" in tokens:
         device_type = "Mobile"
-    elif "tablet" in ua_lower or "ipad" in ua_lower:
+    elif "tablet" in tokens or "ipad" in tokens:
         device_type = "Tablet"
     
     # Detect browser
     browser = "Unknown"
-    if "chrome" in ua_lower and "edg" not in ua_lower and "headless" not in ua_lower:
+    if "chrome" in tokens and "edg" not in tokens and "headless" not in tokens:
         browser = "Chrome"
-    elif "firefox" in ua_lower:
+    elif "firefox" in tokens:
         browser = "Firefox"
-    elif "safari" in ua_lower and "chrome" not in ua_lower:
+    elif "safari" in tokens and "chrome" not in tokens:
         browser = "Safari"
-    elif "edg" in ua_lower or "edge" in ua_lower:
+    elif "edg" in tokens:
         browser = "Edge"
-    elif "opera" in ua_lower or "opr" in ua_lower:
+    elif "opera" in tokens or "opr" in tokens:
         browser = "Opera"
-    elif "brave" in ua_lower:
+    elif "brave" in tokens:
         browser = "Brave"
     
     # Detect OS
     os_name = "Unknown"
-    if "windows" in ua_lower:
+    if "windows" in tokens:
         os_name = "Windows"
-    elif "mac" in ua_lower or "darwin" in ua_lower:
+    elif "mac" in tokens or "darwin" in tokens:
         os_name = "macOS"
-    elif "linux" in ua_lower:
+    elif "linux" in tokens:
         os_name = "Linux"
-    elif "android" in ua_lower:
+    elif "android" in tokens:
         os_name = "Android"
-    elif "ios" in ua_lower or "iphone" in ua_lower or "ipad" in ua_lower:
+    elif "ios" in tokens or "iphone" in tokens or "ipad" in tokens:
         os_name = "iOS"
     
-    return DeviceInfo(
+    return UserAgentClassification(
+        is_bot=bot,
+        is_suspicious=not tokens.isdisjoint(_SCANNER_EXPLOIT_TOKENS),
+        suspicious_pattern_only=matched_suspicious and not matched_bot,
         device_type=device_type,
         browser=browser,
         os=os_name
     )
 
 
+_classify_cached = lru_cache(maxsize=UA_CACHE_SIZE)(_classify)
+
+
+def classify_user_agent(user_agent: Optional[str]) -> UserAgentClassification:
+    """
+    Bot, suspicious and device/browser/OS classification of a user agent.
+    Memoized by the raw UA string.
+    """
+    user_agent = user_agent or ""
+    if len(user_agent) > MAX_CACHED_UA_LENGTH:
+        return _classify(user_agent)
+    return _classify_cached(user_agent)
+
+
+def get_user_agent_cache_stats() -> Dict[str, int]:
+    info = _classify_cached.cache_info()
+    return {
+        "hits": info.hits,
+        "misses": info.misses,
+        "entries": info.currsize,
+        "max_entries": info.maxsize,
+    }
+
+
+def parse_user_agent(user_agent: str) -> DeviceInfo:
+    """
+    Parse user agent string to extract device type, browser, and OS.
+    Basic parser - can be enhanced with user-agents library if needed.
+    """
+    if not user_agent:
+        return DeviceInfo()
+    
+    classification = classify_user_agent(user_agent)
+    return DeviceInfo(
+        device_type=classification.device_type,
+        browser=classification.browser,
+        os=classification.os
+    )
+
+
 def is_bot(user_agent: str) -> bool:
     """
     Enhanced bot detection based on user agent string.
     Returns True if user agent appears to be a bot.
     """
-    if not user_agent:
-        return True  # Missing UA is suspicious
-    
-    ua_lower = user_agent.lower()
-    
-    # Check against bot patterns
-    for pattern in BOT_PATTERNS:
-        if pattern in ua_lower:
-            return True
+    classification = classify_user_agent(user_agent)
     
-    # Check for suspicious patterns
-    for pattern in SUSPICIOUS_PATTERNS:
-        if pattern in ua_lower:
-            logger.warning(f"Suspicious user agent detected: {user_agent}")
-            return True
+    # Logged on every call, not only when the classification is first computed
+    if classification.suspicious_pattern_only:
+        logger.warning(f"Suspicious user agent detected: {user_agent}")
     
-    # Check for very short or very long user agents (often bots)
-    if len(user_agent) < 10 or len(user_agent) > 500:
-        return True
-    
-    # Check for common bot indicators
-    if any(indicator in ua_lower for indicator in ["bot/", "crawler/", "spider/"]):
-        return True
-    
-    return False
+    return classification.is_bot
 
 
 def is_suspicious_user_agent(user_agent: str) -> bool:
     """
     Detect suspicious user agent patterns that might indicate malicious activity.
     """
-    if not user_agent:
-        return True
-    
-    ua_lower = user_agent.lower()
-    
-    # Check for security scanner patterns
-    scanner_patterns = [
-        "sqlmap", "nikto", "nmap", "masscan", 
-        "zap", "burp", "acunetix", "nessus"
-    ]
-    
-    if any(pattern in ua_lower for pattern in scanner_patterns):
-        return True
-    
-    # Check for exploit patterns
-    exploit_patterns = [
-        "exploit", "injection", "xss", "sqli", 
-        "payload", "shell", "cmd"
-    ]
-    
-    if any(pattern in ua_lower for pattern in exploit_patterns):
-        return True
-    
-    return False
+    return classify_user_agent(user_agent).is_suspicious
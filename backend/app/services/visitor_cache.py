@@ -0,0 +1,89 @@
+"""
+Hot visitor/session cache for the tracking path.
+
+Maps hashed IP -> visitor row and visitor_id -> active session row so a visitor
+browsing several pages does not repeat the same lookups on every event. Entries
+are written through on every update and expire with the session window.
+
+The cache is per process: with several workers a visitor row may be stale
+while another worker updates it, so it is opt-in (VISITOR_CACHE_ENABLED).
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from app.core.cache import TTLCache
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_visitors = TTLCache(
+    max_entries=settings.visitor_cache_max_entries,
+    ttl_seconds=settings.session_timeout_minutes * 60
+)
+_sessions = TTLCache(
+    max_entries=settings.visitor_cache_max_entries,
+    ttl_seconds=settings.session_timeout_minutes * 60
+)
+
+
+def get_cached_visitor(stored_ip: str) -> Optional[Dict[str, Any]]:
+    """Return the cached visitor row for a hashed IP, if any."""
+    if not settings.visitor_cache_enabled:
+        return None
+    return _visitors.get(stored_ip)
+
+
+def cache_visitor(visitor: Optional[Dict[str, Any]]):
+    """Store (write through) a visitor row keyed by its hashed IP."""
+    if not settings.visitor_cache_enabled or not visitor or not visitor.get("ip_address"):
+        return
+    _visitors.set(visitor["ip_address"], visitor)
+
+
+def invalidate_visitor(stored_ip: str):
+    _visitors.delete(stored_ip)
+
+
+def get_cached_session(visitor_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Return the cached active session for a visitor.
+    Sessions that have ended or fall outside the session window are dropped.
+    """
+    if not settings.visitor_cache_enabled:
+        return None
+    
+    session = _sessions.get(visitor_id)
+    if session is None:
+        return None
+    
+    cutoff = (datetime.utcnow() - timedelta(minutes=settings.session_timeout_minutes)).isoformat()
+    if session.get("session_end") or (session.get("session_start") or "") < cutoff:
+        _sessions.delete(visitor_id)
+        return None
+    
+    return session
+
+
+def cache_session(session: Optional[Dict[str, Any]]):
+    """Store (write through) the active session row for its visitor."""
+    if not settings.visitor_cache_enabled or not session or not session.get("visitor_id"):
+        return
+    _sessions.set(session["visitor_id"], session)
+
+
+def invalidate_session(visitor_id: str):
+    _sessions.delete(visitor_id)
+
+
+def clear_visitor_cache():
+    """Drop every cached visitor and session."""
+    _visitors.clear()
+    _sessions.clear()
+
+
+def get_visitor_cache_stats() -> Dict[str, Any]:
+    return {
+        "enabled": settings.visitor_cache_enabled,
+        "visitors": _visitors.stats(),
+        "sessions": _sessions.stats()
+    }
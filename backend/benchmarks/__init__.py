@@ -0,0 +1,10 @@
+"""
+Offline benchmarks. Unless the environment says otherwise, the app runs on the
+in-memory storage backend with a placeholder admin token, so no Supabase project
+or network access is needed; ipinfo.io is replaced by a local stub server.
+"""
+
+import os
+
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+os.environ.setdefault("ADMIN_API_TOKEN", "benchmark")
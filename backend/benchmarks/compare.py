@@ -0,0 +1,65 @@
+"""
+Compare two benchmark result files (same suite) and flag regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json
+    python -m benchmarks.compare baseline.json candidate.json --threshold 15
+
+Timings (*_us) regress when they grow, throughput (*_rps) when it drops. Exits
+with status 1 if any metric regressed by more than --threshold percent.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict
+
+
+def flatten(results: Dict, prefix: str = "") -> Dict[str, float]:
+    metrics = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            metrics.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and (key.endswith("_us") or key.endswith("_rps")):
+            metrics[name] = float(value)
+    return metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare benchmark result files")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=10.0, help="Regression threshold in percent")
+    args = parser.parse_args()
+    
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+    
+    if baseline.get("suite") != candidate.get("suite"):
+        print(f"✗ Suites differ: {baseline.get('suite')} vs {candidate.get('suite')}")
+        sys.exit(2)
+    
+    print(f"{baseline.get('suite')}: {(baseline.get('commit') or '?')[:10]} -> {(candidate.get('commit') or '?')[:10]}")
+    
+    old = flatten(baseline["results"])
+    new = flatten(candidate["results"])
+    regressions = 0
+    for name in sorted(old.keys() & new.keys()):
+        if not old[name]:
+            continue
+        change = (new[name] - old[name]) / old[name] * 100
+        worse = change < -args.threshold if name.endswith("_rps") else change > args.threshold
+        regressions += worse
+        marker = "  REGRESSION" if worse else ""
+        print(f"  {name:<55} {old[name]:>12.2f} -> {new[name]:>12.2f}  {change:+7.1f}%{marker}")
+    
+    if regressions:
+        print(f"✗ {regressions} metric(s) regressed by more than {args.threshold}%")
+        sys.exit(1)
+    print("✓ No regressions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Micro-benchmarks for the per-event hot path: user agent parsing, bot detection,
+IP hashing, engagement scoring, the abuse check and the visitor metrics update
+(against visitors with growing page history). Results are JSON, see results.py.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --iterations 20000 --output micro.json
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import benchmarks  # noqa: F401  (offline settings)
+from app.core.config import settings
+from app.core.database import set_db
+from app.core.memory_storage import MemoryStorageClient
+from app.middleware.abuse_detection import is_abusive_ip
+from app.services.intent_calculator import calculate_engagement
+from app.services.ip_security import hash_ip
+from app.services.tracking_service import update_visitor_metrics
+from app.services.user_agent_parser import is_bot, parse_user_agent
+from benchmarks.results import build_report, time_calls, write_report
+
+CHROME_UA = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36"
+HISTORY_SIZES = (10, 100, 1000, 10000)
+
+
+def bench_functions(iterations: int):
+    unique_uas = iter([f"{CHROME_UA} build/{i}" for i in range(iterations * 5 + 10)])
+    return {
+        "parse_user_agent_cached": time_calls(lambda: parse_user_agent(CHROME_UA), iterations),
+        "parse_user_agent_unique": time_calls(lambda: parse_user_agent(next(unique_uas)), iterations),
+        "is_bot": time_calls(lambda: is_bot(CHROME_UA), iterations),
+        "hash_ip": time_calls(lambda: hash_ip("203.0.113.7"), iterations),
+        "calculate_engagement": time_calls(
+            lambda: calculate_engagement(80, "cta-button", "/products/analytics", True, 3),
+            iterations
+        ),
+    }
+
+
+async def time_async_calls(factory, iterations: int, repeat: int = 5):
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            await factory()
+        runs.append((time.perf_counter() - start) / iterations)
+    runs.sort()
+    return {
+        "iterations": iterations,
+        "best_us": round(runs[0] * 1e6, 3),
+        "median_us": round(runs[len(runs) // 2] * 1e6, 3),
+    }
+
+
+async def bench_async(iterations: int):
+    results = {
+        "is_abusive_ip": await time_async_calls(lambda: is_abusive_ip("203.0.113.7"), iterations),
+    }
+    
+    # Per-update cost should stay flat as the visitor's page history grows
+    db = MemoryStorageClient()
+    set_db(db)
+    update_iterations = max(1, iterations // 10)
+    for size in HISTORY_SIZES:
+        visitor = db.table("visitors").insert({
+            "ip_address": f"history-{size}",
+            "visit_count": size,
+            "total_page_views": size,
+            "page_counts": {f"/page/{i}": 1 for i in range(size)},
+            "most_visited_page": "/page/0",
+        }).execute().data[0]
+        
+        results[f"update_visitor_metrics_history_{size}"] = await time_async_calls(
+            lambda: update_visitor_metrics(
+                visitor_id=visitor["id"],
+                intent_delta=5,
+                engagement_delta=10,
+                time_spent=30,
+                is_returning=True,
+                sessions_in_7_days=2,
+                page_url_counts={"/pricing": 1},
+                visitor=visitor
+            ),
+            update_iterations
+        )
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Micro-benchmarks for the tracking hot path")
+    parser.add_argument("--iterations", type=int, default=10000)
+    parser.add_argument("--output", help="JSON output file (default: stdout)")
+    args = parser.parse_args()
+    
+    settings.abuse_threshold_per_minute = 10 ** 9
+    settings.visitor_cache_enabled = False
+    logging.disable(logging.WARNING)
+    
+    results = bench_functions(args.iterations)
+    results.update(asyncio.run(bench_async(args.iterations)))
+    write_report(build_report("micro", {"iterations": args.iterations}, results), args.output)
+
+
+if __name__ == "__main__":
+    main()
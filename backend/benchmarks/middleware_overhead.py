@@ -0,0 +1,136 @@
+"""
+Per-request middleware overhead: the previous three @app.middleware("http")
+layers versus the single RequestPipelineMiddleware.
+
+Each variant wraps the same trivial endpoint and is driven in-process through
+httpx's ASGI transport, so the numbers isolate middleware cost from the network
+and the database.
+
+    python -m benchmarks.middleware_overhead
+    python -m benchmarks.middleware_overhead --requests 5000
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.core.config import settings
+from app.core.request_context import get_request_context
+from app.middleware.abuse_detection import is_abusive_ip, is_suspicious_request
+from app.middleware.request_pipeline import RequestPipelineMiddleware
+from app.middleware.security import add_security_headers
+
+HEADERS = {
+    "user-agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "x-forwarded-for": "203.0.113.7",
+}
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    
+    @app.get("/bench")
+    async def bench():
+        return {"status": "ok"}
+    
+    return app
+
+
+def build_legacy_app() -> FastAPI:
+    """The three decorator middleware layers as they were before the pipeline."""
+    app = build_app()
+    
+    @app.middleware("http")
+    async def security_headers_middleware(request: Request, call_next):
+        response = await call_next(request)
+        return add_security_headers(response)
+    
+    @app.middleware("http")
+    async def abuse_detection_middleware(request: Request, call_next):
+        context = get_request_context(request)
+        if await is_abusive_ip(context.client_ip):
+            return JSONResponse(status_code=429, content={"detail": "Too many requests"})
+        is_suspicious_request(request)
+        return await call_next(request)
+    
+    @app.middleware("http")
+    async def request_logging_middleware(request: Request, call_next):
+        request_id = str(uuid.uuid4())[:8]
+        start_time = time.time()
+        response = await call_next(request)
+        logging.getLogger(__name__).info(f"Request - ID: {request_id}, Time: {time.time() - start_time:.3f}s")
+        response.headers["X-Request-ID"] = request_id
+        return response
+    
+    return app
+
+
+def build_pipeline_app() -> FastAPI:
+    app = build_app()
+    app.add_middleware(RequestPipelineMiddleware)
+    return app
+
+
+async def measure(app: FastAPI, requests: int, warmup: int) -> list:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for _ in range(warmup):
+            await client.get("/bench", headers=HEADERS)
+        
+        timings = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = await client.get("/bench", headers=HEADERS)
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200, response.status_code
+    return timings
+
+
+def summarize(name: str, timings: list, baseline: float) -> str:
+    mean = statistics.mean(timings) * 1e6
+    p50 = statistics.median(timings) * 1e6
+    p99 = sorted(timings)[int(len(timings) * 0.99) - 1] * 1e6
+    return f"{name:<10} mean {mean:8.1f} us   p50 {p50:8.1f} us   p99 {p99:8.1f} us   overhead {mean - baseline:8.1f} us"
+
+
+async def run(requests: int, warmup: int):
+    # Never trip the abuse limiter while benchmarking; keep log I/O out of the numbers
+    settings.abuse_threshold_per_minute = 10 ** 9
+    logging.disable(logging.INFO)
+    
+    variants = [
+        ("none", build_app()),
+        ("legacy", build_legacy_app()),
+        ("pipeline", build_pipeline_app()),
+    ]
+    results = {}
+    for name, app in variants:
+        results[name] = await measure(app, requests, warmup)
+    
+    baseline = statistics.mean(results["none"]) * 1e6
+    print(f"{requests} requests per variant")
+    for name, timings in results.items():
+        print(summarize(name, timings, baseline))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare middleware overhead per request")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--warmup", type=int, default=200)
+    args = parser.parse_args()
+    
+    asyncio.run(run(args.requests, args.warmup))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Shared helpers for benchmark timing summaries and JSON result files.
+
+Result files carry the commit they were produced from, so runs can be compared
+across commits with `python -m benchmarks.compare old.json new.json`.
+"""
+
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def latency_summary(timings: List[float]) -> Dict[str, float]:
+    """Mean and p50/p95/p99 of timings in seconds, reported in microseconds."""
+    ordered = sorted(timings)
+    scale = 1e6
+    return {
+        "samples": len(ordered),
+        "mean_us": round(sum(ordered) / len(ordered) * scale, 2) if ordered else 0.0,
+        "p50_us": round(percentile(ordered, 0.50) * scale, 2),
+        "p95_us": round(percentile(ordered, 0.95) * scale, 2),
+        "p99_us": round(percentile(ordered, 0.99) * scale, 2),
+    }
+
+
+def time_calls(func: Callable[[], Any], iterations: int, repeat: int = 5) -> Dict[str, float]:
+    """Per-call time of func: best and median of `repeat` runs of `iterations` calls."""
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func()
+        runs.append((time.perf_counter() - start) / iterations)
+    runs.sort()
+    return {
+        "iterations": iterations,
+        "best_us": round(runs[0] * 1e6, 3),
+        "median_us": round(runs[len(runs) // 2] * 1e6, 3),
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(suite: str, config: Dict[str, Any], results: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "suite": suite,
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": config,
+        "results": results,
+    }
+
+
+def write_report(report: Dict[str, Any], output: Optional[str]):
+    """Write the report to output (a path), or to stdout when output is None or '-'."""
+    text = json.dumps(report, indent=2)
+    if not output or output == "-":
+        print(text)
+        return
+    with open(output, "w") as f:
+        f.write(text + "\n")
+    print(f"✓ Results written to {output}")
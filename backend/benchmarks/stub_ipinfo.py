@@ -0,0 +1,69 @@
+"""
+Local stand-in for the ipinfo.io API: a minimal HTTP/1.1 keep-alive server that
+answers every GET /<ip>/json with a fixed geo record, after an optional delay
+that simulates network latency.
+
+    async with stub_ipinfo_server(latency_ms=20) as base_url:
+        settings.ipinfo_base_url = base_url
+"""
+
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+GEO_RECORD = {"country": "US", "region": "California", "city": "San Francisco", "timezone": "America/Los_Angeles"}
+
+
+class StubIpinfoServer:
+    def __init__(self, latency_ms: float = 0.0):
+        self.latency = latency_ms / 1000
+        self.requests = 0
+        self._server = None
+        self._body = json.dumps(GEO_RECORD).encode()
+    
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in head.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                if length:
+                    await reader.readexactly(length)
+                
+                self.requests += 1
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(self._body)}\r\n\r\n".encode()
+                    + self._body
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+    
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        host, port = self._server.sockets[0].getsockname()[:2]
+        return f"http://{host}:{port}"
+    
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+
+@asynccontextmanager
+async def stub_ipinfo_server(latency_ms: float = 0.0):
+    server = StubIpinfoServer(latency_ms)
+    base_url = await server.start()
+    try:
+        yield base_url
+    finally:
+        await server.stop()
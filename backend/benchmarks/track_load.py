@@ -0,0 +1,157 @@
+"""
+Load test for POST /api/track, fully offline.
+
+The real application (middleware, routing, tracking service) is driven in-process
+through httpx's ASGI transport, on a fresh in-memory storage backend
+(app/core/memory_storage.py) with ipinfo.io replaced by a local stub server. Reports throughput and p50/p95/p99
+latency at the requested concurrency as JSON, and exits non-zero if the stored
+visitor counters lost or duplicated any tracked event.
+
+    python -m benchmarks.track_load
+    python -m benchmarks.track_load --requests 5000 --concurrency 64 --visitors 500 --output track.json
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import logging
+import random
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import benchmarks  # noqa: F401  (offline settings)
+import httpx
+from app.core.config import settings
+from app.core.database import set_db
+from app.core.memory_storage import MemoryStorageClient
+from benchmarks.results import build_report, latency_summary, write_report
+from benchmarks.stub_ipinfo import stub_ipinfo_server
+
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/17.2 Safari/605.1.15",
+    "Mozilla/5.0 (iPhone; CPU iPhone OS 17_2 like Mac OS X) AppleWebKit/605.1.15 (KHTML, like Gecko) Mobile/15E148",
+    "Mozilla/5.0 (X11; Linux x86_64; rv:121.0) Gecko/20100101 Firefox/121.0",
+]
+PAGES = ["/", "/pricing", "/contact", "/products/analytics", "/blog/launch", "/about"]
+
+
+def check_consistency(db: MemoryStorageClient, payloads, errors: int):
+    """
+    Compare the stored counters with what was sent: one visitor per IP and no lost
+    increments under concurrent requests for the same visitor.
+    """
+    visitors = list(db.get_table("visitors").rows.values())
+    expected_events = len(payloads) - errors
+    summary = {
+        "distinct_ips": len({headers["x-forwarded-for"] for headers, _ in payloads}),
+        "visitors": len(visitors),
+        "expected_events": expected_events,
+        "page_events": len(db.get_table("page_events").rows),
+        "visit_count_sum": sum(visitor.get("visit_count") or 0 for visitor in visitors),
+        "total_page_views_sum": sum(visitor.get("total_page_views") or 0 for visitor in visitors),
+    }
+    summary["ok"] = (
+        summary["visitors"] == summary["distinct_ips"]
+        and summary["page_events"] == summary["visit_count_sum"] == summary["total_page_views_sum"] == expected_events
+    )
+    return summary
+
+
+def build_payloads(requests: int, visitors: int, seed: int):
+    """Pre-generate (headers, body) pairs so request construction stays out of the timings."""
+    rng = random.Random(seed)
+    ips = [f"10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}" for i in range(visitors)]
+    payloads = []
+    for _ in range(requests):
+        headers = {"user-agent": rng.choice(USER_AGENTS), "x-forwarded-for": rng.choice(ips)}
+        body = {
+            "page_url": rng.choice(PAGES),
+            "event_type": rng.choice(["page_view", "page_view", "click", "scroll"]),
+            "time_spent": rng.randint(1, 120),
+            "scroll_depth": rng.randint(0, 100),
+            "click_target": rng.choice([None, "cta-button", "nav-link"]),
+        }
+        payloads.append((headers, body))
+    return payloads
+
+
+async def run_load(requests: int, concurrency: int, visitors: int, geo_latency_ms: float, seed: int):
+    from app.main import app
+    
+    db = MemoryStorageClient()
+    set_db(db)
+    payloads = build_payloads(requests, visitors, seed)
+    timings = []
+    errors = 0
+    next_index = 0
+    
+    async def worker(client: httpx.AsyncClient):
+        nonlocal next_index, errors
+        while next_index < len(payloads):
+            headers, body = payloads[next_index]
+            next_index += 1
+            start = time.perf_counter()
+            response = await client.post("/api/track", json=body, headers=headers)
+            timings.append(time.perf_counter() - start)
+            if response.status_code >= 400 or response.json().get("status") == "error":
+                errors += 1
+    
+    async with stub_ipinfo_server(geo_latency_ms) as base_url:
+        settings.ipinfo_base_url = base_url
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+                started = time.perf_counter()
+                await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+                elapsed = time.perf_counter() - started
+    
+    return {
+        "track": {
+            "requests": len(timings),
+            "errors": errors,
+            "elapsed_s": round(elapsed, 3),
+            "throughput_rps": round(len(timings) / elapsed, 1),
+            "latency": latency_summary(timings),
+            "rows": db.row_counts(),
+            "consistency": check_consistency(db, payloads, errors),
+        }
+    }
+
+
+def configure_for_benchmark():
+    """Keep rate limiting, abuse blocking and log I/O out of the measurement."""
+    settings.rate_limit_per_minute = 10 ** 9
+    settings.abuse_threshold_per_minute = 10 ** 9
+    logging.disable(logging.WARNING)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test of POST /api/track")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--visitors", type=int, default=200, help="Distinct client IPs")
+    parser.add_argument("--geo-latency-ms", type=float, default=20.0, help="Stub ipinfo response delay")
+    parser.add_argument("--visitor-cache", action="store_true", help="Enable the hot visitor/session cache")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="JSON output file (default: stdout)")
+    args = parser.parse_args()
+    
+    configure_for_benchmark()
+    settings.visitor_cache_enabled = args.visitor_cache
+    
+    config = vars(args).copy()
+    config.pop("output")
+    results = asyncio.run(run_load(args.requests, args.concurrency, args.visitors, args.geo_latency_ms, args.seed))
+    write_report(build_report("track_load", config, results), args.output)
+    
+    consistency = results["track"]["consistency"]
+    if not consistency["ok"]:
+        print(f"✗ Stored counters do not match the tracked events: {consistency}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
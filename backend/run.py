@@ -1,13 +1,21 @@
 """
 Development server runner for FastAPI backend.
+
+    python run.py                      # start the server with reload
+    python run.py --profile-startup    # report import and startup time instead
 """
-import uvicorn
+import sys
 
 if __name__ == "__main__":
+    if "--profile-startup" in sys.argv:
+        from scripts.profile_startup import main
+        main([arg for arg in sys.argv[1:] if arg != "--profile-startup"])
+        sys.exit(0)
+    
+    import uvicorn
     uvicorn.run(
         "app.main:app",
         host="0.0.0.0",
         port=8000,
         reload=True
     )
-
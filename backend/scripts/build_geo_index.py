@@ -0,0 +1,34 @@
+"""
+Compile a CSV IP-range file into the memory-mapped geo index used by
+app.services.geo_database.
+
+Run with: python -m scripts.build_geo_index ranges.csv geo.idx
+"""
+
+import sys
+import os
+import argparse
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.geo_database import build_geo_index, GeoDatabase
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a geo index from a CSV range file")
+    parser.add_argument("csv_path", help="CSV with start_ip/end_ip or network columns")
+    parser.add_argument("output_path", help="Index file to write")
+    args = parser.parse_args()
+    
+    start = time.perf_counter()
+    count = build_geo_index(args.csv_path, args.output_path)
+    elapsed = time.perf_counter() - start
+    
+    database = GeoDatabase(args.output_path)
+    print(f"✓ Wrote {count} ranges, {database.location_count} locations to {args.output_path} in {elapsed:.1f}s")
+    database.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Bulk export of visitors, sessions and page events to CSV or Parquet.
+
+Rows are fetched in id-ordered batches, so memory stays bounded by one batch.
+Progress is checkpointed after every batch to <output>.checkpoint; rerun with
+--resume to continue an interrupted export.
+
+    python -m scripts.export_data visitors --output visitors.csv
+    python -m scripts.export_data page_events --format parquet --output page_events/ --country US
+    python -m scripts.export_data visitors --output visitors.csv --resume
+
+CSV output is a single file. Parquet output is a directory of part files, one
+per batch (requires pyarrow).
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import json
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.export_service import (
+    EXPORT_COLUMNS, arrow_available, iter_export_batches, rows_to_csv, rows_to_record_batch
+)
+
+
+def load_checkpoint(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, checkpoint):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, path)
+
+
+async def export(table, output, file_format, filters, batch_size, resume):
+    checkpoint_path = f"{output.rstrip(os.sep)}.checkpoint"
+    checkpoint = load_checkpoint(checkpoint_path) if resume else None
+    
+    if checkpoint and (checkpoint.get("table") != table or checkpoint.get("filters") != filters):
+        print(f"✗ {checkpoint_path} belongs to a different export; remove it or drop --resume")
+        return
+    
+    if checkpoint is None:
+        checkpoint = {"table": table, "filters": filters, "last_id": None, "rows": 0, "offset": 0, "parts": 0}
+    else:
+        print(f"Resuming {table} after id {checkpoint['last_id']} ({checkpoint['rows']} rows already exported)")
+    
+    if file_format == "csv":
+        # Drop anything written after the last checkpoint, then append
+        mode = "r+" if checkpoint["offset"] and os.path.exists(output) else "w"
+        out = open(output, mode, newline="", encoding="utf-8")
+        if mode == "r+":
+            out.seek(checkpoint["offset"])
+            out.truncate()
+        else:
+            out.write(rows_to_csv(table, [], header=True))
+    else:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        os.makedirs(output, exist_ok=True)
+        out = None
+    
+    try:
+        async for rows in iter_export_batches(table, filters, checkpoint["last_id"], batch_size):
+            if file_format == "csv":
+                out.write(rows_to_csv(table, rows))
+                out.flush()
+                checkpoint["offset"] = out.tell()
+            else:
+                part_path = os.path.join(output, f"part-{checkpoint['parts']:06d}.parquet")
+                pq.write_table(pa.Table.from_batches([rows_to_record_batch(table, rows)]), part_path)
+                checkpoint["parts"] += 1
+            
+            checkpoint["last_id"] = rows[-1]["id"]
+            checkpoint["rows"] += len(rows)
+            save_checkpoint(checkpoint_path, checkpoint)
+            print(f"  ... {checkpoint['rows']} rows exported")
+    finally:
+        if out is not None:
+            out.close()
+    
+    print(f"✓ Exported {checkpoint['rows']} {table} rows to {output}")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export visitors, sessions or page events")
+    parser.add_argument("table", choices=list(EXPORT_COLUMNS))
+    parser.add_argument("--output", required=True, help="CSV file, or directory for Parquet part files")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--resume", action="store_true", help="Continue from <output>.checkpoint")
+    parser.add_argument("--country")
+    parser.add_argument("--heat-level")
+    parser.add_argument("--industry")
+    parser.add_argument("--date-from", help="Visitor last visit date from (YYYY-MM-DD)")
+    parser.add_argument("--date-to", help="Visitor last visit date to (YYYY-MM-DD)")
+    args = parser.parse_args()
+    
+    if args.format == "parquet" and not arrow_available():
+        print("✗ Parquet export requires the pyarrow package (pip install pyarrow)")
+        sys.exit(1)
+    
+    filters = {
+        "country": args.country,
+        "heat_level": args.heat_level,
+        "industry": args.industry,
+        "date_from": args.date_from,
+        "date_to": args.date_to
+    }
+    asyncio.run(export(args.table, args.output, args.format, filters, args.batch_size, args.resume))
+
+
+if __name__ == "__main__":
+    main()
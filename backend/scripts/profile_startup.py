@@ -0,0 +1,128 @@
+"""
+Startup profile: where the time goes between launching a worker and serving.
+
+Runs `python -X importtime` on `import app.main` in a fresh interpreter, then
+times the application lifespan startup (storage client, HTTP pool, background
+services) in another one, and prints the slowest modules and top-level packages.
+
+    python -m scripts.profile_startup
+    python -m scripts.profile_startup --top 30 --json
+    python run.py --profile-startup
+"""
+
+import sys
+import os
+import argparse
+import json
+import subprocess
+import time
+from collections import defaultdict
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+LIFESPAN_PROBE = """
+import asyncio, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+async def startup():
+    async with app.main.app.router.lifespan_context(app.main.app):
+        ready = time.perf_counter()
+    return ready
+ready = asyncio.run(startup())
+print(f"{(imported - started) * 1000:.1f} {(ready - imported) * 1000:.1f}")
+"""
+
+
+def parse_importtime(stderr: str):
+    """(module, self_us, cumulative_us, depth) for each line of -X importtime output."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip())) // 2
+        entries.append((name.strip(), int(self_us), int(cumulative_us), depth))
+    return entries
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=BACKEND_DIR, capture_output=True, text=True
+    )
+
+
+def profile(top: int):
+    started = time.perf_counter()
+    result = run_python("import app.main", "-X", "importtime")
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    
+    entries = parse_importtime(result.stderr)
+    packages = defaultdict(int)
+    for name, self_us, _, _ in entries:
+        packages[name.split(".")[0]] += self_us
+    
+    probe = run_python(LIFESPAN_PROBE)
+    if probe.returncode != 0:
+        raise RuntimeError(probe.stderr.strip().splitlines()[-1])
+    import_ms, lifespan_ms = (float(value) for value in probe.stdout.split())
+    
+    app_main = next((cumulative for name, _, cumulative, _ in entries if name == "app.main"), 0)
+    return {
+        "interpreter_wall_ms": round(wall_ms, 1),
+        "import_app_main_ms": round(app_main / 1000, 1),
+        "import_app_main_measured_ms": import_ms,
+        "lifespan_startup_ms": lifespan_ms,
+        "modules_imported": len(entries),
+        "slowest_cumulative": [
+            {"module": name, "cumulative_ms": round(cumulative / 1000, 1)}
+            for name, _, cumulative, _ in sorted(entries, key=lambda e: e[2], reverse=True)[:top]
+        ],
+        "slowest_self": [
+            {"module": name, "self_ms": round(self_us / 1000, 1)}
+            for name, self_us, _, _ in sorted(entries, key=lambda e: e[1], reverse=True)[:top]
+        ],
+        "packages": [
+            {"package": package, "self_ms": round(total / 1000, 1)}
+            for package, total in sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+        ],
+    }
+
+
+def print_report(report):
+    print(f"import app.main:      {report['import_app_main_ms']:8.1f} ms ({report['modules_imported']} modules)")
+    print(f"lifespan startup:     {report['lifespan_startup_ms']:8.1f} ms")
+    print(f"interpreter (total):  {report['interpreter_wall_ms']:8.1f} ms")
+    
+    print("\nSlowest imports (cumulative):")
+    for entry in report["slowest_cumulative"]:
+        print(f"  {entry['cumulative_ms']:8.1f} ms  {entry['module']}")
+    
+    print("\nTime by top-level package (self):")
+    for entry in report["packages"]:
+        print(f"  {entry['self_ms']:8.1f} ms  {entry['package']}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Profile application import and startup time")
+    parser.add_argument("--top", type=int, default=15, help="Entries per table")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    
+    try:
+        report = profile(args.top)
+    except RuntimeError as e:
+        print(f"✗ Startup failed: {e}")
+        sys.exit(1)
+    
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Rebuild the analytics_hourly / analytics_daily rollups from raw page events.
+
+Use after enabling ANALYTICS_ROLLUPS_ENABLED on an existing database, or to
+repair a range whose in-memory deltas were lost (e.g. a worker crashed before
+its flush). Hours and days overlapping the range are recomputed in full.
+
+    python -m scripts.rebuild_analytics_rollups
+    python -m scripts.rebuild_analytics_rollups --from 2024-01-01 --to 2024-02-01
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.database import get_db, execute
+
+
+async def rebuild(date_from, date_to, chunk_days):
+    db = get_db()
+    start = date_from
+    total = 0
+    
+    # One database call per chunk keeps each transaction short
+    while start < date_to:
+        end = min(start + timedelta(days=chunk_days), date_to)
+        try:
+            result = await execute(db.rpc("rebuild_analytics_rollups", {
+                "p_from": start.isoformat(),
+                "p_to": end.isoformat()
+            }))
+            rows = (result.data or {}).get("hourly_rows", 0)
+            total += rows
+            print(f"  ... {start.date()} to {end.date()}: {rows} hourly rows")
+        except Exception as e:
+            print(f"✗ Error rebuilding {start.date()} to {end.date()}: {e}")
+            return
+        start = end
+    
+    print(f"✓ Rebuilt analytics rollups ({total} hourly rows)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild analytics rollup tables from page events")
+    parser.add_argument("--from", dest="date_from", help="Start date (YYYY-MM-DD), default 90 days ago")
+    parser.add_argument("--to", dest="date_to", help="End date (YYYY-MM-DD), default now")
+    parser.add_argument("--chunk-days", type=int, default=7, help="Days rebuilt per database call")
+    args = parser.parse_args()
+    
+    date_to = datetime.fromisoformat(args.date_to) if args.date_to else datetime.utcnow()
+    date_from = datetime.fromisoformat(args.date_from) if args.date_from else date_to - timedelta(days=90)
+    asyncio.run(rebuild(date_from, date_to, max(1, args.chunk_days)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""
+Repair job that rebuilds incrementally maintained visitor aggregates
+(page_counts, total_page_views, most_visited_page, pages_per_session,
+avg_session_duration) from raw sessions and page events.
+
+Run after applying the schema migration, or whenever aggregates drift:
+    python -m scripts.repair_visitor_aggregates
+    python -m scripts.repair_visitor_aggregates --visitor-id <uuid>
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.core.database import get_db
+from app.services.tracking_service import recompute_visitor_aggregates
+
+BATCH_SIZE = 500
+
+
+def iter_visitor_ids():
+    """Yield all visitor ids using keyset pagination on id."""
+    db = get_db()
+    last_id = None
+    
+    while True:
+        query = db.table("visitors").select("id").order("id").limit(BATCH_SIZE)
+        if last_id:
+            query = query.gt("id", last_id)
+        
+        result = query.execute()
+        if not result.data:
+            return
+        
+        for visitor in result.data:
+            yield visitor["id"]
+        
+        last_id = result.data[-1]["id"]
+
+
+async def repair(visitor_ids):
+    repaired = 0
+    failed = 0
+    for visitor_id in visitor_ids:
+        try:
+            if await recompute_visitor_aggregates(visitor_id) is not None:
+                repaired += 1
+        except Exception as e:
+            failed += 1
+            print(f"✗ Error repairing visitor {visitor_id}: {e}")
+        
+        if repaired and repaired % 100 == 0:
+            print(f"  ... {repaired} visitors repaired")
+    
+    print(f"✓ Repaired {repaired} visitors ({failed} failed)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild visitor page/session aggregates")
+    parser.add_argument("--visitor-id", help="Repair a single visitor")
+    args = parser.parse_args()
+    
+    visitor_ids = [args.visitor_id] if args.visitor_id else iter_visitor_ids()
+    asyncio.run(repair(visitor_ids))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Recompute every visitor's intent score, engagement score and heat level from
+raw page events, using the current rules in app/services/intent_calculator.py.
+
+Run after changing scoring weights or heat level thresholds:
+    python -m scripts.rescore_visitors
+    python -m scripts.rescore_visitors --dry-run
+    python -m scripts.rescore_visitors --chunk-size 1000 --after-id <uuid>
+
+Visitors are processed in id order, --chunk-size at a time; pass the last
+reported id as --after-id to continue an interrupted run. Events tracked while
+a chunk is being scored can be overwritten by its result, so prefer a quiet
+period. Requires numpy.
+"""
+
+import sys
+import os
+import argparse
+import asyncio
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from app.services.rescoring import ScoringRules, iter_visitor_chunks, numpy_available, rescore_chunk
+
+
+async def rescore(chunk_size, after_id, dry_run):
+    rules = ScoringRules()
+    scored = 0
+    changed = 0
+    started = time.monotonic()
+    
+    async for visitors in iter_visitor_chunks(chunk_size, after_id):
+        try:
+            chunk_scored, chunk_changed = await rescore_chunk(rules, visitors, dry_run=dry_run)
+        except Exception as e:
+            print(f"✗ Error rescoring visitors after {after_id}: {e}")
+            print(f"  Resume with --after-id {after_id}" if after_id else "  Rerun to start over")
+            return
+        
+        scored += chunk_scored
+        changed += chunk_changed
+        after_id = visitors[-1]["id"]
+        print(f"  ... {scored} visitors scored, {changed} changed (last id {after_id})")
+    
+    verb = "would change" if dry_run else "changed"
+    print(f"✓ Rescored {scored} visitors in {time.monotonic() - started:.1f}s; {verb} {changed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute visitor intent, engagement and heat level")
+    parser.add_argument("--chunk-size", type=int, default=500, help="Visitors scored per batch")
+    parser.add_argument("--after-id", help="Start after this visitor id")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    args = parser.parse_args()
+    
+    if not numpy_available():
+        print("✗ Re-scoring requires the numpy package (pip install numpy)")
+        sys.exit(1)
+    
+    asyncio.run(rescore(max(1, args.chunk_size), args.after_id, args.dry_run))
+
+
+if __name__ == "__main__":
+    main()
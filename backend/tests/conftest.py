@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+# Settings are read on first use; the tests need no .env or Supabase project
+os.environ.setdefault("ADMIN_API_TOKEN", "test-token")
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from app.core.database import set_db
+from app.core.memory_storage import MemoryStorageClient
+
+
+@pytest.fixture
+def db():
+    """A fresh in-memory store installed as the application's storage client."""
+    client = MemoryStorageClient()
+    set_db(client)
+    yield client
+    set_db(None)
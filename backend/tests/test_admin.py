@@ -0,0 +1,86 @@
+"""
+Admin API: cursor validation and the filter options ETag / 304 round trip.
+"""
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.routers.admin import decode_cursor, encode_cursor
+from app.services import filter_options
+
+VISITOR_ID = "2b7e1516-28ae-4d2a-a6f7-15882d2b7e15"
+
+
+def make_cursor(payload):
+    raw = json.dumps(payload).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("intent_score", {"id": VISITOR_ID, "intent_score": 42})
+    
+    assert decode_cursor(cursor, "intent_score") == {"s": "intent_score", "k": 42, "id": VISITOR_ID}
+
+
+@pytest.mark.parametrize("cursor, sort_key", [
+    ("not base64 json", "intent_score"),
+    (make_cursor(["intent_score", 42, VISITOR_ID]), "intent_score"),
+    (make_cursor({"s": "visit_count", "k": 42, "id": VISITOR_ID}), "intent_score"),
+    (make_cursor({"s": "intent_score", "k": 42, "id": "1),id.gt.(0"}), "intent_score"),
+    (make_cursor({"s": "intent_score", "k": 42}), "intent_score"),
+    (make_cursor({"s": "intent_score", "k": '1",id.gt."0', "id": VISITOR_ID}), "intent_score"),
+    (make_cursor({"s": "intent_score", "k": True, "id": VISITOR_ID}), "intent_score"),
+    (make_cursor({"s": "last_visit_date", "k": "yesterday", "id": VISITOR_ID}), "last_visit_date"),
+    (make_cursor({"s": "last_visit_date", "k": 42, "id": VISITOR_ID}), "last_visit_date"),
+])
+def test_tampered_cursors_are_rejected(cursor, sort_key):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor, sort_key)
+    
+    assert error.value.status_code == 400
+
+
+@pytest.fixture
+def client(db):
+    from app.main import app
+    
+    filter_options._cache.clear()
+    yield TestClient(app, headers={"Authorization": f"Bearer {settings.admin_api_token}"})
+    filter_options._cache.clear()
+
+
+def test_filter_options_are_revalidated_with_etag(db, client):
+    db.insert_row("visitors", {"ip_address": "a", "country": "US", "industry": "SaaS"})
+    db.insert_row("visitors", {"ip_address": "b", "country": "DE"})
+    
+    first = client.get("/api/admin/filters")
+    assert first.status_code == 200
+    assert first.json()["countries"] == ["DE", "US"]
+    etag = first.headers["etag"]
+    
+    for if_none_match in (etag, f"W/{etag}", f'"other", {etag}'):
+        revalidated = client.get("/api/admin/filters", headers={"If-None-Match": if_none_match})
+        assert revalidated.status_code == 304
+        assert revalidated.headers["etag"] == etag
+        assert revalidated.content == b""
+    
+    stale = client.get("/api/admin/filters", headers={"If-None-Match": '"other"'})
+    assert stale.status_code == 200
+    assert stale.json() == first.json()
+
+
+def test_filter_options_etag_changes_with_the_values(db, client):
+    db.insert_row("visitors", {"ip_address": "a", "country": "US"})
+    etag = client.get("/api/admin/filters").headers["etag"]
+    
+    db.insert_row("visitors", {"ip_address": "b", "country": "FR"})
+    filter_options._cache.clear()
+    response = client.get("/api/admin/filters", headers={"If-None-Match": etag})
+    
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["countries"] == ["FR", "US"]
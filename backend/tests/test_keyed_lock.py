@@ -0,0 +1,56 @@
+"""
+KeyedLock: holders of one key run one at a time, different keys run concurrently,
+and a key's lock is dropped once nobody holds or waits for it.
+"""
+import asyncio
+
+from app.core.keyed_lock import KeyedLock
+
+
+async def _hold(locks, key, active, peaks):
+    async with locks.hold(key):
+        active[key] = active.get(key, 0) + 1
+        peaks[key] = max(peaks.get(key, 0), active[key])
+        peaks["all"] = max(peaks.get("all", 0), sum(active.values()))
+        await asyncio.sleep(0.01)
+        active[key] -= 1
+
+
+def test_same_key_is_serialized():
+    locks = KeyedLock("test")
+    active, peaks = {}, {}
+    
+    async def scenario():
+        await asyncio.gather(*(_hold(locks, "visitor", active, peaks) for _ in range(4)))
+    
+    asyncio.run(scenario())
+    assert peaks["visitor"] == 1
+    assert locks.stats() == {"acquisitions": 4, "contended": 3, "held_keys": 0}
+
+
+def test_different_keys_run_concurrently():
+    locks = KeyedLock("test")
+    active, peaks = {}, {}
+    
+    async def scenario():
+        await asyncio.gather(*(_hold(locks, f"visitor-{i}", active, peaks) for i in range(4)))
+    
+    asyncio.run(scenario())
+    assert peaks["all"] == 4
+    assert locks.stats()["contended"] == 0
+
+
+def test_lock_is_released_when_the_holder_fails():
+    locks = KeyedLock("test")
+    
+    async def scenario():
+        try:
+            async with locks.hold("visitor"):
+                raise RuntimeError("write failed")
+        except RuntimeError:
+            pass
+        async with locks.hold("visitor"):
+            return locks.stats()["held_keys"]
+    
+    assert asyncio.run(scenario()) == 1
+    assert locks.stats()["held_keys"] == 0
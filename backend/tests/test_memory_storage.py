@@ -0,0 +1,131 @@
+"""
+The in-memory storage backend driven through the real services: admin keyset
+pagination, tracking metrics updates and the re-scoring / rollup database functions.
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.database import execute
+from app.routers.admin import _build_visitor_query, decode_cursor, encode_cursor
+from app.services.tracking_service import update_visitor_metrics
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def add_visitor(db, **columns):
+    return db.insert_row("visitors", {"ip_address": columns.pop("ip_address", "ip"), **columns})
+
+
+def test_in_filter_with_repeated_values_returns_each_row_once(db):
+    visitor = add_visitor(db, country="US")
+    add_visitor(db, country="DE")
+    
+    result = db.table("visitors").select("id").in_("country", ["US", "US"]).execute()
+    
+    assert [row["id"] for row in result.data] == [visitor["id"]]
+
+
+@pytest.mark.parametrize("sort_key", ["intent_score", "last_visit_date"])
+def test_keyset_pagination_covers_null_keys_once(db, sort_key):
+    base = datetime(2026, 1, 1)
+    for i in range(11):
+        # Every third visitor has no sort value; the rest share a few values
+        value = None if i % 3 == 0 else (i % 4 if sort_key == "intent_score" else (base + timedelta(days=i % 4)).isoformat())
+        add_visitor(db, ip_address=f"ip{i}", **{sort_key: value})
+    
+    expected = db.table("visitors").select("id").order(f"{sort_key}.desc,id", desc=True).execute().data
+    
+    seen, position = [], None
+    while True:
+        result = run(execute(_build_visitor_query(
+            sort_key, 2, country=None, heat_level=None, industry=None,
+            date_from=None, date_to=None, position=position
+        )))
+        seen.extend(row["id"] for row in result.data)
+        if len(result.data) < 2:
+            break
+        position = decode_cursor(encode_cursor(sort_key, result.data[-1]), sort_key)
+    
+    assert seen == [row["id"] for row in expected]
+    assert len(set(seen)) == 11
+
+
+def heat_level_counts(db):
+    rows = db.table("visitor_heat_level_counts").select("heat_level,visitors").execute().data
+    return {row["heat_level"]: row["visitors"] for row in rows if row["visitors"]}
+
+
+def test_heat_level_counts_follow_metric_updates(db):
+    cold = add_visitor(db, ip_address="a", heat_level="Cold", intent_score=0)
+    add_visitor(db, ip_address="b", heat_level="Cold", intent_score=0)
+    assert heat_level_counts(db) == {"Cold": 2}
+    
+    run(update_visitor_metrics(
+        visitor_id=cold["id"], intent_delta=1000, engagement_delta=0, time_spent=10,
+        is_returning=True, sessions_in_7_days=1, page_url_counts={"/pricing": 1}
+    ))
+    
+    updated = db.table("visitors").select("heat_level").eq("id", cold["id"]).execute().data[0]
+    assert updated["heat_level"] != "Cold"
+    assert heat_level_counts(db) == {"Cold": 1, updated["heat_level"]: 1}
+    
+    db.table("visitors").delete().eq("id", cold["id"]).execute()
+    assert heat_level_counts(db) == {"Cold": 1}
+
+
+def test_apply_visitor_scores_skips_unchanged_rows(db):
+    unchanged = add_visitor(db, ip_address="a", intent_score=10, engagement_score=5, heat_level="Cold", updated_at="2026-01-01T00:00:00")
+    changed = add_visitor(db, ip_address="b", intent_score=10, engagement_score=5, heat_level="Cold", updated_at="2026-01-01T00:00:00")
+    
+    result = run(execute(db.rpc("apply_visitor_scores", {"p_scores": [
+        {"id": unchanged["id"], "intent_score": 10, "engagement_score": 5, "heat_level": "Cold"},
+        {"id": changed["id"], "intent_score": 80, "engagement_score": 5, "heat_level": "Warm"},
+    ]})))
+    
+    assert result.data == 1
+    rows = {row["id"]: row for row in db.table("visitors").select("*").execute().data}
+    assert rows[unchanged["id"]]["updated_at"] == "2026-01-01T00:00:00"
+    assert rows[changed["id"]]["intent_score"] == 80
+    assert rows[changed["id"]]["updated_at"] != "2026-01-01T00:00:00"
+    assert heat_level_counts(db) == {"Cold": 1, "Warm": 1}
+
+
+@pytest.mark.filterwarnings("error")
+def test_rescoring_writes_only_changed_visitors(db):
+    pytest.importorskip("numpy")
+    from app.services.rescoring import ScoringRules, rescore_chunk
+    
+    visitor = add_visitor(db, ip_address="a", intent_score=0, engagement_score=0, heat_level="Cold")
+    session = db.insert_row("sessions", {"visitor_id": visitor["id"], "session_start": "2026-01-01T10:00:00+00:00"})
+    db.insert_row("page_events", {"session_id": session["id"], "page_url": "/pricing", "timestamp": "2026-01-01T10:00:00+00:00"})
+    idle = add_visitor(db, ip_address="b", intent_score=0, engagement_score=0, heat_level="Cold")
+    
+    visitors = db.table("visitors").select("id,intent_score,engagement_score,heat_level").order("id").execute().data
+    scored, changed = run(rescore_chunk(ScoringRules(), visitors))
+    assert (scored, changed) == (2, 1)
+    
+    rows = {row["id"]: row for row in db.table("visitors").select("*").execute().data}
+    assert rows[visitor["id"]]["intent_score"] > 0
+    assert rows[idle["id"]]["intent_score"] == 0
+    
+    visitors = db.table("visitors").select("id,intent_score,engagement_score,heat_level").order("id").execute().data
+    assert run(rescore_chunk(ScoringRules(), visitors)) == (2, 0)
+
+
+def test_rollup_increments_sum_into_hourly_and_daily_buckets(db):
+    delta = {
+        "bucket": "2026-01-01T10:00:00", "country": "US", "heat_level": "Cold",
+        "utm_source": "", "utm_medium": "", "utm_campaign": "", "page_url": "/",
+        "events": 2, "page_views": 1, "new_visitors": 1, "new_sessions": 1, "time_spent": 30
+    }
+    later = {**delta, "bucket": "2026-01-01T11:00:00"}
+    run(execute(db.rpc("increment_analytics_rollups", {"p_rows": [delta, later, delta]})))
+    
+    hourly = db.table("analytics_hourly").select("bucket,events").order("bucket").execute().data
+    daily = db.table("analytics_daily").select("bucket,events,time_spent").execute().data
+    assert [(row["bucket"], row["events"]) for row in hourly] == [("2026-01-01T10:00:00", 4), ("2026-01-01T11:00:00", 2)]
+    assert [(row["events"], row["time_spent"]) for row in daily] == [(6, 90)]
@@ -0,0 +1,74 @@
+"""
+SingleFlight: concurrent calls for one key share a single execution, which
+survives the cancellation of the caller that started it.
+"""
+import asyncio
+
+import pytest
+
+from app.core.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight("test")
+    executions = []
+    
+    async def load():
+        executions.append(1)
+        await asyncio.sleep(0.01)
+        return "value"
+    
+    async def scenario():
+        return await asyncio.gather(*(flight.do("key", load) for _ in range(5)))
+    
+    assert asyncio.run(scenario()) == ["value"] * 5
+    assert len(executions) == 1
+    assert flight.stats() == {"calls": 5, "executions": 1, "coalesced": 4, "in_flight": 0}
+
+
+def test_cancelling_the_leading_caller_does_not_fail_the_others():
+    flight = SingleFlight("test")
+    
+    async def scenario():
+        started = asyncio.Event()
+        proceed = asyncio.Event()
+        
+        async def load():
+            started.set()
+            await proceed.wait()
+            return "value"
+        
+        leader = asyncio.create_task(flight.do("key", load))
+        await started.wait()
+        followers = [asyncio.create_task(flight.do("key", load)) for _ in range(3)]
+        await asyncio.sleep(0)
+        
+        leader.cancel()
+        await asyncio.sleep(0)
+        proceed.set()
+        
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+    
+    assert asyncio.run(scenario()) == ["value"] * 3
+    assert flight.stats()["executions"] == 1
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_errors_reach_every_caller_and_the_key_is_released():
+    flight = SingleFlight("test")
+    
+    async def failing():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("lookup failed")
+    
+    async def scenario():
+        results = await asyncio.gather(*(flight.do("key", failing) for _ in range(3)), return_exceptions=True)
+        retry = await flight.do("key", lambda: asyncio.sleep(0, result="ok"))
+        return results, retry
+    
+    results, retry = asyncio.run(scenario())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert retry == "ok"
+    assert flight.stats()["executions"] == 2
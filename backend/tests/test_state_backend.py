@@ -0,0 +1,113 @@
+"""
+Rate and abuse state: the sliding-window counter and its bounded memory, the
+in-process backend, and the Redis Lua script run against fakeredis.
+"""
+import asyncio
+
+import pytest
+
+from app.core.state_backend import MemoryStateBackend, RedisStateBackend, SlidingWindowLimiter
+
+
+def test_sliding_window_counts_and_weights_the_previous_window():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=60, block_seconds=10, max_keys=10)
+    
+    assert [limiter.hit("ip", now=120 + i) for i in range(3)] == [1, 2, 3]
+    # 15s into the next window, three quarters of the previous count still apply
+    assert limiter.hit("ip", now=195) == pytest.approx(1 + 3 * 0.75)
+    # A window with no requests in between forgets the old count
+    assert limiter.hit("ip", now=330) == 1
+
+
+def test_blocks_expire_after_block_seconds():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=60, block_seconds=10, max_keys=10)
+    
+    limiter.block("ip", now=100)
+    assert limiter.is_blocked("ip", now=109)
+    assert not limiter.is_blocked("ip", now=110)
+    assert limiter.stats()["released_blocks"] == 1
+
+
+def test_least_recently_used_keys_are_evicted_at_max_keys():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=60, block_seconds=10, max_keys=2)
+    
+    limiter.hit("a", now=100)
+    limiter.hit("b", now=101)
+    limiter.hit("a", now=102)
+    limiter.hit("c", now=103)
+    
+    assert list(limiter._counters) == ["a", "c"]
+    assert limiter.stats()["evictions"] == 1
+    # b starts over after eviction
+    assert limiter.hit("b", now=104) == 1
+
+
+def test_idle_keys_are_evicted():
+    limiter = SlidingWindowLimiter(limit=3, window_seconds=60, block_seconds=10, max_keys=10)
+    
+    limiter.hit("idle", now=100)
+    limiter.hit("busy", now=221)
+    
+    assert list(limiter._counters) == ["busy"]
+
+
+def test_memory_backend_blocks_above_the_limit():
+    backend = MemoryStateBackend(window_seconds=60, block_seconds=600, max_keys=10)
+    
+    async def scenario():
+        return [await backend.check("ip", limit=2) for _ in range(4)]
+    
+    results = asyncio.run(scenario())
+    assert [result.blocked for result in results] == [False, False, True, True]
+    assert [result.newly_blocked for result in results] == [False, False, True, False]
+    assert backend.stats()["active_blocks"] == 1
+
+
+def _redis_backend(redis, prefix="test"):
+    fallback = MemoryStateBackend(window_seconds=60, block_seconds=600, max_keys=10)
+    return RedisStateBackend(redis, prefix, window_seconds=60, block_seconds=600, fallback=fallback)
+
+
+def test_redis_script_counts_and_blocks_across_workers():
+    pytest.importorskip("lupa")
+    fake_redis = pytest.importorskip("fakeredis.aioredis")
+    
+    async def scenario():
+        redis = fake_redis.FakeRedis(decode_responses=True)
+        # Two workers sharing one Redis see each other's requests
+        first, second = _redis_backend(redis), _redis_backend(redis)
+        results = [
+            await first.check("ip", limit=2),
+            await second.check("ip", limit=2),
+            await first.check("ip", limit=2),
+            await second.check("ip", limit=2),
+        ]
+        block_ttl = await redis.ttl("test:block:ip")
+        return results, block_ttl, first, second
+    
+    results, block_ttl, first, second = asyncio.run(scenario())
+    assert [result.blocked for result in results] == [False, False, True, True]
+    assert [result.newly_blocked for result in results] == [False, False, True, False]
+    assert [result.count for result in results[:2]] == [1, 2]
+    assert 0 < block_ttl <= 600
+    assert first.stats()["total_blocks"] + second.stats()["total_blocks"] == 1
+    assert first.stats()["errors"] == 0
+
+
+class _UnreachableRedis:
+    def register_script(self, script):
+        async def run(keys, args):
+            raise ConnectionError("Redis unreachable")
+        return run
+
+
+def test_redis_errors_fall_back_to_local_state():
+    backend = _redis_backend(_UnreachableRedis())
+    
+    async def scenario():
+        return [await backend.check("ip", limit=1) for _ in range(2)]
+    
+    results = asyncio.run(scenario())
+    assert [result.blocked for result in results] == [False, True]
+    assert backend.stats()["errors"] == 2
+    assert backend.stats()["local_fallback"]["active_blocks"] == 1
@@ -0,0 +1,72 @@
+"""
+Write-behind tracking queue: a full queue rejects (and counts) jobs, stop()
+drains what was accepted, and the track endpoint sheds load with 503.
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import tracking_queue as queue_module
+from app.services.tracking_queue import TrackingQueue, TrackJob
+
+EVENT = {"page_url": "https://example.com/pricing", "event_type": "page_view", "time_spent": 5}
+
+
+@pytest.fixture
+def processed(monkeypatch):
+    """Replace the tracking flow with a slow stub recording the events it handles."""
+    handled = []
+    
+    async def fake_track_page_view(track_data, context):
+        await asyncio.sleep(0.01)
+        handled.append(track_data)
+        return {"status": "success"}
+    
+    monkeypatch.setattr(queue_module, "track_page_view", fake_track_page_view)
+    return handled
+
+
+def test_full_queue_rejects_jobs(processed):
+    queue = TrackingQueue(max_size=2, worker_count=1)
+    
+    async def scenario():
+        assert not queue.enqueue(TrackJob(events=["before start"], context=None))
+        await queue.start()
+        accepted = [queue.enqueue(TrackJob(events=[i], context=None)) for i in range(4)]
+        await queue.stop()
+        return accepted
+    
+    assert asyncio.run(scenario()) == [True, True, False, False]
+    stats = queue.stats()
+    assert (stats["enqueued"], stats["rejected"], stats["processed"]) == (2, 3, 2)
+
+
+def test_stop_drains_pending_jobs(processed):
+    queue = TrackingQueue(max_size=100, worker_count=2)
+    
+    async def scenario():
+        await queue.start()
+        for i in range(10):
+            queue.enqueue(TrackJob(events=[i], context=None))
+        await queue.stop(timeout=5)
+    
+    asyncio.run(scenario())
+    assert sorted(processed) == list(range(10))
+    assert queue.stats()["processed"] == 10
+    assert queue.stats()["workers"] == 0
+
+
+def test_track_endpoint_returns_503_when_the_queue_is_full(db, monkeypatch, processed):
+    from app.main import app
+    from app.services.tracking_queue import tracking_queue
+    
+    monkeypatch.setattr(settings, "tracking_queue_enabled", True)
+    monkeypatch.setattr(tracking_queue, "enqueue", lambda job: False)
+    
+    response = TestClient(app).post("/api/track", json=EVENT)
+    
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == str(settings.tracking_queue_retry_after_seconds)
+    assert processed == []
@@ -36,6 +36,8 @@ CREATE TABLE IF NOT EXISTS visitors (
   intent_score INT DEFAULT 0,
   heat_level TEXT DEFAULT 'Cold',
   most_visited_page TEXT,
+  total_page_views INT DEFAULT 0,
+  page_counts JSONB DEFAULT '{}'::jsonb,
   primary_referral_source TEXT,
   created_at TIMESTAMP DEFAULT NOW(),
   updated_at TIMESTAMP DEFAULT NOW()
@@ -159,6 +161,15 @@ BEGIN
     ALTER TABLE visitors ADD COLUMN primary_referral_source TEXT;
   END IF;
   
+  -- Incrementally maintained page aggregates (backfill with scripts/repair_visitor_aggregates.py)
+  IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='visitors' AND column_name='total_page_views') THEN
+    ALTER TABLE visitors ADD COLUMN total_page_views INT DEFAULT 0;
+  END IF;
+  
+  IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='visitors' AND column_name='page_counts') THEN
+    ALTER TABLE visitors ADD COLUMN page_counts JSONB DEFAULT '{}'::jsonb;
+  END IF;
+  
   -- Add new columns to sessions table
   IF NOT EXISTS (SELECT 1 FROM information_schema.columns WHERE table_name='sessions' AND column_name='session_start') THEN
     ALTER TABLE sessions ADD COLUMN session_start TIMESTAMP;
@@ -194,3 +205,520 @@ BEGIN
   END IF;
 END $$;
 
+
+-- KEYSET PAGINATION INDEXES
+-- GET /api/admin/visitors orders by (sort_by DESC, id DESC) and seeks past the
+-- cursor with sort_by <= key; matching composite indexes let every page start
+-- with an index seek instead of sorting ties or scanning past earlier pages.
+-- Created after the migration block so they also apply to upgraded tables.
+CREATE INDEX IF NOT EXISTS idx_visitors_intent_score_id ON visitors(intent_score DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_visitors_visit_count_id ON visitors(visit_count DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_visitors_last_visit_date_id ON visitors(last_visit_date DESC, id DESC);
+
+
+-- TRACKING RPC
+-- Runs the whole tracking transaction (visitor upsert, session lookup or create,
+-- event insert, session stats, scores and page aggregates) atomically in one
+-- round trip. Called from app/services/tracking_service.py via supabase.rpc()
+-- when TRACKING_RPC_ENABLED=true.
+--
+-- p_visitor:  {country, region, city, timezone, device_type, browser, os,
+--              screen_resolution, referrer, utm_source, utm_medium, utm_campaign}
+-- p_events:   [{page_url, event_type, time_spent, scroll_depth, click_target,
+--              intent_delta, engagement_base}]
+-- p_heat_levels: [[upper_bound, level], ...] in ascending order
+CREATE OR REPLACE FUNCTION track_visit(
+  p_ip_address TEXT,
+  p_visitor JSONB,
+  p_events JSONB,
+  p_returning_bonus INT,
+  p_multi_session_bonus INT,
+  p_heat_levels JSONB,
+  p_top_heat_level TEXT,
+  p_session_timeout_minutes INT DEFAULT 30
+) RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_now TIMESTAMP := NOW() AT TIME ZONE 'UTC';
+  v_visitor visitors%ROWTYPE;
+  v_session sessions%ROWTYPE;
+  v_is_new_visitor BOOLEAN := FALSE;
+  v_is_new_session BOOLEAN := FALSE;
+  v_event_count INT := jsonb_array_length(p_events);
+  v_time_spent INT;
+  v_sessions_7d INT;
+  v_intent_delta INT;
+  v_engagement_delta INT;
+  v_new_intent INT;
+  v_heat_level TEXT;
+  v_level JSONB;
+  v_page_counts JSONB;
+  v_total_pages INT;
+  v_most_visited TEXT;
+  v_most_visited_count INT;
+  v_page RECORD;
+BEGIN
+  -- Serialize concurrent tracking for the same visitor (parallel tabs and beacons)
+  PERFORM pg_advisory_xact_lock(hashtext('track_visit:' || p_ip_address));
+
+  SELECT * INTO v_visitor FROM visitors WHERE ip_address = p_ip_address LIMIT 1 FOR UPDATE;
+
+  IF NOT FOUND THEN
+    v_is_new_visitor := TRUE;
+    INSERT INTO visitors (
+      ip_address, country, region, city, timezone, device_type, browser, os,
+      screen_resolution, referrer, utm_source, utm_medium, utm_campaign,
+      first_visit_date, last_visit_date, visit_count, total_time_spent,
+      avg_session_duration, pages_per_session, engagement_score, intent_score,
+      heat_level, primary_referral_source, total_page_views, page_counts,
+      created_at, updated_at
+    ) VALUES (
+      p_ip_address,
+      NULLIF(p_visitor->>'country', ''), NULLIF(p_visitor->>'region', ''),
+      NULLIF(p_visitor->>'city', ''), NULLIF(p_visitor->>'timezone', ''),
+      NULLIF(p_visitor->>'device_type', ''), NULLIF(p_visitor->>'browser', ''),
+      NULLIF(p_visitor->>'os', ''), NULLIF(p_visitor->>'screen_resolution', ''),
+      NULLIF(p_visitor->>'referrer', ''), NULLIF(p_visitor->>'utm_source', ''),
+      NULLIF(p_visitor->>'utm_medium', ''), NULLIF(p_visitor->>'utm_campaign', ''),
+      v_now, v_now, v_event_count, 0,
+      0, 0, 0, 0,
+      'Cold', NULLIF(p_visitor->>'referrer', ''), 0, '{}'::jsonb,
+      v_now, v_now
+    )
+    RETURNING * INTO v_visitor;
+  ELSE
+    UPDATE visitors SET
+      last_visit_date = v_now,
+      visit_count = COALESCE(visit_count, 1) + v_event_count,
+      country = COALESCE(NULLIF(p_visitor->>'country', ''), country),
+      region = COALESCE(NULLIF(p_visitor->>'region', ''), region),
+      city = COALESCE(NULLIF(p_visitor->>'city', ''), city),
+      timezone = COALESCE(NULLIF(p_visitor->>'timezone', ''), timezone),
+      device_type = COALESCE(NULLIF(p_visitor->>'device_type', ''), device_type),
+      browser = COALESCE(NULLIF(p_visitor->>'browser', ''), browser),
+      os = COALESCE(NULLIF(p_visitor->>'os', ''), os),
+      screen_resolution = COALESCE(NULLIF(p_visitor->>'screen_resolution', ''), screen_resolution),
+      referrer = COALESCE(NULLIF(p_visitor->>'referrer', ''), referrer),
+      utm_source = COALESCE(NULLIF(p_visitor->>'utm_source', ''), utm_source),
+      utm_medium = COALESCE(NULLIF(p_visitor->>'utm_medium', ''), utm_medium),
+      utm_campaign = COALESCE(NULLIF(p_visitor->>'utm_campaign', ''), utm_campaign),
+      primary_referral_source = COALESCE(NULLIF(primary_referral_source, ''), NULLIF(p_visitor->>'referrer', '')),
+      updated_at = v_now
+    WHERE id = v_visitor.id
+    RETURNING * INTO v_visitor;
+  END IF;
+
+  SELECT * INTO v_session FROM sessions
+  WHERE visitor_id = v_visitor.id
+    AND session_end IS NULL
+    AND session_start >= v_now - make_interval(mins => p_session_timeout_minutes)
+  LIMIT 1
+  FOR UPDATE;
+
+  IF NOT FOUND THEN
+    v_is_new_session := TRUE;
+    INSERT INTO sessions (visitor_id, session_start, pages_visited_count, session_duration)
+    VALUES (v_visitor.id, v_now, 0, 0)
+    RETURNING * INTO v_session;
+  END IF;
+
+  INSERT INTO page_events (session_id, page_url, event_type, scroll_depth, click_target, time_spent, timestamp, created_at)
+  SELECT v_session.id, e.page_url, e.event_type, COALESCE(e.scroll_depth, 0), e.click_target, COALESCE(e.time_spent, 0), v_now, v_now
+  FROM jsonb_to_recordset(p_events) AS e(page_url TEXT, event_type TEXT, scroll_depth INT, click_target TEXT, time_spent INT);
+
+  SELECT
+    COALESCE(SUM((e->>'time_spent')::INT), 0),
+    COALESCE(SUM((e->>'intent_delta')::INT), 0),
+    COALESCE(SUM((e->>'engagement_base')::INT), 0)
+  INTO v_time_spent, v_intent_delta, v_engagement_delta
+  FROM jsonb_array_elements(p_events) AS e;
+
+  UPDATE sessions SET
+    session_duration = COALESCE(session_duration, 0) + v_time_spent,
+    pages_visited_count = COALESCE(pages_visited_count, 0) + v_event_count
+  WHERE id = v_session.id;
+
+  SELECT COUNT(*) INTO v_sessions_7d FROM sessions
+  WHERE visitor_id = v_visitor.id AND session_start >= v_now - INTERVAL '7 days';
+
+  -- Every event except the one that created the visitor is a returning visit
+  v_engagement_delta := v_engagement_delta
+    + p_returning_bonus * (v_event_count - CASE WHEN v_is_new_visitor THEN 1 ELSE 0 END);
+  IF v_sessions_7d > 1 THEN
+    v_engagement_delta := v_engagement_delta + p_multi_session_bonus * v_event_count;
+  END IF;
+
+  v_new_intent := COALESCE(v_visitor.intent_score, 0) + v_intent_delta;
+  v_heat_level := p_top_heat_level;
+  FOR v_level IN SELECT value FROM jsonb_array_elements(p_heat_levels) LOOP
+    IF v_new_intent <= (v_level->>0)::INT THEN
+      v_heat_level := v_level->>1;
+      EXIT;
+    END IF;
+  END LOOP;
+
+  -- Incremental page aggregates
+  v_page_counts := COALESCE(v_visitor.page_counts, '{}'::jsonb);
+  v_total_pages := COALESCE(v_visitor.total_page_views, 0);
+  v_most_visited := v_visitor.most_visited_page;
+  v_most_visited_count := COALESCE((v_page_counts->>v_most_visited)::INT, 0);
+
+  FOR v_page IN
+    SELECT e->>'page_url' AS page_url, COUNT(*)::INT AS hits
+    FROM jsonb_array_elements(p_events) AS e
+    WHERE COALESCE(e->>'page_url', '') <> ''
+    GROUP BY 1
+  LOOP
+    v_page_counts := jsonb_set(
+      v_page_counts,
+      ARRAY[v_page.page_url],
+      to_jsonb(COALESCE((v_page_counts->>v_page.page_url)::INT, 0) + v_page.hits)
+    );
+    v_total_pages := v_total_pages + v_page.hits;
+    IF (v_page_counts->>v_page.page_url)::INT > v_most_visited_count THEN
+      v_most_visited := v_page.page_url;
+      v_most_visited_count := (v_page_counts->>v_page.page_url)::INT;
+    END IF;
+  END LOOP;
+
+  UPDATE visitors SET
+    intent_score = v_new_intent,
+    engagement_score = COALESCE(engagement_score, 0) + v_engagement_delta,
+    heat_level = v_heat_level,
+    total_time_spent = COALESCE(total_time_spent, 0) + v_time_spent,
+    avg_session_duration = CASE WHEN visit_count > 0
+      THEN (COALESCE(total_time_spent, 0) + v_time_spent) / visit_count ELSE 0 END,
+    pages_per_session = CASE WHEN visit_count > 0
+      THEN ROUND(v_total_pages::NUMERIC / visit_count, 2) ELSE 0 END,
+    total_page_views = v_total_pages,
+    page_counts = v_page_counts,
+    most_visited_page = v_most_visited,
+    updated_at = v_now
+  WHERE id = v_visitor.id;
+
+  RETURN jsonb_build_object(
+    'visitor_id', v_visitor.id,
+    'session_id', v_session.id,
+    'is_new_visitor', v_is_new_visitor,
+    'is_new_session', v_is_new_session,
+    'sessions_in_7_days', v_sessions_7d,
+    'heat_level', v_heat_level,
+    'intent_delta', v_intent_delta,
+    'engagement_delta', v_engagement_delta
+  );
+END;
+$$;
+
+
+-- FILTER OPTIONS RPC
+-- Distinct countries and industries for the admin dashboard filters. Each list is
+-- walked as a loose index scan (one index probe per distinct value) over
+-- idx_visitors_country / idx_visitors_industry, so the cost follows the number of
+-- distinct values rather than the number of visitors.
+-- Called from app/services/filter_options.py via supabase.rpc().
+CREATE OR REPLACE FUNCTION get_visitor_filter_options()
+RETURNS JSONB
+LANGUAGE sql
+STABLE
+AS $$
+  WITH RECURSIVE countries AS (
+    (SELECT country AS value FROM visitors WHERE country > '' ORDER BY country LIMIT 1)
+    UNION ALL
+    SELECT (SELECT v.country FROM visitors v WHERE v.country > c.value ORDER BY v.country LIMIT 1)
+    FROM countries c
+    WHERE c.value IS NOT NULL
+  ),
+  industries AS (
+    (SELECT industry AS value FROM visitors WHERE industry > '' ORDER BY industry LIMIT 1)
+    UNION ALL
+    SELECT (SELECT v.industry FROM visitors v WHERE v.industry > i.value ORDER BY v.industry LIMIT 1)
+    FROM industries i
+    WHERE i.value IS NOT NULL
+  )
+  SELECT jsonb_build_object(
+    'countries', COALESCE((SELECT jsonb_agg(value ORDER BY value) FROM countries WHERE value IS NOT NULL), '[]'::jsonb),
+    'industries', COALESCE((SELECT jsonb_agg(value ORDER BY value) FROM industries WHERE value IS NOT NULL), '[]'::jsonb)
+  );
+$$;
+
+
+-- ANALYTICS ROLLUPS
+-- Hourly and daily aggregates for dashboard summaries, so /api/admin/stats/* never
+-- scans visitors or page_events. Dimensions use '' instead of NULL so they can be
+-- part of the primary key. The tracking path accumulates deltas in memory and
+-- flushes them through increment_analytics_rollups(); rebuild_analytics_rollups()
+-- recomputes a time range from raw events (backfill or repair).
+CREATE TABLE IF NOT EXISTS analytics_hourly (
+  bucket TIMESTAMP NOT NULL,
+  country TEXT NOT NULL DEFAULT '',
+  heat_level TEXT NOT NULL DEFAULT '',
+  utm_source TEXT NOT NULL DEFAULT '',
+  utm_medium TEXT NOT NULL DEFAULT '',
+  utm_campaign TEXT NOT NULL DEFAULT '',
+  page_url TEXT NOT NULL DEFAULT '',
+  events BIGINT NOT NULL DEFAULT 0,
+  page_views BIGINT NOT NULL DEFAULT 0,
+  new_visitors BIGINT NOT NULL DEFAULT 0,
+  new_sessions BIGINT NOT NULL DEFAULT 0,
+  time_spent BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (bucket, country, heat_level, utm_source, utm_medium, utm_campaign, page_url)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_daily (LIKE analytics_hourly INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING INDEXES);
+
+-- Current number of visitors per heat level, maintained by trigger
+CREATE TABLE IF NOT EXISTS visitor_heat_level_counts (
+  heat_level TEXT PRIMARY KEY,
+  visitors BIGINT NOT NULL DEFAULT 0
+);
+
+CREATE OR REPLACE FUNCTION maintain_visitor_heat_level_counts()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  IF TG_OP IN ('UPDATE', 'DELETE') THEN
+    UPDATE visitor_heat_level_counts SET visitors = visitors - 1
+    WHERE heat_level = COALESCE(OLD.heat_level, '');
+  END IF;
+
+  IF TG_OP IN ('INSERT', 'UPDATE') THEN
+    INSERT INTO visitor_heat_level_counts (heat_level, visitors)
+    VALUES (COALESCE(NEW.heat_level, ''), 1)
+    ON CONFLICT (heat_level) DO UPDATE SET visitors = visitor_heat_level_counts.visitors + 1;
+  END IF;
+
+  RETURN NULL;
+END;
+$$;
+
+-- Seed the counts once for visitors that existed before the trigger
+INSERT INTO visitor_heat_level_counts (heat_level, visitors)
+SELECT COALESCE(heat_level, ''), COUNT(*) FROM visitors
+WHERE NOT EXISTS (SELECT 1 FROM visitor_heat_level_counts)
+GROUP BY 1;
+
+DROP TRIGGER IF EXISTS trg_visitor_heat_level_counts ON visitors;
+CREATE TRIGGER trg_visitor_heat_level_counts
+AFTER INSERT OR DELETE ON visitors
+FOR EACH ROW EXECUTE FUNCTION maintain_visitor_heat_level_counts();
+
+DROP TRIGGER IF EXISTS trg_visitor_heat_level_counts_update ON visitors;
+CREATE TRIGGER trg_visitor_heat_level_counts_update
+AFTER UPDATE OF heat_level ON visitors
+FOR EACH ROW
+WHEN (OLD.heat_level IS DISTINCT FROM NEW.heat_level)
+EXECUTE FUNCTION maintain_visitor_heat_level_counts();
+
+-- p_rows: [{bucket, country, heat_level, utm_source, utm_medium, utm_campaign,
+--           page_url, events, page_views, new_visitors, new_sessions, time_spent}]
+-- bucket is the UTC hour start; daily rows are derived from it.
+CREATE OR REPLACE FUNCTION increment_analytics_rollups(p_rows JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  -- Rows are grouped first: ON CONFLICT cannot touch the same row twice in one statement
+  INSERT INTO analytics_hourly
+  SELECT date_trunc('hour', r.bucket), COALESCE(r.country, ''), COALESCE(r.heat_level, ''),
+    COALESCE(r.utm_source, ''), COALESCE(r.utm_medium, ''), COALESCE(r.utm_campaign, ''),
+    COALESCE(r.page_url, ''),
+    SUM(COALESCE(r.events, 0)), SUM(COALESCE(r.page_views, 0)), SUM(COALESCE(r.new_visitors, 0)),
+    SUM(COALESCE(r.new_sessions, 0)), SUM(COALESCE(r.time_spent, 0))
+  FROM jsonb_to_recordset(p_rows) AS r(
+    bucket TIMESTAMP, country TEXT, heat_level TEXT, utm_source TEXT, utm_medium TEXT,
+    utm_campaign TEXT, page_url TEXT, events BIGINT, page_views BIGINT,
+    new_visitors BIGINT, new_sessions BIGINT, time_spent BIGINT
+  )
+  GROUP BY 1, 2, 3, 4, 5, 6, 7
+  ON CONFLICT (bucket, country, heat_level, utm_source, utm_medium, utm_campaign, page_url) DO UPDATE SET
+    events = analytics_hourly.events + EXCLUDED.events,
+    page_views = analytics_hourly.page_views + EXCLUDED.page_views,
+    new_visitors = analytics_hourly.new_visitors + EXCLUDED.new_visitors,
+    new_sessions = analytics_hourly.new_sessions + EXCLUDED.new_sessions,
+    time_spent = analytics_hourly.time_spent + EXCLUDED.time_spent;
+
+  INSERT INTO analytics_daily
+  SELECT date_trunc('day', r.bucket), COALESCE(r.country, ''), COALESCE(r.heat_level, ''),
+    COALESCE(r.utm_source, ''), COALESCE(r.utm_medium, ''), COALESCE(r.utm_campaign, ''),
+    COALESCE(r.page_url, ''),
+    SUM(COALESCE(r.events, 0)), SUM(COALESCE(r.page_views, 0)), SUM(COALESCE(r.new_visitors, 0)),
+    SUM(COALESCE(r.new_sessions, 0)), SUM(COALESCE(r.time_spent, 0))
+  FROM jsonb_to_recordset(p_rows) AS r(
+    bucket TIMESTAMP, country TEXT, heat_level TEXT, utm_source TEXT, utm_medium TEXT,
+    utm_campaign TEXT, page_url TEXT, events BIGINT, page_views BIGINT,
+    new_visitors BIGINT, new_sessions BIGINT, time_spent BIGINT
+  )
+  GROUP BY 1, 2, 3, 4, 5, 6, 7
+  ON CONFLICT (bucket, country, heat_level, utm_source, utm_medium, utm_campaign, page_url) DO UPDATE SET
+    events = analytics_daily.events + EXCLUDED.events,
+    page_views = analytics_daily.page_views + EXCLUDED.page_views,
+    new_visitors = analytics_daily.new_visitors + EXCLUDED.new_visitors,
+    new_sessions = analytics_daily.new_sessions + EXCLUDED.new_sessions,
+    time_spent = analytics_daily.time_spent + EXCLUDED.time_spent;
+END;
+$$;
+
+-- Recompute rollups for [p_from, p_to) from raw page events, and the heat level
+-- counts from visitors. Events are attributed to their visitor's current country,
+-- heat level and UTM parameters. p_from/p_to are aligned to whole days.
+CREATE OR REPLACE FUNCTION rebuild_analytics_rollups(p_from TIMESTAMP, p_to TIMESTAMP)
+RETURNS JSONB
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_from TIMESTAMP := date_trunc('day', p_from);
+  v_to TIMESTAMP := date_trunc('day', p_to - INTERVAL '1 microsecond') + INTERVAL '1 day';
+  v_hourly_rows BIGINT;
+BEGIN
+  DELETE FROM analytics_hourly WHERE bucket >= v_from AND bucket < v_to;
+  DELETE FROM analytics_daily WHERE bucket >= v_from AND bucket < v_to;
+
+  INSERT INTO analytics_hourly
+  SELECT date_trunc('hour', e.ts), COALESCE(v.country, ''), COALESCE(v.heat_level, ''),
+    COALESCE(v.utm_source, ''), COALESCE(v.utm_medium, ''), COALESCE(v.utm_campaign, ''),
+    COALESCE(e.page_url, ''),
+    COUNT(*),
+    COUNT(*) FILTER (WHERE e.event_type = 'page_view'),
+    COUNT(*) FILTER (WHERE e.session_rank = 1 AND e.first_session),
+    COUNT(*) FILTER (WHERE e.session_rank = 1),
+    COALESCE(SUM(e.time_spent), 0)
+  FROM (
+    SELECT pe.page_url, pe.event_type, pe.time_spent, s.visitor_id,
+      COALESCE(pe.timestamp, pe.created_at) AS ts,
+      ROW_NUMBER() OVER (PARTITION BY pe.session_id ORDER BY COALESCE(pe.timestamp, pe.created_at), pe.id) AS session_rank,
+      s.id = (
+        SELECT fs.id FROM sessions fs WHERE fs.visitor_id = s.visitor_id ORDER BY fs.session_start, fs.id LIMIT 1
+      ) AS first_session
+    FROM page_events pe
+    JOIN sessions s ON s.id = pe.session_id
+    -- Whole sessions that have events in range, so first events are ranked correctly
+    WHERE pe.session_id IN (
+      SELECT session_id FROM page_events
+      WHERE COALESCE(timestamp, created_at) >= v_from AND COALESCE(timestamp, created_at) < v_to
+    )
+  ) e
+  JOIN visitors v ON v.id = e.visitor_id
+  WHERE e.ts >= v_from AND e.ts < v_to
+  GROUP BY 1, 2, 3, 4, 5, 6, 7;
+
+  GET DIAGNOSTICS v_hourly_rows = ROW_COUNT;
+
+  INSERT INTO analytics_daily
+  SELECT date_trunc('day', bucket), country, heat_level, utm_source, utm_medium, utm_campaign, page_url,
+    SUM(events), SUM(page_views), SUM(new_visitors), SUM(new_sessions), SUM(time_spent)
+  FROM analytics_hourly
+  WHERE bucket >= v_from AND bucket < v_to
+  GROUP BY 1, 2, 3, 4, 5, 6, 7;
+
+  DELETE FROM visitor_heat_level_counts;
+  INSERT INTO visitor_heat_level_counts (heat_level, visitors)
+  SELECT COALESCE(heat_level, ''), COUNT(*) FROM visitors GROUP BY 1;
+
+  RETURN jsonb_build_object('from', v_from, 'to', v_to, 'hourly_rows', v_hourly_rows);
+END;
+$$;
+
+-- Dashboard readers. p_granularity is 'hour' or 'day'; all filters are optional.
+CREATE OR REPLACE FUNCTION analytics_timeseries(
+  p_granularity TEXT,
+  p_from TIMESTAMP,
+  p_to TIMESTAMP,
+  p_country TEXT DEFAULT NULL,
+  p_utm_source TEXT DEFAULT NULL
+) RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_result JSONB;
+BEGIN
+  IF p_granularity NOT IN ('hour', 'day') THEN
+    RAISE EXCEPTION 'unsupported granularity %', p_granularity;
+  END IF;
+
+  EXECUTE format(
+    'SELECT COALESCE(jsonb_agg(t ORDER BY t.bucket), ''[]''::jsonb) FROM (
+       SELECT bucket, SUM(events) AS events, SUM(page_views) AS page_views,
+         SUM(new_visitors) AS new_visitors, SUM(new_sessions) AS new_sessions,
+         SUM(time_spent) AS time_spent
+       FROM %I
+       WHERE bucket >= $1 AND bucket < $2
+         AND ($3 IS NULL OR country = $3)
+         AND ($4 IS NULL OR utm_source = $4)
+       GROUP BY bucket
+     ) t',
+    'analytics_' || CASE WHEN p_granularity = 'hour' THEN 'hourly' ELSE 'daily' END
+  )
+  INTO v_result
+  USING p_from, p_to, p_country, p_utm_source;
+
+  RETURN v_result;
+END;
+$$;
+
+CREATE OR REPLACE FUNCTION analytics_breakdown(
+  p_dimension TEXT,
+  p_from TIMESTAMP,
+  p_to TIMESTAMP,
+  p_limit INT DEFAULT 20
+) RETURNS JSONB
+LANGUAGE plpgsql
+STABLE
+AS $$
+DECLARE
+  v_result JSONB;
+BEGIN
+  IF p_dimension NOT IN ('country', 'heat_level', 'utm_source', 'utm_medium', 'utm_campaign', 'page_url') THEN
+    RAISE EXCEPTION 'unsupported dimension %', p_dimension;
+  END IF;
+
+  EXECUTE format(
+    'SELECT COALESCE(jsonb_agg(t ORDER BY t.events DESC), ''[]''::jsonb) FROM (
+       SELECT %1$I AS value, SUM(events) AS events, SUM(page_views) AS page_views,
+         SUM(new_visitors) AS new_visitors, SUM(new_sessions) AS new_sessions,
+         SUM(time_spent) AS time_spent
+       FROM analytics_daily
+       WHERE bucket >= $1 AND bucket < $2
+       GROUP BY %1$I
+       ORDER BY events DESC
+       LIMIT $3
+     ) t',
+    p_dimension
+  )
+  INTO v_result
+  USING date_trunc('day', p_from), p_to, p_limit;
+
+  RETURN v_result;
+END;
+$$;
+
+-- ============================================
+-- BATCH RE-SCORING (scripts/rescore_visitors.py)
+-- ============================================
+
+-- Bulk write of recomputed scores: p_scores is a JSON array of
+-- {id, intent_score, engagement_score, heat_level}. Only rows whose scores
+-- actually change are written. Returns the number of updated visitors.
+CREATE OR REPLACE FUNCTION apply_visitor_scores(p_scores JSONB)
+RETURNS INT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+  v_updated INT;
+BEGIN
+  UPDATE visitors v SET
+    intent_score = s.intent_score,
+    engagement_score = s.engagement_score,
+    heat_level = s.heat_level,
+    updated_at = NOW()
+  FROM jsonb_to_recordset(p_scores) AS s(id UUID, intent_score INT, engagement_score INT, heat_level TEXT)
+  WHERE v.id = s.id
+    AND (v.intent_score, v.engagement_score, v.heat_level)
+      IS DISTINCT FROM (s.intent_score, s.engagement_score, s.heat_level);
+
+  GET DIAGNOSTICS v_updated = ROW_COUNT;
+  RETURN v_updated;
+END;
+$$;